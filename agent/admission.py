@@ -0,0 +1,85 @@
+"""
+Admission control for chat requests.
+
+At most ``max_concurrent`` requests run at once; up to ``max_queue`` more
+wait for a slot. Beyond that a request is shed with 429, and one that waits
+longer than ``queue_timeout`` is shed with 503, so overload turns away new
+work early instead of piling up runs nobody is waiting for.
+"""
+
+import asyncio
+import math
+import os
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict
+
+
+class Overloaded(Exception):
+    """The request was not admitted; ``status_code`` is 429 or 503."""
+
+    def __init__(self, status_code: int, message: str, retry_after: float):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+class AdmissionController:
+    """A bounded concurrency limiter with a bounded wait queue."""
+
+    def __init__(self, max_concurrent: int = 16, max_queue: int = 64, queue_timeout: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = {429: 0, 503: 0}
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "AdmissionController":
+        """Build a controller from CHAT_MAX_CONCURRENT / CHAT_MAX_QUEUE / CHAT_QUEUE_TIMEOUT."""
+        kwargs.setdefault("max_concurrent", int(os.getenv("CHAT_MAX_CONCURRENT", "16")))
+        kwargs.setdefault("max_queue", int(os.getenv("CHAT_MAX_QUEUE", "64")))
+        kwargs.setdefault("queue_timeout", float(os.getenv("CHAT_QUEUE_TIMEOUT", "10")))
+        return cls(**kwargs)
+
+    def _reject(self, status_code: int, message: str) -> Overloaded:
+        self.rejected[status_code] += 1
+        return Overloaded(status_code, message, self.queue_timeout)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block; raises ``Overloaded`` if shed."""
+        if self._slots.locked() and self.queued >= self.max_queue:
+            raise self._reject(429, "Too many requests; try again shortly")
+        self.queued += 1
+        try:
+            async with asyncio.timeout(self.queue_timeout):
+                await self._slots.acquire()
+        except TimeoutError:
+            raise self._reject(503, f"Server busy; no slot freed within {self.queue_timeout:g}s") from None
+        finally:
+            self.queued -= 1
+        self.active += 1
+        self.admitted += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected_429": self.rejected[429],
+            "rejected_503": self.rejected[503],
+        }
@@ -3,20 +3,128 @@ This example demonstrates a dynamic, multi-step agent workflow
 using a custom ServerManager.
 """
 
+import asyncio
+import os
+from contextlib import nullcontext
+from typing import Any, AsyncGenerator, Optional
+
 from dotenv import load_dotenv
+from langchain_core.messages import HumanMessage
 
+from .events import tap
+from .runtime import get_runtime
 from .server_manager import ElasticServerManager
-from .gemini_wrapper import GeminiChat
-from mcp_use import MCPClient, MCPAgent
+from mcp_use import MCPAgent
 
 # Load environment variables from .env file
 load_dotenv()
 
-client = MCPClient(config={})
 
-search_agent = MCPAgent(
-    llm=GeminiChat(model_name="gemini-1.5-flash"),
-    use_server_manager=True,
-    client=client,
-    server_manager=ElasticServerManager(mcp_client=client),
-)
+class SearchAgent(MCPAgent):
+    """MCPAgent that also releases the server manager's resources on close.
+
+    Agents created with ``owns_resources=False`` share their MCP client and
+    catalog with other sessions; closing one only drops its own state. Each
+    step (model call plus the tool calls it makes) is limited to
+    ``step_timeout`` seconds.
+    """
+
+    def __init__(self, *args, owns_resources: bool = True, step_timeout: Optional[float] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.owns_resources = owns_resources
+        # Seconds allowed per agent step (0 for no limit)
+        self.step_timeout = step_timeout if step_timeout is not None else float(os.getenv("AGENT_STEP_TIMEOUT", "240"))
+
+    def _routing_context(self, query: str, turns: int = 2) -> str:
+        """The query plus the last few user messages, for ranking server tools."""
+        previous = [
+            message.content
+            for message in self.get_conversation_history()
+            if isinstance(message, HumanMessage) and isinstance(message.content, str)
+        ][-turns:]
+        return "\n".join(previous + [query])
+
+    async def _next_step(self, steps: AsyncGenerator[Any, None]) -> Any:
+        timeout = asyncio.timeout(self.step_timeout or None)
+        try:
+            async with timeout:
+                return await steps.__anext__()
+        except TimeoutError:
+            if timeout.expired():
+                raise TimeoutError(f"Agent step timed out after {self.step_timeout:g}s") from None
+            raise
+
+    async def stream(self, query: str, *args: Any, **kwargs: Any) -> AsyncGenerator[Any, None]:
+        manager = self.server_manager if isinstance(self.server_manager, ElasticServerManager) else None
+        speculation = None
+        if manager is not None:
+            manager.set_context(self._routing_context(query))
+            manager.begin_turn(query)
+            # A confidently recognised request gets its server before the first LLM call;
+            # otherwise search and warm up its likely server while that call runs
+            if await manager.fast_path(query) is None:
+                speculation = manager.speculate(query)
+        # Successful server tool calls teach the intent router. The tap is set
+        # per step: a context variable must not stay set across a yield.
+        steps = super().stream(query, *args, **kwargs)
+        try:
+            while True:
+                with tap(manager.observe) if manager is not None else nullcontext():
+                    try:
+                        item = await self._next_step(steps)
+                    except StopAsyncIteration:
+                        return
+                if speculation is not None and not isinstance(item, tuple):
+                    # The final answer: callers may stop iterating here, so discard
+                    # unused speculative work before handing it over
+                    await manager.end_turn(speculation)
+                    speculation = None
+                yield item
+        finally:
+            await steps.aclose()
+            if speculation is not None:
+                await manager.end_turn(speculation)
+
+    async def close(self) -> None:
+        if not self.owns_resources:
+            if isinstance(self.server_manager, ElasticServerManager):
+                # Shared server processes stay up for other sessions until idle
+                await self.server_manager.unload_all()
+            self._agent_executor = None
+            self._tools = []
+            self.clear_conversation_history()
+            self._initialized = False
+            return
+        if isinstance(self.server_manager, ElasticServerManager):
+            await self.server_manager.close()
+        await super().close()
+
+
+# The shared components (client, llm, catalog, ...) are built on first access
+RUNTIME_ATTRIBUTES = ("client", "llm", "catalog", "server_pool", "search_agent", "intent_router", "single_flight", "launch_specs", "speculator")
+
+
+def __getattr__(name: str) -> Any:
+    if name in RUNTIME_ATTRIBUTES:
+        return getattr(get_runtime(), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_session_agent() -> SearchAgent:
+    """A fresh conversation that shares the LLM, MCP server pool and catalog with ``search_agent``."""
+    runtime = get_runtime()
+    return SearchAgent(
+        llm=runtime.llm,
+        use_server_manager=True,
+        client=runtime.client,
+        server_manager=ElasticServerManager(
+            mcp_client=runtime.client,
+            catalog=runtime.catalog,
+            server_pool=runtime.server_pool,
+            intent_router=runtime.intent_router,
+            single_flight=runtime.single_flight,
+            launch_specs=runtime.launch_specs,
+            speculator=runtime.speculator,
+        ),
+        owns_resources=False,
+    )
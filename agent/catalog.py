@@ -0,0 +1,640 @@
+"""
+Access to the public_servers catalog through Elasticsearch or a local index.
+"""
+
+import asyncio
+import fnmatch
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from dotenv import load_dotenv
+from elasticsearch import AsyncElasticsearch, Elasticsearch, NotFoundError
+
+from .cache import SearchCache
+from .embeddings import DEFAULT_EMBEDDER_PATH, TfidfSvdEmbedder
+from .local_search import LocalSearchIndex, load_local_index
+from .text import normalize_query
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "public_servers"
+
+# "elastic" only talks to Elasticsearch, "local" only uses the bundled CSV,
+# "auto" prefers Elasticsearch and falls back to the CSV when it is slow or down.
+BACKENDS = ("elastic", "local", "auto")
+
+# "lexical" is BM25 only; "hybrid" fuses BM25 with dense-vector neighbours (RRF)
+RETRIEVAL_MODES = ("lexical", "hybrid")
+
+VECTOR_FIELD = "server_vector"
+
+# Search hits only carry what the result list shows; get() returns the full document
+SEARCH_SOURCE_INCLUDES = ("name", "slug", "namespace", "description", "github_stars", "usable", "install_command")
+SEARCH_SOURCE_EXCLUDES = ("*_vector", "environment_variables_schema", "config", "*readme*")
+
+
+def source_filter() -> Dict[str, Any]:
+    return {"includes": list(SEARCH_SOURCE_INCLUDES), "excludes": list(SEARCH_SOURCE_EXCLUDES)}
+
+
+def project_source(source: Dict[str, Any]) -> Dict[str, Any]:
+    """Apply the search ``_source`` filter to a document locally."""
+    return {
+        field: value
+        for field, value in source.items()
+        if any(fnmatch.fnmatchcase(field, pattern) for pattern in SEARCH_SOURCE_INCLUDES)
+        and not any(fnmatch.fnmatchcase(field, pattern) for pattern in SEARCH_SOURCE_EXCLUDES)
+    }
+
+
+def build_search_query(query: str, size: int = 5) -> Dict[str, Any]:
+    """Build the relevance-scored search body used by the search tool."""
+    # Create search query with relevance scoring (simplified to avoid date issues)
+    return {
+        "_source": source_filter(),
+        "query": {
+            "function_score": {
+                "query": {
+                    "multi_match": {
+                        "query": query,
+                        "fields": ["description^3", "name^5", "slug", "namespace"]
+                    }
+                },
+                "functions": [
+                    {"filter": {"term": {"usable": True}}, "weight": 2.0},
+                    {"field_value_factor": {"field": "github_stars", "modifier": "log1p", "missing": 0}}
+                ],
+                "score_mode": "sum",
+                "boost_mode": "multiply"
+            }
+        },
+        "size": size
+    }
+
+
+def build_knn_query(vector: List[float], size: int = 5) -> Dict[str, Any]:
+    """Build the kNN search body over the server embedding field."""
+    return {
+        "knn": {
+            "field": VECTOR_FIELD,
+            "query_vector": vector,
+            "k": size,
+            "num_candidates": max(100, size * 2),
+        },
+        "_source": source_filter(),
+        "size": size,
+    }
+
+
+def build_popular_query(size: int = 5) -> Dict[str, Any]:
+    """Usable servers, most-starred first."""
+    return {
+        "size": size,
+        "query": {"term": {"usable": True}},
+        "sort": [{"github_stars": {"order": "desc"}}],
+    }
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[Dict[str, Any]]], k: int = 60, size: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Fuse ranked hit lists by summing ``1 / (k + rank)`` per ``_id``.
+
+    The fused score replaces ``_score``; the first occurrence of each hit
+    supplies its ``_source``.
+    """
+    fused: Dict[str, float] = {}
+    first: Dict[str, Dict[str, Any]] = {}
+    for ranking in rankings:
+        for rank, hit in enumerate(ranking, 1):
+            fused[hit["_id"]] = fused.get(hit["_id"], 0.0) + 1.0 / (k + rank)
+            first.setdefault(hit["_id"], hit)
+    ordered = sorted(fused, key=fused.get, reverse=True)[:size]
+    return [dict(first[hit_id], _score=fused[hit_id]) for hit_id in ordered]
+
+
+def merge_hits(queries: Sequence[str], results: Sequence[Sequence[Dict[str, Any]]], size: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Merge per-query hit lists, one entry per ``_id``.
+
+    Each merged hit keeps its best ``_score`` and lists the queries that
+    found it under ``matched_queries``; hits are ordered by that score.
+    """
+    merged: Dict[str, Dict[str, Any]] = {}
+    for query, hits in zip(queries, results):
+        for hit in hits:
+            current = merged.get(hit["_id"])
+            if current is None:
+                merged[hit["_id"]] = dict(hit, matched_queries=[query])
+                continue
+            if query not in current["matched_queries"]:
+                current["matched_queries"].append(query)
+            if (hit.get("_score") or 0.0) > (current.get("_score") or 0.0):
+                current["_score"] = hit["_score"]
+    ordered = sorted(merged.values(), key=lambda hit: hit.get("_score") or 0.0, reverse=True)
+    return ordered[:size]
+
+
+class SearchBatcher:
+    """Sends searches started within ``window`` seconds of each other as one ``amsearch``.
+
+    Rephrased searches issued together (e.g. several ``search_servers`` calls
+    in one model response) then cost one ``_msearch`` round trip.
+    """
+
+    def __init__(self, catalog: "ServerCatalog", window: float = 0.01, max_batch: int = 16):
+        self.catalog = catalog
+        self.window = window
+        self.max_batch = max_batch
+        self._pending: List[Tuple[str, int, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        self.batches = 0
+        self.queries = 0
+
+    async def search(self, query: str, size: int = 5) -> List[Dict[str, Any]]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((query, size, future))
+        if len(self._pending) >= self.max_batch or self.window <= 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, int, asyncio.Future]]) -> None:
+        by_size: Dict[int, List[Tuple[str, asyncio.Future]]] = {}
+        for query, size, future in batch:
+            by_size.setdefault(size, []).append((query, future))
+        for size, items in by_size.items():
+            self.batches += 1
+            self.queries += len(items)
+            try:
+                results = await self.catalog.amsearch([query for query, _ in items], size)
+            except Exception as e:
+                results = [e] * len(items)
+            for (_, future), result in zip(items, results):
+                if future.done():
+                    continue
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"window": self.window, "batches": self.batches, "queries": self.queries}
+
+
+class ServerCatalog:
+    """Searches and looks up MCP servers from the configured backend.
+
+    The Elasticsearch clients (one sync, one async) are created on first use
+    and then reused for every call, so agent steps never pay for a new TLS
+    handshake. In ``auto`` mode a failed or slow Elasticsearch call is answered
+    from the in-process index instead, and Elasticsearch is skipped for
+    ``failure_cooldown`` seconds before being tried again.
+
+    With ``retrieval="hybrid"`` every search also runs a nearest-neighbour
+    query over server embeddings and fuses both rankings with reciprocal-rank
+    fusion. Against Elasticsearch the two queries go out as a single
+    ``_msearch``, with the query embedded by the model ``ingest.py`` saved at
+    ``embedder_path``; if that model is missing or is not the one the index
+    was built with, Elasticsearch searches are BM25 only.
+
+    Search results are cached by normalized query. At most every
+    ``version_check_interval`` seconds the catalog asks the backend for its
+    index version and document count and drops the cache if either changed.
+    """
+
+    def __init__(
+        self,
+        url: Optional[str] = None,
+        api_key: Optional[str] = None,
+        index: str = INDEX_NAME,
+        backend: str = "auto",
+        retrieval: str = "lexical",
+        request_timeout: float = 10.0,
+        fallback_timeout: float = 2.0,
+        failure_cooldown: float = 30.0,
+        connections_per_node: int = 10,
+        dataset_path: Optional[str] = None,
+        embedder_path: Optional[str] = None,
+        cache: Optional[SearchCache] = None,
+        version_check_interval: float = 30.0,
+        batch_window: float = 0.01,
+    ):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown search backend '{backend}', expected one of {BACKENDS}")
+        if retrieval not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{retrieval}', expected one of {RETRIEVAL_MODES}")
+        self.url = url
+        self.api_key = api_key
+        self.index = index
+        self.backend = backend
+        self.retrieval = retrieval
+        self.request_timeout = request_timeout
+        self.fallback_timeout = fallback_timeout
+        self.failure_cooldown = failure_cooldown
+        self.connections_per_node = connections_per_node
+        self.dataset_path = dataset_path
+        self.embedder_path = embedder_path or str(DEFAULT_EMBEDDER_PATH)
+        self._query_embedder: Optional[TfidfSvdEmbedder] = None
+        self._query_embedder_loaded = False
+        # Fingerprint of the model the index's vectors were built with (from its _meta)
+        self._index_embedder: Optional[str] = None
+        self._index_checked = False
+        self._client: Optional[Elasticsearch] = None
+        self._async_client: Optional[AsyncElasticsearch] = None
+        self._elastic_down_until = 0.0
+        self.cache = cache if cache is not None else SearchCache()
+        self.version_check_interval = version_check_interval
+        self._version_checked_at: Optional[float] = None
+        self.batcher = SearchBatcher(self, window=batch_window)
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "ServerCatalog":
+        """Build a catalog from ELASTIC_INDEX_URL / ELASTIC_API_KEY / SEARCH_BACKEND."""
+        load_dotenv()
+        kwargs.setdefault("backend", os.getenv("SEARCH_BACKEND", "auto"))
+        kwargs.setdefault("retrieval", os.getenv("SEARCH_RETRIEVAL", "lexical"))
+        kwargs.setdefault("dataset_path", os.getenv("SERVER_DATASET_PATH"))
+        kwargs.setdefault("embedder_path", os.getenv("SEARCH_EMBEDDER_PATH"))
+        kwargs.setdefault("batch_window", float(os.getenv("SEARCH_BATCH_WINDOW", "0.01")))
+        if "cache" not in kwargs:
+            kwargs["cache"] = SearchCache(
+                max_entries=int(os.getenv("SEARCH_CACHE_SIZE", "256")),
+                ttl=float(os.getenv("SEARCH_CACHE_TTL", "300")),
+            )
+        return cls(
+            url=os.getenv("ELASTIC_INDEX_URL"),
+            api_key=os.getenv("ELASTIC_API_KEY"),
+            **kwargs,
+        )
+
+    def _client_options(self) -> Dict[str, Any]:
+        return {
+            "api_key": self.api_key,
+            "request_timeout": self.request_timeout,
+            "connections_per_node": self.connections_per_node,
+            "retry_on_timeout": self.backend == "elastic",
+        }
+
+    @property
+    def client(self) -> Elasticsearch:
+        """The shared blocking client."""
+        if self._client is None:
+            self._client = Elasticsearch(self.url, **self._client_options())
+        return self._client
+
+    @property
+    def async_client(self) -> AsyncElasticsearch:
+        """The shared non-blocking client."""
+        if self._async_client is None:
+            self._async_client = AsyncElasticsearch(self.url, **self._client_options())
+        return self._async_client
+
+    @property
+    def local_index(self) -> LocalSearchIndex:
+        """The in-process index, loaded once per process and dataset path."""
+        return load_local_index(self.dataset_path)
+
+    def _use_elastic(self) -> bool:
+        if self.backend == "local":
+            return False
+        if self.backend == "auto":
+            return bool(self.url) and time.monotonic() >= self._elastic_down_until
+        return True
+
+    def _elastic_failed(self, error: Exception) -> None:
+        if self.backend != "auto":
+            raise error
+        logger.warning(f"Elasticsearch unavailable, using local index: {error}")
+        self._elastic_down_until = time.monotonic() + self.failure_cooldown
+
+    def _options(self, client):
+        if self.backend == "auto":
+            return client.options(request_timeout=self.fallback_timeout)
+        return client
+
+    def _local_version(self) -> tuple:
+        index = self.local_index
+        return ("local", str(index.path), len(index))
+
+    def _elastic_version(self, mappings: Dict[str, Any], count: Dict[str, Any]) -> tuple:
+        # get_mapping is keyed by the concrete index name, which may differ from an alias
+        mapping = next(iter(mappings.values()), {}).get("mappings", {})
+        meta = mapping.get("_meta", {})
+        fingerprint = meta.get("embedder")
+        if self.retrieval == "hybrid" and not fingerprint and (self._index_embedder or not self._index_checked):
+            logger.warning(f"Index '{self.index}' has no server vectors (ingest.py --vectors); searches are BM25 only")
+        self._index_embedder = fingerprint
+        self._index_checked = True
+        return ("elastic", meta.get("version"), count["count"])
+
+    def _version_check_due(self) -> bool:
+        now = time.monotonic()
+        if self._version_checked_at is not None and now - self._version_checked_at < self.version_check_interval:
+            return False
+        self._version_checked_at = now
+        return True
+
+    def _check_version(self) -> None:
+        if not self._version_check_due():
+            return
+        if self._use_elastic():
+            try:
+                client = self._options(self.client)
+                version = self._elastic_version(
+                    client.indices.get_mapping(index=self.index),
+                    client.count(index=self.index),
+                )
+                self.cache.validate(version)
+                return
+            except Exception as e:
+                if self.backend != "auto":
+                    # Leave validation to the next check; the search reports the error
+                    return
+                self._elastic_failed(e)
+        self.cache.validate(self._local_version())
+
+    async def _acheck_version(self) -> None:
+        if not self._version_check_due():
+            return
+        if self._use_elastic():
+            try:
+                client = self._options(self.async_client)
+                version = self._elastic_version(
+                    await client.indices.get_mapping(index=self.index),
+                    await client.count(index=self.index),
+                )
+                self.cache.validate(version)
+                return
+            except Exception as e:
+                if self.backend != "auto":
+                    return
+                self._elastic_failed(e)
+        self.cache.validate(self._local_version())
+
+    def search(self, query: str, size: int = 5, offset: int = 0) -> List[Dict[str, Any]]:
+        """Return hits ``offset`` to ``offset + size`` for ``query`` as Elasticsearch-style hit dicts.
+
+        Hits carry only the ``SEARCH_SOURCE_INCLUDES`` fields. Pages are cut
+        from the top ``offset + size`` hits, which is also what gets cached.
+        """
+        self._check_version()
+        depth = size + offset
+        key = (normalize_query(query), depth)
+        hits = self.cache.get(key)
+        if hits is None:
+            hits = self._search_uncached(query, depth)
+            self.cache.put(key, hits)
+        return hits[offset:]
+
+    async def asearch(self, query: str, size: int = 5, offset: int = 0) -> List[Dict[str, Any]]:
+        await self._acheck_version()
+        depth = size + offset
+        key = (normalize_query(query), depth)
+        hits = self.cache.get(key)
+        if hits is None:
+            hits = await self._asearch_uncached(query, depth)
+            self.cache.put(key, hits)
+        return hits[offset:]
+
+    def _cached_batch(self, queries: Sequence[str], size: int) -> Tuple[List[tuple], Dict[tuple, Any], Dict[tuple, str]]:
+        """Cache keys per query, cached hits per distinct key, and the queries still to run."""
+        keys = [(normalize_query(query), size) for query in queries]
+        cached = {key: self.cache.get(key) for key in dict.fromkeys(keys)}
+        missing = {key: query for key, query in zip(keys, queries) if cached[key] is None}
+        return keys, cached, missing
+
+    def msearch(self, queries: Sequence[str], size: int = 5) -> List[List[Dict[str, Any]]]:
+        """Top hits for each of ``queries``; cache misses go out as one ``_msearch``."""
+        self._check_version()
+        keys, cached, missing = self._cached_batch(queries, size)
+        if missing:
+            for key, hits in zip(missing, self._msearch_uncached(list(missing.values()), size)):
+                self.cache.put(key, hits)
+                cached[key] = hits
+        return [cached[key] for key in keys]
+
+    async def amsearch(self, queries: Sequence[str], size: int = 5) -> List[List[Dict[str, Any]]]:
+        await self._acheck_version()
+        keys, cached, missing = self._cached_batch(queries, size)
+        if missing:
+            for key, hits in zip(missing, await self._amsearch_uncached(list(missing.values()), size)):
+                self.cache.put(key, hits)
+                cached[key] = hits
+        return [cached[key] for key in keys]
+
+    @property
+    def query_embedder(self) -> Optional[TfidfSvdEmbedder]:
+        """The model the index's vectors were built with, or None if it is not available."""
+        if not self._query_embedder_loaded:
+            self._query_embedder_loaded = True
+            try:
+                self._query_embedder = TfidfSvdEmbedder.load(self.embedder_path)
+            except FileNotFoundError:
+                logger.warning(f"No embedding model at {self.embedder_path} (run ingest.py); Elasticsearch searches are BM25 only")
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Ignoring unreadable embedding model {self.embedder_path}: {e}")
+        embedder = self._query_embedder
+        if embedder is None or self._index_embedder != embedder.fingerprint:
+            # No vectors in the index (or none checked yet), or vectors from another
+            # model that are not comparable: rather no kNN than a failing or wrong one
+            return None
+        return embedder
+
+    def _elastic_hybrid(self) -> bool:
+        return self.retrieval == "hybrid" and self.query_embedder is not None
+
+    async def aload_embeddings(self) -> None:
+        """Load or fit what hybrid retrieval needs, off the event loop.
+
+        Fitting the local index's embeddings takes a noticeable fraction of
+        a second, which must not stall every other request on first search.
+        """
+        if self.retrieval != "hybrid":
+            return
+        if self.backend != "local" and not self._query_embedder_loaded:
+            await asyncio.to_thread(lambda: self.query_embedder)
+        if self.backend != "elastic" and not self.local_index.embeddings_ready:
+            await asyncio.to_thread(lambda: self.local_index.embeddings)
+
+    def _candidates(self, size: int) -> int:
+        # Fusion needs a deeper list from each retriever than it returns
+        return max(size * 4, 20)
+
+    def _hybrid_searches(self, query: str, size: int) -> List[Dict[str, Any]]:
+        vector = self.query_embedder.embed(query).tolist()
+        candidates = self._candidates(size)
+        return [{}, build_search_query(query, candidates), {}, build_knn_query(vector, candidates)]
+
+    def _fuse_responses(self, responses: List[Dict[str, Any]], size: int) -> List[Dict[str, Any]]:
+        rankings = []
+        for response in responses:
+            if "error" in response:
+                # e.g. an index built without vectors: keep the other ranking
+                logger.warning(f"Hybrid sub-search failed: {response['error']}")
+                continue
+            rankings.append(response["hits"]["hits"])
+        if not rankings:
+            raise RuntimeError(f"Search failed: {responses[0].get('error')}")
+        return reciprocal_rank_fusion(rankings, size=size)
+
+    def _msearch_body(self, queries: Sequence[str], size: int) -> List[Dict[str, Any]]:
+        searches: List[Dict[str, Any]] = []
+        hybrid = self._elastic_hybrid()
+        for query in queries:
+            if hybrid:
+                searches.extend(self._hybrid_searches(query, size))
+            else:
+                searches.extend([{}, build_search_query(query, size)])
+        return searches
+
+    def _split_msearch(self, queries: Sequence[str], responses: List[Dict[str, Any]], size: int) -> List[List[Dict[str, Any]]]:
+        """Per-query hits from an ``_msearch`` built by ``_msearch_body``."""
+        per_query = len(responses) // max(len(queries), 1)
+        results = []
+        for i, query in enumerate(queries):
+            group = responses[i * per_query:(i + 1) * per_query]
+            if per_query == 2:
+                results.append(self._fuse_responses(group, size))
+            elif "error" in group[0]:
+                raise RuntimeError(f"Search for '{query}' failed: {group[0]['error']}")
+            else:
+                results.append(group[0]["hits"]["hits"])
+        return results
+
+    def _local_search(self, query: str, size: int) -> List[Dict[str, Any]]:
+        index = self.local_index
+        if self.retrieval == "hybrid":
+            candidates = self._candidates(size)
+            hits = reciprocal_rank_fusion(
+                [index.search(query, candidates), index.vector_search(query, candidates)], size=size
+            )
+        else:
+            hits = index.search(query, size)
+        return [dict(hit, _source=project_source(hit["_source"])) for hit in hits]
+
+    def _search_uncached(self, query: str, size: int) -> List[Dict[str, Any]]:
+        if self._use_elastic():
+            try:
+                client = self._options(self.client)
+                if self._elastic_hybrid():
+                    response = client.msearch(index=self.index, searches=self._hybrid_searches(query, size))
+                    return self._fuse_responses(response["responses"], size)
+                response = client.search(index=self.index, body=build_search_query(query, size))
+                return response["hits"]["hits"]
+            except Exception as e:
+                self._elastic_failed(e)
+        return self._local_search(query, size)
+
+    async def _asearch_uncached(self, query: str, size: int) -> List[Dict[str, Any]]:
+        await self.aload_embeddings()
+        if self._use_elastic():
+            try:
+                client = self._options(self.async_client)
+                if self._elastic_hybrid():
+                    response = await client.msearch(index=self.index, searches=self._hybrid_searches(query, size))
+                    return self._fuse_responses(response["responses"], size)
+                response = await client.search(index=self.index, body=build_search_query(query, size))
+                return response["hits"]["hits"]
+            except Exception as e:
+                self._elastic_failed(e)
+        return self._local_search(query, size)
+
+    def _msearch_uncached(self, queries: Sequence[str], size: int) -> List[List[Dict[str, Any]]]:
+        if len(queries) == 1:
+            return [self._search_uncached(queries[0], size)]
+        if self._use_elastic():
+            try:
+                client = self._options(self.client)
+                response = client.msearch(index=self.index, searches=self._msearch_body(queries, size))
+                return self._split_msearch(queries, response["responses"], size)
+            except Exception as e:
+                self._elastic_failed(e)
+        return [self._local_search(query, size) for query in queries]
+
+    async def _amsearch_uncached(self, queries: Sequence[str], size: int) -> List[List[Dict[str, Any]]]:
+        if len(queries) == 1:
+            return [await self._asearch_uncached(queries[0], size)]
+        await self.aload_embeddings()
+        if self._use_elastic():
+            try:
+                client = self._options(self.async_client)
+                response = await client.msearch(index=self.index, searches=self._msearch_body(queries, size))
+                return self._split_msearch(queries, response["responses"], size)
+            except Exception as e:
+                self._elastic_failed(e)
+        return [self._local_search(query, size) for query in queries]
+
+    def stats(self) -> Dict[str, Any]:
+        """Backend, cache and batching counters for diagnostics."""
+        return {
+            "backend": self.backend,
+            "retrieval": self.retrieval,
+            "cache": self.cache.stats(),
+            "batching": self.batcher.stats(),
+        }
+
+    def _local_get(self, server_id: str) -> Dict[str, Any]:
+        hit = self.local_index.get(server_id)
+        if hit is None:
+            raise ValueError(f"Server '{server_id}' not found")
+        return hit
+
+    def get(self, server_id: str) -> Dict[str, Any]:
+        """Return the hit (``_id`` + ``_source``) for a server ID."""
+        if self._use_elastic():
+            try:
+                return self._options(self.client).get(index=self.index, id=server_id)
+            except NotFoundError:
+                # The ID may come from a local-index result
+                if self.backend != "auto":
+                    raise
+            except Exception as e:
+                self._elastic_failed(e)
+        return self._local_get(server_id)
+
+    async def aget(self, server_id: str) -> Dict[str, Any]:
+        if self._use_elastic():
+            try:
+                return await self._options(self.async_client).get(index=self.index, id=server_id)
+            except NotFoundError:
+                if self.backend != "auto":
+                    raise
+            except Exception as e:
+                self._elastic_failed(e)
+        return self._local_get(server_id)
+
+    async def apopular(self, size: int = 5) -> List[Dict[str, Any]]:
+        """The ``size`` most-starred usable servers (used to pre-warm MCP servers)."""
+        if self._use_elastic():
+            try:
+                client = self._options(self.async_client)
+                response = await client.search(index=self.index, body=build_popular_query(size))
+                return response["hits"]["hits"]
+            except Exception as e:
+                self._elastic_failed(e)
+        return self.local_index.popular(size)
+
+    async def close(self) -> None:
+        """Close both clients and release their connection pools."""
+        if self._async_client is not None:
+            await self._async_client.close()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
@@ -0,0 +1,153 @@
+"""
+Local dense embeddings for servers (TF-IDF + truncated SVD, NumPy only).
+
+No model download or network call is needed: the embedding space is fitted on
+the catalog itself. ``ingest.py`` fits it on the CSV it loads and saves it to
+``DEFAULT_EMBEDDER_PATH`` (or SEARCH_EMBEDDER_PATH), stamping its fingerprint
+into the index ``_meta``, so query vectors computed at search time come from
+the same model as the Elasticsearch vectors.
+"""
+
+import hashlib
+import json
+import math
+import os
+import tempfile
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .text import analyze
+
+DEFAULT_DIMENSIONS = 128
+
+DEFAULT_EMBEDDER_PATH = Path.home() / ".cache" / "mcp-use-elastic" / "server_embedder.npz"
+
+
+def server_text(source: Dict[str, Any]) -> str:
+    """The text a server is embedded from: name, description and its tools."""
+    parts = [str(source.get("name", "")), str(source.get("description", ""))]
+    tools = source.get("tools") or []
+    if isinstance(tools, str):
+        try:
+            tools = json.loads(tools)
+        except ValueError:
+            tools = []
+    for tool in tools if isinstance(tools, list) else []:
+        if isinstance(tool, dict):
+            parts.append(str(tool.get("name", "")).replace("_", " "))
+            parts.append(str(tool.get("description", "")))
+    return " ".join(parts)
+
+
+class TfidfSvdEmbedder:
+    """Latent semantic embeddings: TF-IDF vectors projected onto the top
+    ``dimensions`` singular vectors of the corpus, L2-normalized."""
+
+    def __init__(self, dimensions: int = DEFAULT_DIMENSIONS):
+        self.dimensions = dimensions
+        self.vocabulary: Dict[str, int] = {}
+        self.idf: Optional[np.ndarray] = None
+        self.components: Optional[np.ndarray] = None  # (vocab, dimensions)
+
+    def _tfidf(self, tokens: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse (indices, weights) TF-IDF vector, L2-normalized."""
+        counts = Counter(self.vocabulary[t] for t in tokens if t in self.vocabulary)
+        if not counts:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        indices = np.fromiter(counts.keys(), dtype=np.int64)
+        weights = np.fromiter(((1 + math.log(c)) for c in counts.values()), dtype=np.float32)
+        weights *= self.idf[indices]
+        weights /= np.linalg.norm(weights) or 1.0
+        return indices, weights
+
+    def fit_transform(self, texts: Sequence[str]) -> np.ndarray:
+        """Fit the model on ``texts`` and return their embeddings."""
+        docs = [analyze(text) for text in texts]
+        df = Counter(term for tokens in docs for term in set(tokens))
+        self.vocabulary = {term: i for i, term in enumerate(sorted(df))}
+        n = len(docs)
+        self.idf = np.array(
+            [math.log((1 + n) / (1 + df[term])) + 1 for term in sorted(df)], dtype=np.float32
+        )
+
+        matrix = np.zeros((n, len(self.vocabulary)), dtype=np.float32)
+        for row, tokens in enumerate(docs):
+            indices, weights = self._tfidf(tokens)
+            matrix[row, indices] = weights
+
+        # Truncated SVD through the (docs x docs) Gram matrix, which is far
+        # smaller than the vocabulary for a catalog of this size.
+        k = min(self.dimensions, n, len(self.vocabulary))
+        eigenvalues, eigenvectors = np.linalg.eigh(matrix @ matrix.T)
+        order = np.argsort(eigenvalues)[::-1][:k]
+        singular = np.sqrt(np.clip(eigenvalues[order], 1e-12, None))
+        u = eigenvectors[:, order]
+        # eigh only fixes vectors up to sign; pin it so refits are reproducible
+        signs = np.sign(u[np.abs(u).argmax(axis=0), np.arange(k)])
+        u *= np.where(signs == 0, 1, signs)
+        self.components = (matrix.T @ u) / singular
+        self.dimensions = k
+        return self._normalize(u * singular)
+
+    def embed(self, text: str) -> np.ndarray:
+        indices, weights = self._tfidf(analyze(text))
+        vector = weights @ self.components[indices] if len(indices) else np.zeros(self.dimensions, np.float32)
+        return self._normalize(vector[None, :])[0]
+
+    @property
+    def fingerprint(self) -> str:
+        """Short hash of the fitted model; equal fingerprints embed text identically."""
+        digest = hashlib.sha256()
+        digest.update("\0".join(sorted(self.vocabulary, key=self.vocabulary.get)).encode("utf-8"))
+        digest.update(np.ascontiguousarray(self.idf).tobytes())
+        digest.update(np.ascontiguousarray(self.components).tobytes())
+        return digest.hexdigest()[:16]
+
+    def save(self, path: os.PathLike) -> None:
+        """Write the fitted model to ``path`` (an ``.npz`` archive)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        terms = np.array(sorted(self.vocabulary, key=self.vocabulary.get), dtype=str)
+        # Write to a temp file and rename so a running server never loads half a model
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".embedder.")
+        with os.fdopen(fd, "wb") as f:
+            np.savez(f, terms=terms, idf=self.idf, components=self.components)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: os.PathLike) -> "TfidfSvdEmbedder":
+        """Read a model written by ``save``."""
+        with np.load(path, allow_pickle=False) as archive:
+            embedder = cls(int(archive["components"].shape[1]))
+            embedder.vocabulary = {str(term): i for i, term in enumerate(archive["terms"])}
+            embedder.idf = archive["idf"]
+            embedder.components = archive["components"]
+        return embedder
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+
+class ServerEmbeddings:
+    """Embedding matrix for every server in a catalog, plus its model."""
+
+    def __init__(self, sources: Iterable[Dict[str, Any]], dimensions: int = DEFAULT_DIMENSIONS):
+        self.embedder = TfidfSvdEmbedder(dimensions)
+        self.matrix = self.embedder.fit_transform([server_text(source) for source in sources])
+
+    def search(self, query: str, size: int = 5) -> List[Tuple[int, float]]:
+        """Return ``(row, cosine similarity)`` pairs for the nearest servers."""
+        scores = self.matrix @ self.embedder.embed(query)
+        size = min(size, len(scores))
+        if size <= 0 or not scores.any():
+            return []
+        top = np.argpartition(-scores, size - 1)[:size]
+        top = top[np.argsort(-scores[top])]
+        return [(int(row), float(scores[row])) for row in top]
+
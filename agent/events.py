@@ -0,0 +1,79 @@
+"""
+Progress events emitted while the agent works on a request.
+
+Tools and the LLM wrapper call ``emit``; whoever is serving the request
+installs a sink with ``capture`` (for example the streaming endpoint in
+``web.py``). Without a sink, ``emit`` is a no-op.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, Optional
+
+Event = Dict[str, Any]
+
+_sink: ContextVar[Optional[Callable[[Event], None]]] = ContextVar("agent_event_sink", default=None)
+
+
+def emit(event: str, **data: Any) -> None:
+    """Send ``event`` to the current request's sink, if any."""
+    sink = _sink.get()
+    if sink is not None:
+        sink({"event": event, **data})
+
+
+@contextmanager
+def capture(sink: Callable[[Event], None]) -> Iterator[None]:
+    """Route events emitted in this context (and tasks it starts) to ``sink``."""
+    token = _sink.set(sink)
+    try:
+        yield
+    finally:
+        _sink.reset(token)
+
+
+@contextmanager
+def tap(listener: Callable[[Event], None]) -> Iterator[None]:
+    """Also pass events emitted in this context to ``listener``; the current sink still gets them."""
+    outer = _sink.get()
+
+    def sink(event: Event) -> None:
+        listener(event)
+        if outer is not None:
+            outer(event)
+
+    with capture(sink):
+        yield
+
+
+class EventQueue:
+    """An asyncio queue sink that can be fed from the loop or from worker threads."""
+
+    def __init__(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._queue: "asyncio.Queue[Optional[Event]]" = asyncio.Queue()
+
+    def __call__(self, event: Event) -> None:
+        self.put(event)
+
+    def put(self, event: Optional[Event]) -> None:
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._queue.put_nowait(event)
+        else:
+            self._loop.call_soon_threadsafe(self._queue.put_nowait, event)
+
+    def close(self) -> None:
+        """Signal the consumer that no more events will arrive."""
+        self.put(None)
+
+    async def __aiter__(self):
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                return
+            yield event
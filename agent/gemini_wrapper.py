@@ -3,18 +3,52 @@ LangChain-compatible wrapper for Google Gemini.
 """
 
 import asyncio
+import itertools
 import os
 import re
-from typing import Any, Dict, Iterator, List, Optional, Sequence, Union
-from langchain_core.callbacks.manager import CallbackManagerForLLMRun
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+from langchain_core.callbacks.manager import AsyncCallbackManagerForLLMRun, CallbackManagerForLLMRun
 from langchain_core.language_models.chat_models import BaseChatModel
-from langchain_core.messages import BaseMessage, AIMessage, HumanMessage, SystemMessage, ToolMessage
-from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.messages import AIMessageChunk, BaseMessage, AIMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
 from langchain_core.tools import BaseTool
-from langchain_core.utils.function_calling import convert_to_openai_tool
 
 import google.generativeai as genai
 
+from .events import emit
+from .llm_policy import LLMCallPolicy
+from .prompt import PromptBuilder
+from .telemetry import PROMPT_TOKENS, span
+
+# Pattern to match tool calls like: tool_name(param="value") or tool_name("value")
+TOOL_CALL_PATTERN = r'(\w+)\(([^)]*)\)'
+
+# Text at the end of a partial response that may still grow into a tool call:
+# a trailing word, or a word followed by an unclosed parenthesis.
+_PENDING_TOOL_CALL = re.compile(r'\w+(\([^)]*)?\Z')
+
+
+def _response_text(response: Any) -> str:
+    """Text of a Gemini response or chunk ('' when it carries no text parts)."""
+    try:
+        return response.text or ""
+    except ValueError:
+        return ""
+
+
+async def _prepend(first: Any, chunks: AsyncIterator[Any]) -> AsyncIterator[Any]:
+    if first is not None:
+        yield first
+    async for chunk in chunks:
+        yield chunk
+
+
+async def _aclose_stream(opened: Tuple[Any, Any]) -> None:
+    """Close a streamed response that lost a hedged race."""
+    aclose = getattr(opened[1], "aclose", None)
+    if aclose is not None:
+        await aclose()
+
 
 class GeminiChat(BaseChatModel):
     """LangChain-compatible wrapper for Google Gemini."""
@@ -22,6 +56,11 @@ class GeminiChat(BaseChatModel):
     model_name: str = "gemini-1.5-flash"
     gemini_model: Any = None  # Will be set in __init__
     bound_tools: List[BaseTool] = []  # Store bound tools
+    tool_timeout: float = 60.0  # Seconds allowed per tool call
+    # Connecting may have to download and start a server first
+    tool_timeouts: Dict[str, float] = {"connect_server": 180.0, "connect_to_playwright_server": 180.0}
+    prompt_builder: Any = None  # Shared with tool-bound copies so its prefix cache persists
+    call_policy: Any = None  # Retries, pacing and hedging; shared so the rate limit is process-wide
     
     def __init__(self, model_name: str = "gemini-1.5-flash", **kwargs):
         super().__init__(model_name=model_name, **kwargs)
@@ -33,6 +72,10 @@ class GeminiChat(BaseChatModel):
         
         genai.configure(api_key=api_key)
         self.gemini_model = genai.GenerativeModel(self.model_name)
+        if self.prompt_builder is None:
+            self.prompt_builder = PromptBuilder.from_env()
+        if self.call_policy is None:
+            self.call_policy = LLMCallPolicy.from_env()
     
     @property
     def _llm_type(self) -> str:
@@ -47,6 +90,10 @@ class GeminiChat(BaseChatModel):
         # Create a new instance with the same configuration
         new_instance = self.__class__(
             model_name=self.model_name,
+            tool_timeout=self.tool_timeout,
+            tool_timeouts=self.tool_timeouts,
+            prompt_builder=self.prompt_builder,
+            call_policy=self.call_policy,
             **kwargs
         )
         
@@ -62,17 +109,46 @@ class GeminiChat(BaseChatModel):
         new_instance.bound_tools = bound_tools
         return new_instance
     
+    def _parse_tool_params(self, tool_name: str, params_str: str) -> Dict[str, Any]:
+        """Parse the argument text of a tool call into keyword arguments."""
+        params = {}
+        if params_str:
+            # Handle different parameter formats:
+            # 1. key="value" format
+            param_matches = re.findall(r'(\w+)="([^"]*)"', params_str)
+            for key, value in param_matches:
+                params[key] = value
+            
+            # 2. Just quoted string (assume it's the first parameter)
+            if not params and params_str.startswith('"') and params_str.endswith('"'):
+                if tool_name == "search_servers":
+                    params["query"] = params_str.strip('"')
+                elif tool_name == "connect_server":
+                    params["server_id"] = params_str.strip('"')
+            
+            # 3. Just a string without quotes (assume it's the first parameter)  
+            if not params and params_str and not '=' in params_str:
+                if tool_name == "search_servers":
+                    params["query"] = params_str.strip('"')
+                elif tool_name == "connect_server":
+                    params["server_id"] = params_str.strip('"')
+        return params
+
     def _parse_and_execute_tools(self, text: str) -> str:
         """Parse tool calls from text and execute them."""
         if not self.bound_tools:
             return text
-        
-        # Create tool map for easy lookup
+
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # No running loop: use the concurrent async engine
+            return asyncio.run(self._aparse_and_execute_tools(text))
+
+        # Inside a running loop a sync caller cannot await, so fall back to
+        # running each tool's sync implementation in turn
         tool_map = {tool.name: tool for tool in self.bound_tools}
         
-        # Pattern to match tool calls like: tool_name(param="value") or tool_name("value")
-        tool_pattern = r'(\w+)\(([^)]*)\)'
-        
         def execute_tool_call(match):
             tool_name = match.group(1)
             params_str = match.group(2).strip()
@@ -81,82 +157,149 @@ class GeminiChat(BaseChatModel):
                 return f"Tool '{tool_name}' not found"
             
             try:
-                # Parse parameters
-                params = {}
-                if params_str:
-                    # Handle different parameter formats:
-                    # 1. key="value" format
-                    param_matches = re.findall(r'(\w+)="([^"]*)"', params_str)
-                    for key, value in param_matches:
-                        params[key] = value
-                    
-                    # 2. Just quoted string (assume it's the first parameter)
-                    if not params and params_str.startswith('"') and params_str.endswith('"'):
-                        # Get the tool's expected parameter name by inspecting
-                        tool = tool_map[tool_name]
-                        if tool_name == "search_servers":
-                            params["query"] = params_str.strip('"')
-                        elif tool_name == "connect_server":
-                            params["server_id"] = params_str.strip('"')
-                    
-                    # 3. Just a string without quotes (assume it's the first parameter)  
-                    if not params and params_str and not '=' in params_str:
-                        if tool_name == "search_servers":
-                            params["query"] = params_str.strip('"')
-                        elif tool_name == "connect_server":
-                            params["server_id"] = params_str.strip('"')
-                
-                # Execute the tool (handle both sync and async)
-                tool = tool_map[tool_name]
-                
-                # Check if we're in an async context and tool has _arun
-                if hasattr(tool, '_arun'):
-                    # We need to run the async version, but can't use asyncio.run() 
-                    # from within an event loop. Let's use the sync version instead.
-                    result = tool._run(**params)
-                else:
-                    result = tool._run(**params)
-                
+                params = self._parse_tool_params(tool_name, params_str)
+                emit("tool_call", tool=tool_name, params=params)
+                result = tool_map[tool_name]._run(**params)
+                emit("tool_result", tool=tool_name, result=str(result))
                 return f"\n**Tool Result ({tool_name}):**\n{result}\n"
                 
             except Exception as e:
+                emit("tool_error", tool=tool_name, error=str(e))
                 return f"\n**Tool Error ({tool_name}):**\n{str(e)}\n"
         
         # Replace tool calls with their results
-        result_text = re.sub(tool_pattern, execute_tool_call, text)
-        return result_text
+        return re.sub(TOOL_CALL_PATTERN, execute_tool_call, text)
+
+    def _tool_timeout(self, tool_name: str) -> float:
+        return self.tool_timeouts.get(tool_name, self.tool_timeout)
+
+    async def _aexecute_tool_call(self, tool: BaseTool, params: Dict[str, Any]) -> str:
+        """Run one tool call through ``_arun`` with its timeout; returns the spliced text."""
+        timeout = self._tool_timeout(tool.name)
+        emit("tool_call", tool=tool.name, params=params)
+        try:
+            result = await asyncio.wait_for(tool._arun(**params), timeout)
+        except asyncio.TimeoutError:
+            error = f"Timed out after {timeout:g}s"
+            emit("tool_error", tool=tool.name, error=error)
+            return f"\n**Tool Error ({tool.name}):**\n{error}\n"
+        except Exception as e:
+            emit("tool_error", tool=tool.name, error=str(e))
+            return f"\n**Tool Error ({tool.name}):**\n{str(e)}\n"
+        emit("tool_result", tool=tool.name, result=str(result))
+        return f"\n**Tool Result ({tool.name}):**\n{result}\n"
+
+    async def _aparse_and_execute_tools(self, text: str) -> str:
+        """Parse every tool call in ``text``, run them concurrently, and splice
+        the results back in place, in order.
+
+        Wall time is that of the slowest call. Identical calls (same tool and
+        arguments) in one response run once and share the result.
+        """
+        if not self.bound_tools:
+            return text
+
+        tool_map = {tool.name: tool for tool in self.bound_tools}
+        matches = list(re.finditer(TOOL_CALL_PATTERN, text))
+        if not matches:
+            return text
+
+        calls: Dict[Tuple[str, str], Any] = {}
+        keys: List[Optional[Tuple[str, str]]] = []
+        for match in matches:
+            tool_name = match.group(1)
+            if tool_name not in tool_map:
+                keys.append(None)
+                continue
+            params = self._parse_tool_params(tool_name, match.group(2).strip())
+            key = (tool_name, repr(sorted(params.items())))
+            if key not in calls:
+                calls[key] = self._aexecute_tool_call(tool_map[tool_name], params)
+            keys.append(key)
+
+        results = dict(zip(calls, await asyncio.gather(*calls.values())))
+
+        parts = []
+        last = 0
+        for match, key in zip(matches, keys):
+            parts.append(text[last:match.start()])
+            parts.append(results[key] if key else f"Tool '{match.group(1)}' not found")
+            last = match.end()
+        parts.append(text[last:])
+        return "".join(parts)
 
     def _format_messages(self, messages: List[BaseMessage]) -> str:
-        """Convert LangChain messages to a text prompt for Gemini."""
-        formatted_parts = []
-        
-        # Add tool usage instructions if tools are bound
-        if self.bound_tools:
-            tool_descriptions = [
-                "You have access to these tools. To use a tool, write the tool name with parameters:",
-                "- search_servers(query=\"your search term\")",
-                "- connect_server(server_id=\"server_id_from_search\")",
-                "- connect_to_playwright_server() for web browsing",
-                "",
-                "Available tools:"
-            ]
-            for tool in self.bound_tools:
-                tool_descriptions.append(f"- {tool.name}: {tool.description}")
-            tool_descriptions.append("")  # Empty line
-            formatted_parts.extend(tool_descriptions)
-        
-        for message in messages:
-            if isinstance(message, HumanMessage):
-                formatted_parts.append(f"Human: {message.content}")
-            elif isinstance(message, AIMessage):
-                formatted_parts.append(f"Assistant: {message.content}")
-            elif isinstance(message, SystemMessage):
-                formatted_parts.append(f"System: {message.content}")
-            else:
-                formatted_parts.append(f"User: {message.content}")
-        
-        return "\n\n".join(formatted_parts)
+        """Convert LangChain messages to a text prompt for Gemini, within the token budget."""
+        prompt, stats = self.prompt_builder.build(messages, self.bound_tools)
+        PROMPT_TOKENS.observe(stats.tokens)
+        emit("prompt_stats", **stats.as_dict())
+        return prompt
     
+    def _split_streamed_text(self, buffer: str) -> Tuple[str, str]:
+        """Split streamed text into a part that is safe to emit and a held-back tail.
+
+        The tail is any trailing text that could still become a tool call once
+        more tokens arrive; it is only released (and its tool calls executed)
+        when complete, so streamed output matches the non-streamed result.
+        """
+        if not self.bound_tools:
+            return buffer, ""
+        pending = _PENDING_TOOL_CALL.search(buffer)
+        if pending is None:
+            return buffer, ""
+        return buffer[:pending.start()], buffer[pending.start():]
+
+    def _stream_chunk(self, text: str) -> ChatGenerationChunk:
+        """Emit a token event for ``text`` and wrap it (with tool results spliced in)."""
+        emit("token", text=text)
+        return ChatGenerationChunk(message=AIMessageChunk(content=self._parse_and_execute_tools(text)))
+
+    async def _astream_chunk(self, text: str) -> ChatGenerationChunk:
+        emit("token", text=text)
+        return ChatGenerationChunk(message=AIMessageChunk(content=await self._aparse_and_execute_tools(text)))
+
+    def _generation_config(self, stop: Optional[List[str]]) -> Optional[Dict[str, Any]]:
+        return {"stop_sequences": stop} if stop else None
+
+    def _result_from_text(self, text: str) -> ChatResult:
+        if text:
+            # Parse and execute any tool calls in the response
+            message = AIMessage(content=self._parse_and_execute_tools(text))
+        else:
+            message = AIMessage(content="")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _aresult_from_text(self, text: str) -> ChatResult:
+        message = AIMessage(content=await self._aparse_and_execute_tools(text) if text else "")
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _open_stream(self, prompt: str, stop: Optional[List[str]]) -> Tuple[Any, Iterator[Any]]:
+        """Start a streamed response and wait for its first chunk.
+
+        Retries and hedging cover this much: once a chunk has been passed on,
+        the response cannot be restarted.
+        """
+        response = self.gemini_model.generate_content(
+            prompt, generation_config=self._generation_config(stop), stream=True
+        )
+        chunks = iter(response)
+        return next(chunks, None), chunks
+
+    async def _aopen_stream(self, prompt: str, stop: Optional[List[str]]) -> Tuple[Any, AsyncIterator[Any]]:
+        response = await self.gemini_model.generate_content_async(
+            prompt, generation_config=self._generation_config(stop), stream=True
+        )
+        chunks = response.__aiter__()
+        try:
+            return await chunks.__anext__(), chunks
+        except StopAsyncIteration:
+            return None, chunks
+
+    def _error_result(self, error: Exception) -> ChatResult:
+        # Handle any errors gracefully
+        error_message = AIMessage(content=f"Error generating response: {str(error)}")
+        return ChatResult(generations=[ChatGeneration(message=error_message)])
+
     def _generate(
         self,
         messages: List[BaseMessage],
@@ -164,38 +307,91 @@ class GeminiChat(BaseChatModel):
         run_manager: Optional[CallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        """Generate a response using Gemini."""
+        """Generate a response using Gemini, retrying transient failures."""
         
         # Format messages for Gemini
         prompt = self._format_messages(messages)
         
         try:
             # Generate content using Gemini
-            response = self.gemini_model.generate_content(prompt)
-            
-            # Extract text from response
-            if response.text:
-                # Parse and execute any tool calls in the response
-                processed_text = self._parse_and_execute_tools(response.text)
-                message = AIMessage(content=processed_text)
-            else:
-                message = AIMessage(content="")
-            
-            generation = ChatGeneration(message=message)
-            return ChatResult(generations=[generation])
-            
+            with span("llm.generate", model=self.model_name):
+                response = self.call_policy.call_sync(
+                    lambda: self.gemini_model.generate_content(prompt, generation_config=self._generation_config(stop))
+                )
+            return self._result_from_text(_response_text(response))
         except Exception as e:
-            # Handle any errors gracefully
-            error_message = AIMessage(content=f"Error generating response: {str(e)}")
-            generation = ChatGeneration(message=error_message)
-            return ChatResult(generations=[generation])
+            return self._error_result(e)
     
     async def _agenerate(
         self,
         messages: List[BaseMessage],
         stop: Optional[List[str]] = None,
-        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
         **kwargs: Any,
     ) -> ChatResult:
-        """Async version of _generate (for now, just calls sync version)."""
-        return self._generate(messages, stop, run_manager, **kwargs)
+        """Generate a response without blocking the event loop.
+
+        Transient failures are retried and slow calls may be hedged (see
+        ``LLMCallPolicy``). Cancelling the calling task cancels the in-flight
+        request(s).
+        """
+        prompt = self._format_messages(messages)
+
+        try:
+            with span("llm.generate", model=self.model_name):
+                response = await self.call_policy.call(
+                    lambda: self.gemini_model.generate_content_async(
+                        prompt, generation_config=self._generation_config(stop)
+                    )
+                )
+            return await self._aresult_from_text(_response_text(response))
+        except Exception as e:
+            return self._error_result(e)
+
+    def _stream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[ChatGenerationChunk]:
+        """Stream the response, executing tool calls as soon as they are complete."""
+        prompt = self._format_messages(messages)
+        buffer = ""
+        try:
+            # Includes tool calls executed between chunks; they have their own spans
+            with span("llm.stream", model=self.model_name):
+                first, chunks = self.call_policy.call_sync(lambda: self._open_stream(prompt, stop))
+                for chunk in itertools.chain([first] if first is not None else [], chunks):
+                    ready, buffer = self._split_streamed_text(buffer + _response_text(chunk))
+                    if ready:
+                        yield self._stream_chunk(ready)
+                if buffer:
+                    yield self._stream_chunk(buffer)
+        except Exception as e:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"Error generating response: {str(e)}"))
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        """Async token streaming; cancelling the consumer cancels the request."""
+        prompt = self._format_messages(messages)
+        buffer = ""
+        try:
+            # Includes tool calls executed between chunks; they have their own spans
+            with span("llm.stream", model=self.model_name):
+                first, chunks = await self.call_policy.call(
+                    lambda: self._aopen_stream(prompt, stop), discard=_aclose_stream
+                )
+                async for chunk in _prepend(first, chunks):
+                    ready, buffer = self._split_streamed_text(buffer + _response_text(chunk))
+                    if ready:
+                        yield await self._astream_chunk(ready)
+                if buffer:
+                    yield await self._astream_chunk(buffer)
+        except Exception as e:
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"Error generating response: {str(e)}"))
@@ -0,0 +1,342 @@
+"""
+Streaming, parallel bulk ingestion of the server catalog into Elasticsearch.
+"""
+
+import csv
+import json
+import queue
+import random
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import streaming_bulk
+
+from .catalog import VECTOR_FIELD
+from .embeddings import TfidfSvdEmbedder, server_text
+from .local_search import DEFAULT_DATASET_PATH
+
+# Columns stored as JSON text in the CSV export
+JSON_COLUMNS = ("categories", "tools", "config", "environment_variables_schema")
+BOOL_COLUMNS = ("usable", "is_featured")
+INT_COLUMNS = ("github_stars", "github_user_id")
+
+# Documents the embedding model is fitted on at most (it keeps a dense matrix of them)
+DEFAULT_FIT_SAMPLE = 2000
+
+_DATE = {
+    "type": "date",
+    "format": "yyyy-MM-dd HH:mm:ss.SSSX||yyyy-MM-dd HH:mm:ss.SSSSX||yyyy-MM-dd HH:mm:ss.SSSSSX||yyyy-MM-dd HH:mm:ss.SSSSSSX",
+    "ignore_malformed": True,
+}
+_TEXT_WITH_KEYWORD = {"type": "text", "fields": {"keyword": {"type": "keyword", "ignore_above": 256}}}
+
+MAPPING: Dict[str, Any] = {
+    "dynamic": False,
+    "properties": {
+        "id": {"type": "keyword"},
+        "name": _TEXT_WITH_KEYWORD,
+        "slug": _TEXT_WITH_KEYWORD,
+        "namespace": _TEXT_WITH_KEYWORD,
+        "description": {"type": "text"},
+        "github_repo_url": {"type": "keyword"},
+        "github_user_id": {"type": "long"},
+        "github_stars": {"type": "integer"},
+        "github_readme_url": {"type": "keyword", "index": False},
+        "github_icon_url": {"type": "keyword", "index": False},
+        "spdx_license": {"type": "keyword"},
+        "categories": {"type": "keyword"},
+        "tools": {
+            "type": "nested",
+            "properties": {
+                "name": _TEXT_WITH_KEYWORD,
+                "description": {"type": "text"},
+                "inputSchema": {"type": "object", "enabled": False},
+            },
+        },
+        # Free-form JSON objects: kept in _source, not indexed field by field
+        "environment_variables_schema": {"type": "object", "enabled": False},
+        "config": {"type": "object", "enabled": False},
+        "status": {"type": "keyword"},
+        "is_featured": {"type": "boolean"},
+        "created_at": _DATE,
+        "updated_at": _DATE,
+        "approved_at": _DATE,
+        "submitted_by": {"type": "keyword"},
+        "approved_by": {"type": "keyword"},
+        "search_vector": {"type": "text", "index": False},
+        "usable": {"type": "boolean"},
+    },
+}
+
+
+def _parse_json(value: str, default: Any) -> Any:
+    if not value:
+        return default
+    try:
+        return json.loads(value)
+    except ValueError:
+        return default
+
+
+def row_to_document(row: Dict[str, str]) -> Dict[str, Any]:
+    """Turn a raw CSV row into a typed document matching ``MAPPING``."""
+    doc: Dict[str, Any] = {key: value for key, value in row.items() if value != ""}
+    for column in JSON_COLUMNS:
+        default: Any = [] if column in ("categories", "tools") else {}
+        doc[column] = _parse_json(row.get(column, ""), default)
+    # tools must be a list of objects to fit the nested mapping
+    doc["tools"] = [tool for tool in doc["tools"] if isinstance(tool, dict)]
+    for column in ("config", "environment_variables_schema"):
+        if not isinstance(doc[column], dict):
+            doc[column] = {}
+    for column in BOOL_COLUMNS:
+        doc[column] = str(row.get(column, "")).lower() == "true"
+    for column in INT_COLUMNS:
+        try:
+            doc[column] = int(row.get(column) or 0)
+        except ValueError:
+            doc[column] = 0
+    return doc
+
+
+def iter_documents(path: Path) -> Iterator[Dict[str, Any]]:
+    """Stream typed documents from a catalog CSV without loading it whole."""
+    csv.field_size_limit(sys.maxsize)
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            yield row_to_document(row)
+
+
+def fit_embedder(path: Optional[Path] = None, sample: int = DEFAULT_FIT_SAMPLE, seed: int = 0) -> TfidfSvdEmbedder:
+    """Fit the server embedding model on a catalog CSV.
+
+    The fit holds a dense documents x vocabulary matrix, so it only sees a
+    uniform sample of at most ``sample`` documents (drawn while streaming
+    the file); every document is still embedded when it is indexed.
+    """
+    rng = random.Random(seed)
+    texts: List[str] = []
+    for seen, doc in enumerate(iter_documents(Path(path) if path else DEFAULT_DATASET_PATH)):
+        if len(texts) < sample:
+            texts.append(server_text(doc))
+        else:
+            # Reservoir sampling: keep each document with probability sample / seen
+            slot = rng.randint(0, seen)
+            if slot < sample:
+                texts[slot] = server_text(doc)
+    embedder = TfidfSvdEmbedder()
+    embedder.fit_transform(texts)
+    return embedder
+
+
+def build_mapping(vector_dims: Optional[int] = None, embedder: Optional[str] = None) -> Dict[str, Any]:
+    """The index mapping, with a kNN-searchable embedding field if ``vector_dims`` is set.
+
+    ``embedder`` is the fingerprint of the model the vectors come from; it is
+    kept in ``_meta`` so searches can tell whether their model matches.
+    """
+    meta: Dict[str, Any] = {"version": int(time.time())}
+    if embedder:
+        meta["embedder"] = embedder
+    mapping = dict(MAPPING, properties=dict(MAPPING["properties"]), _meta=meta)
+    if vector_dims:
+        mapping["properties"][VECTOR_FIELD] = {
+            "type": "dense_vector",
+            "dims": vector_dims,
+            "index": True,
+            "similarity": "cosine",
+        }
+    return mapping
+
+
+# Field settings Elasticsearch will not change on an existing field
+_FIXED_SETTINGS = ("type", "format", "index", "enabled", "dims", "similarity")
+
+
+def mapping_conflicts(existing: Dict[str, Any], wanted: Dict[str, Any], prefix: str = "") -> List[str]:
+    """Fields whose existing mapping ``put_mapping`` could not change into ``wanted``."""
+    conflicts = []
+    existing_fields = existing.get("properties", {})
+    for name, field_mapping in wanted.get("properties", {}).items():
+        current = existing_fields.get(name)
+        if current is None:
+            continue  # new fields can be added
+        path = prefix + name
+        for setting in _FIXED_SETTINGS:
+            # Mappings only list non-default settings; an object field has no "type"
+            default = "object" if setting == "type" else None
+            if current.get(setting, default) != field_mapping.get(setting, default):
+                conflicts.append(f"{path} ({setting}: {current.get(setting, default)} -> {field_mapping.get(setting, default)})")
+                break
+        else:
+            conflicts.extend(mapping_conflicts(current, field_mapping, prefix=path + "."))
+    return conflicts
+
+
+def ensure_index(
+    client: Elasticsearch,
+    index: str,
+    recreate: bool = False,
+    vector_dims: Optional[int] = None,
+    embedder: Optional[str] = None,
+) -> None:
+    """Create ``index`` with the explicit mapping, stamping a new ``_meta.version``.
+
+    An existing index is updated in place if its mapping allows it; one that
+    does not (e.g. created by the Kibana file upload) raises ``ValueError``
+    asking for ``--recreate`` instead of sending an update Elasticsearch rejects.
+    """
+    mapping = build_mapping(vector_dims, embedder)
+    if client.indices.exists(index=index):
+        if not recreate:
+            current = client.indices.get_mapping(index=index)
+            # Keyed by the concrete index name, which may differ from an alias
+            existing = next(iter(current.values()), {}).get("mappings", {})
+            conflicts = mapping_conflicts(existing, mapping)
+            if conflicts:
+                raise ValueError(
+                    f"Index '{index}' has an incompatible mapping ({', '.join(conflicts)}); "
+                    "rebuild it with --recreate"
+                )
+            client.indices.put_mapping(index=index, body=mapping)
+            return
+        client.indices.delete(index=index)
+    client.indices.create(index=index, mappings=mapping)
+
+
+@dataclass
+class IngestStats:
+    indexed: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    errors: List[Dict[str, Any]] = field(default_factory=list)
+
+    @property
+    def docs_per_second(self) -> float:
+        return self.indexed / self.elapsed if self.elapsed else 0.0
+
+
+_DONE = object()
+
+
+def _drain(docs: "queue.Queue[Any]") -> None:
+    while True:
+        try:
+            docs.get_nowait()
+        except queue.Empty:
+            return
+
+
+def ingest(
+    client: Elasticsearch,
+    path: Optional[Path] = None,
+    index: str = "public_servers",
+    workers: int = 4,
+    chunk_size: int = 500,
+    queue_size: int = 2000,
+    max_retries: int = 5,
+    recreate: bool = False,
+    max_errors_kept: int = 20,
+    embedder: Optional[Any] = None,
+) -> IngestStats:
+    """Load a catalog CSV into ``index`` through ``_bulk``.
+
+    The calling thread streams documents into a bounded queue; ``workers``
+    threads each drain it with ``streaming_bulk``, which batches ``chunk_size``
+    documents per request and retries 429 rejections with exponential backoff.
+    When Elasticsearch falls behind the queue fills up and the reader blocks,
+    so memory stays bounded however large the input is.
+
+    If ``embedder`` (a ``TfidfSvdEmbedder`` fitted on this CSV, see
+    ``fit_embedder``) is given, each document also gets its server embedding
+    for hybrid retrieval, and the model's fingerprint goes into ``_meta``.
+    """
+    path = Path(path) if path else DEFAULT_DATASET_PATH
+    workers = max(1, workers)
+    ensure_index(
+        client,
+        index,
+        recreate=recreate,
+        vector_dims=embedder.dimensions if embedder else None,
+        embedder=embedder.fingerprint if embedder else None,
+    )
+
+    # Room for every worker's end marker, even after an abort empties it
+    docs: "queue.Queue[Any]" = queue.Queue(maxsize=max(queue_size, workers))
+    stats = IngestStats()
+    lock = threading.Lock()
+    # Set when a worker dies; nobody may be left draining the queue
+    abort = threading.Event()
+    crashes: List[BaseException] = []
+    start = time.perf_counter()
+
+    def actions() -> Iterator[Dict[str, Any]]:
+        while True:
+            doc = docs.get()
+            if doc is _DONE or abort.is_set():
+                return
+            yield {"_index": index, "_id": doc.get("id"), "_source": doc}
+
+    def worker() -> None:
+        results = streaming_bulk(
+            client,
+            actions(),
+            chunk_size=chunk_size,
+            max_retries=max_retries,
+            initial_backoff=1,
+            max_backoff=30,
+            raise_on_error=False,
+            raise_on_exception=False,
+        )
+        try:
+            for ok, info in results:
+                with lock:
+                    if ok:
+                        stats.indexed += 1
+                    else:
+                        stats.failed += 1
+                        if len(stats.errors) < max_errors_kept:
+                            stats.errors.append(info)
+        except Exception as e:
+            # Errors outside per-document handling (e.g. a non-HTTP failure) end the run
+            with lock:
+                crashes.append(e)
+            abort.set()
+
+    def put(item: Any) -> None:
+        while True:
+            try:
+                docs.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                if abort.is_set():
+                    _drain(docs)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for doc in iter_documents(path):
+            if abort.is_set():
+                break
+            if embedder is not None:
+                doc[VECTOR_FIELD] = embedder.embed(server_text(doc)).tolist()
+            put(doc)
+    finally:
+        if abort.is_set():
+            _drain(docs)
+        for _ in threads:
+            put(_DONE)
+        for thread in threads:
+            thread.join()
+
+    if crashes:
+        raise RuntimeError(f"Ingest aborted after {stats.indexed} documents: {crashes[0]}") from crashes[0]
+    client.indices.refresh(index=index)
+    stats.elapsed = time.perf_counter() - start
+    return stats
@@ -0,0 +1,229 @@
+"""
+Pre-LLM routing of common requests straight to the server that handles them.
+
+A table maps message terms to catalog server IDs (or ``"playwright"``). It
+is learned from sessions in which a connected server's tool was used
+successfully and seeded from the catalog's names, categories and tools. When
+a message matches one server clearly enough, the agent connects it before the
+first model call, skipping the search and connect round trips.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import tempfile
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .text import analyze
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TABLE_PATH = Path.home() / ".cache" / "mcp-use-elastic" / "intents.json"
+
+PLAYWRIGHT = "playwright"
+
+# Requests that mean "use a browser", routed to the built-in Playwright server
+PLAYWRIGHT_TERMS = (
+    "browse", "browser", "website", "webpage", "web page", "url", "navigate", "click",
+    "screenshot", "scrape", "open the page",
+)
+
+# Seed weights: one successful session outweighs any catalog hint. A single
+# browser term (log1p(1.5) ~ 0.92) stays below the default min_score, so
+# "open the pdf" or "click here" do not start a browser; two of them do.
+PLAYWRIGHT_WEIGHT = 1.5
+NAME_WEIGHT = 0.5
+CATEGORY_WEIGHT = 0.25
+TOOL_WEIGHT = 0.25
+LEARNED_WEIGHT = 1.0
+MAX_WEIGHT = 20.0
+
+Table = Dict[str, Dict[str, float]]
+
+
+def _tool_text(tools: Any) -> List[str]:
+    if isinstance(tools, str):
+        try:
+            tools = json.loads(tools)
+        except ValueError:
+            return []
+    texts = []
+    for tool in tools if isinstance(tools, list) else []:
+        if isinstance(tool, dict):
+            texts.append(str(tool.get("name", "")).replace("_", " "))
+            texts.append(str(tool.get("description", "")))
+    return texts
+
+
+def _categories(value: Any) -> List[str]:
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            value = [value]
+    return [str(category) for category in value] if isinstance(value, list) else []
+
+
+class IntentRouter:
+    """Scores message terms against the intent table.
+
+    A term's vote for a server is its share of that term's weight times the
+    log of the weight, so specific, often-confirmed terms count most. A
+    match is confident when the best score reaches ``min_score`` and beats
+    the runner-up by ``min_margin`` times.
+
+    Learned entries are written to ``path`` at most once per ``save_delay``
+    seconds, in a thread; ``close`` writes any still pending.
+    """
+
+    def __init__(
+        self,
+        path: Optional[os.PathLike] = None,
+        min_score: float = 1.0,
+        min_margin: float = 2.0,
+        save_delay: float = 1.0,
+    ):
+        self.path = Path(path) if path else DEFAULT_TABLE_PATH
+        self.min_score = min_score
+        self.min_margin = min_margin
+        self.save_delay = save_delay
+        self._learned: Optional[Table] = None
+        self._dirty = False
+        self._save_task: Optional[asyncio.Task] = None
+        self._seeded: Table = defaultdict(dict)
+        for phrase in PLAYWRIGHT_TERMS:
+            for term in analyze(phrase):
+                self._seeded[term][PLAYWRIGHT] = PLAYWRIGHT_WEIGHT
+        self.routed = 0
+        self.learned = 0
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "IntentRouter":
+        """Build a router from INTENT_ROUTER_PATH / INTENT_ROUTER_MIN_SCORE / INTENT_ROUTER_MIN_MARGIN."""
+        kwargs.setdefault("path", os.getenv("INTENT_ROUTER_PATH") or None)
+        kwargs.setdefault("min_score", float(os.getenv("INTENT_ROUTER_MIN_SCORE", "1.0")))
+        kwargs.setdefault("min_margin", float(os.getenv("INTENT_ROUTER_MIN_MARGIN", "2.0")))
+        return cls(**kwargs)
+
+    @property
+    def table(self) -> Table:
+        """Learned weights, loaded from disk on first use."""
+        if self._learned is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._learned = json.load(f)
+            except FileNotFoundError:
+                self._learned = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable intent table {self.path}: {e}")
+                self._learned = {}
+        return self._learned
+
+    def seed(self, documents: Iterable[Dict[str, Any]], launchable: Callable[[Dict[str, Any]], bool]) -> int:
+        """Add catalog hints from server documents (``_source`` dicts with an ``id``).
+
+        Only servers ``launchable`` accepts are routed to. Terms that appear
+        in more than 5% of them (e.g. a catch-all category) are ignored.
+        """
+        seeds: Table = defaultdict(dict)
+        servers = 0
+        for doc in documents:
+            if not doc.get("id") or not launchable(doc):
+                continue
+            servers += 1
+            weighted = [(doc.get("name", ""), NAME_WEIGHT)]
+            weighted += [(category, CATEGORY_WEIGHT) for category in _categories(doc.get("categories"))]
+            weighted += [(text, TOOL_WEIGHT) for text in _tool_text(doc.get("tools"))]
+            for text, weight in weighted:
+                for term in set(analyze(text)):
+                    seeds[term][doc["id"]] = max(seeds[term].get(doc["id"], 0.0), weight)
+        limit = max(servers * 0.05, 1)
+        for term, targets in seeds.items():
+            if len(targets) <= limit:
+                self._seeded[term].update(targets)
+        return servers
+
+    def learn(self, message: str, target: str) -> None:
+        """Record that ``target`` served ``message`` successfully."""
+        table = self.table
+        for term in set(analyze(message)):
+            targets = table.setdefault(term, {})
+            targets[target] = min(targets.get(target, 0.0) + LEARNED_WEIGHT, MAX_WEIGHT)
+        self.learned += 1
+        self._dirty = True
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.flush()
+            return
+        if self._save_task is None or self._save_task.done():
+            self._save_task = loop.create_task(self._save_later())
+
+    def scores(self, message: str) -> Dict[str, float]:
+        scores: Dict[str, float] = defaultdict(float)
+        for term in set(analyze(message)):
+            combined: Dict[str, float] = dict(self._seeded.get(term, {}))
+            for target, weight in self.table.get(term, {}).items():
+                combined[target] = combined.get(target, 0.0) + weight
+            total = sum(combined.values())
+            for target, weight in combined.items():
+                scores[target] += weight / total * math.log1p(weight)
+        return scores
+
+    def route(self, message: str) -> Optional[Tuple[str, float]]:
+        """The server to connect for ``message`` and its score, if the match is confident."""
+        ranked = sorted(self.scores(message).items(), key=lambda item: item[1], reverse=True)
+        if not ranked or ranked[0][1] < self.min_score:
+            return None
+        if len(ranked) > 1 and ranked[0][1] < self.min_margin * ranked[1][1]:
+            return None
+        self.routed += 1
+        return ranked[0]
+
+    async def _save_later(self) -> None:
+        # Entries learned while a write is under way are picked up by the next round
+        while self._dirty:
+            await asyncio.sleep(self.save_delay)
+            await self.aflush()
+
+    def flush(self) -> None:
+        """Write pending learned entries now."""
+        if self._dirty:
+            self._dirty = False
+            self._write(json.dumps(self.table))
+
+    async def aflush(self) -> None:
+        """``flush`` for the event loop: the file is written in a thread."""
+        if self._dirty:
+            self._dirty = False
+            await asyncio.to_thread(self._write, json.dumps(self.table))
+
+    async def close(self) -> None:
+        """Cancel the delayed write and write pending entries now."""
+        if self._save_task is not None:
+            self._save_task.cancel()
+            self._save_task = None
+        await self.aflush()
+
+    def _write(self, text: str) -> None:
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".intents.")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write intent table {self.path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": str(self.path),
+            "learned_terms": len(self.table),
+            "seeded_terms": len(self._seeded),
+            "routed": self.routed,
+            "learned": self.learned,
+        }
@@ -0,0 +1,297 @@
+"""
+Launch specs for catalog servers, compiled once from the ``config`` column.
+
+Catalog configs come in several shapes: a bare ``{"command", "args"}``, the
+``{"mcpServers": {name: {...}}}`` wrapper copied from client settings, a
+whole command line in ``command``, or a remote ``url``. ``compile_launch_spec``
+normalizes them into a ``LaunchSpec`` (or a reason the server cannot be started
+automatically); ``LaunchSpecTable`` does that for the whole catalog up front.
+"""
+
+import json
+import os
+import re
+import shlex
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+# Values copied from READMEs that still need the user's own input
+_PLACEHOLDER = re.compile(
+    r"(?i)(?<![a-z])your(?![a-z])|(?-i:YOUR[A-Z_])|<[^>]+>|\{[^}]*\}|x{3,}|/path/to/|\.{3,}|changeme"
+)
+_LOCAL_HOSTS = ("localhost", "127.0.0.1", "0.0.0.0")
+# Remote URLs that are documentation or examples rather than MCP endpoints
+_NOT_ENDPOINT_HOSTS = ("github.com", "example.com")
+_ENDPOINT_HINT = re.compile(r"mcp|sse", re.IGNORECASE)
+
+# Runners whose first positional argument is a package to fetch
+RUNNERS = ("npx", "uvx")
+# uvx options that take a value (so the value is not the package)
+_UVX_VALUE_OPTIONS = {
+    "--from", "--with", "--index", "--index-url", "--extra-index-url", "--default-index",
+    "--python", "-p", "--allow-insecure-host", "--with-requirements",
+}
+_NPX_VALUE_OPTIONS = {"--package", "-p", "--registry", "--cache"}
+
+# A catalog server's placeholder env value KEY is filled from MCP_SERVER_ENV_KEY,
+# or from KEY itself when KEY is listed in MCP_SERVER_ENV_ALLOW
+ENV_PREFIX = "MCP_SERVER_ENV_"
+# This app's own credentials; never passed through unprefixed, even when allowlisted
+PROTECTED_ENV = frozenset({
+    "GEMINI_API_KEY", "GOOGLE_API_KEY", "ANTHROPIC_API_KEY", "OPENAI_API_KEY",
+    "ELASTIC_API_KEY", "ELASTIC_INDEX_URL", "ELASTIC_PASSWORD", "ELASTICSEARCH_API_KEY",
+})
+
+
+def env_allowlist(value: Optional[str] = None) -> FrozenSet[str]:
+    """Env keys catalog servers may take from this process (MCP_SERVER_ENV_ALLOW, comma-separated)."""
+    if value is None:
+        value = os.getenv("MCP_SERVER_ENV_ALLOW", "")
+    return frozenset(key.strip() for key in value.split(",") if key.strip())
+
+
+def _env_value(key: str, allow: FrozenSet[str], environ: Mapping[str, str]) -> Optional[str]:
+    if ENV_PREFIX + key in environ:
+        return environ[ENV_PREFIX + key]
+    if key in allow and key not in PROTECTED_ENV:
+        return environ.get(key)
+    return None
+
+
+@dataclass(frozen=True)
+class LaunchSpec:
+    """How to start one catalog server: a local command or a remote URL."""
+
+    server_name: str
+    command: str = ""
+    args: Tuple[str, ...] = ()
+    env: Dict[str, str] = field(default_factory=dict)
+    url: str = ""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def runner(self) -> str:
+        """"npx" or "uvx" when the command fetches a package first, else ""."""
+        return self.command if self.command in RUNNERS else ""
+
+    @property
+    def package(self) -> Optional[str]:
+        """The npm or PyPI package the runner fetches (``None`` if there is none)."""
+        if not self.runner:
+            return None
+        value_options = _NPX_VALUE_OPTIONS if self.runner == "npx" else _UVX_VALUE_OPTIONS
+        args = iter(self.args)
+        for arg in args:
+            if arg in ("--package", "--from"):
+                return next(args, None)
+            if arg.startswith(("--package=", "--from=")):
+                return arg.split("=", 1)[1]
+            if arg in value_options:
+                next(args, None)
+            elif not arg.startswith("-"):
+                # A local path is not a package
+                return None if arg.startswith(("/", ".", "~")) else arg
+        return None
+
+    def mcp_config(self, extra_env: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """The server's entry for ``MCPClient``'s config."""
+        if self.url:
+            config: Dict[str, Any] = {"url": self.url}
+            if self.headers:
+                config["headers"] = dict(self.headers)
+            return config
+        config = {"command": self.command, "args": list(self.args)}
+        env = {**self.env, **(extra_env or {})}
+        if env:
+            config["env"] = env
+        return config
+
+
+def _load(config: Any) -> Any:
+    if isinstance(config, str):
+        try:
+            return json.loads(config) if config.strip() else None
+        except ValueError:
+            return None
+    return config
+
+
+def _unwrap(config: Any, server: Dict[str, Any]) -> Any:
+    """The launch entry inside an ``mcpServers`` (or single-name) wrapper."""
+    servers = config.get("mcpServers") if isinstance(config, dict) else None
+    if servers is None and isinstance(config, dict) and len(config) == 1:
+        # {"server-name": {"command": ...}} without the mcpServers key
+        (only,) = config.values()
+        if isinstance(only, dict) and ("command" in only or "url" in only):
+            servers = config
+    if not isinstance(servers, dict) or not servers:
+        return config
+    for key in (server.get("slug"), server.get("name")):
+        if key in servers:
+            return servers[key]
+    return next(iter(servers.values()))
+
+
+def _placeholders(values: Iterable[str]) -> bool:
+    return any(_PLACEHOLDER.search(value) for value in values)
+
+
+def compile_launch_spec(
+    server: Dict[str, Any],
+    default_name: str = "",
+    env_allow: Optional[Iterable[str]] = None,
+    environ: Optional[Mapping[str, str]] = None,
+) -> Union[LaunchSpec, str]:
+    """Normalize a catalog server's ``config`` (or ``install_command``) into a ``LaunchSpec``.
+
+    Returns a message instead when the server cannot be started
+    automatically: no config, a disabled entry, values still to be filled in,
+    or a pip package that needs manual setup. A placeholder environment value
+    ``KEY`` is filled from ``MCP_SERVER_ENV_KEY`` in ``environ`` (this
+    process's environment by default), or from ``KEY`` if it is in
+    ``env_allow`` (default: MCP_SERVER_ENV_ALLOW). Nothing else is passed on,
+    so a catalog entry cannot ask for the app's own credentials.
+    """
+    allow = env_allowlist() if env_allow is None else frozenset(env_allow)
+    environ = os.environ if environ is None else environ
+    server_name = server.get("slug", server.get("name", default_name))
+    entry = _unwrap(_load(server.get("config")), server)
+
+    if not isinstance(entry, dict) or not (entry.get("command") or entry.get("url")):
+        install_command = server.get("install_command")
+        if not install_command:
+            return f"No install command found for server {server_name}"
+        if install_command.startswith("pip install "):
+            return f"Server {server_name} requires pip install. Manual setup needed: {install_command}"
+        entry = {"command": install_command}
+
+    if entry.get("disabled") is True or entry.get("enabled") is False:
+        return f"Server {server_name} is disabled in its catalog config"
+
+    if entry.get("url") and not entry.get("command"):
+        url = str(entry["url"])
+        headers = {str(k): str(v) for k, v in (entry.get("headers") or {}).items()}
+        try:
+            parsed = urlparse(url)
+            host = parsed.hostname or ""
+            usable = (
+                parsed.scheme in ("http", "https")
+                and host not in _LOCAL_HOSTS
+                and not host.endswith(_NOT_ENDPOINT_HOSTS)
+                and bool(_ENDPOINT_HINT.search(host + parsed.path))
+            )
+        except ValueError:
+            usable = False
+        if not usable or _placeholders([url, *headers.values()]):
+            return f"Server {server_name} is a remote server that needs manual setup: {url}"
+        return LaunchSpec(server_name=server_name, url=url, headers=headers)
+
+    command = str(entry["command"]).strip()
+    args = [str(arg) for arg in entry.get("args") or [] if arg is not None]
+    if " " in command and not os.path.exists(command):
+        # A whole command line (or the command plus its first arguments) in "command"
+        try:
+            command, *leading = shlex.split(command)
+        except ValueError:
+            return f"Server {server_name} has an unparseable launch command: {command}"
+        args = leading + args
+
+    env = {}
+    missing = []
+    for key, value in (entry.get("env") or {}).items():
+        key, value = str(key), str(value)
+        if _placeholders([value]):
+            value = _env_value(key, allow, environ)
+            if value is None:
+                missing.append(ENV_PREFIX + key)
+                continue
+        env[key] = value
+    if missing:
+        return f"Server {server_name} needs configuration: set {', '.join(missing)}"
+    if _placeholders(args):
+        return f"Server {server_name} needs manual setup: {shlex.join([command, *args])}"
+    return LaunchSpec(server_name=server_name, command=command, args=tuple(args), env=env)
+
+
+class LaunchSpecTable:
+    """Compiled launch specs by catalog server ID.
+
+    ``compile`` fills it from the whole catalog at startup; servers found
+    later (e.g. only in Elasticsearch) are compiled on first lookup.
+    ``extra_env`` (e.g. the package cache's settings) is added to every
+    ``npx``/``uvx`` launch. With a ``package_cache``, ``preinstalled`` tells
+    which servers' packages it already holds. ``env_allow`` is passed to
+    ``compile_launch_spec``.
+    """
+
+    def __init__(
+        self,
+        extra_env: Optional[Dict[str, str]] = None,
+        package_cache: Optional[Any] = None,
+        env_allow: Optional[Iterable[str]] = None,
+    ):
+        self.extra_env = dict(extra_env or {})
+        self.package_cache = package_cache
+        self.env_allow = env_allowlist() if env_allow is None else frozenset(env_allow)
+        self._specs: Dict[str, Union[LaunchSpec, str]] = {}
+
+    @classmethod
+    def from_env(cls) -> "LaunchSpecTable":
+        """A table whose launches use the package cache set by MCP_PACKAGE_CACHE, if any."""
+        from .package_cache import PackageCache
+
+        cache = PackageCache.from_env()
+        return cls(extra_env=cache.env() if cache is not None else None, package_cache=cache)
+
+    def __len__(self) -> int:
+        return len(self._specs)
+
+    def compile(self, documents: Iterable[Dict[str, Any]]) -> int:
+        """Compile every document (``_source`` dicts with an ``id``); returns how many are launchable."""
+        for doc in documents:
+            if doc.get("id"):
+                self._specs[doc["id"]] = compile_launch_spec(doc, default_name=doc["id"], env_allow=self.env_allow)
+        return sum(isinstance(spec, LaunchSpec) for spec in self._specs.values())
+
+    def get(self, server_id: str, server: Optional[Dict[str, Any]] = None) -> Union[LaunchSpec, str]:
+        spec = self._specs.get(server_id)
+        if spec is None:
+            if server is None:
+                return f"Unknown server {server_id}"
+            spec = self._specs[server_id] = compile_launch_spec(server, default_name=server_id, env_allow=self.env_allow)
+        return spec
+
+    def launchable(self, server: Dict[str, Any]) -> bool:
+        """Whether the catalog document ``server`` can be started automatically."""
+        return isinstance(self.get(server.get("id", ""), server), LaunchSpec)
+
+    def preinstalled(self, server_id: str, server: Optional[Dict[str, Any]] = None) -> bool:
+        """Whether ``server_id`` launches a package the package cache already holds.
+
+        Unlike ``launchable``, this means the launch runs a package the
+        operator chose to fetch ahead of time (``preinstall.py``), not
+        whatever the catalog names.
+        """
+        spec = self.get(server_id, server)
+        return isinstance(spec, LaunchSpec) and self.package_cache is not None and self.package_cache.is_installed(spec)
+
+    def specs(self) -> Iterable[Tuple[str, LaunchSpec]]:
+        return ((server_id, spec) for server_id, spec in self._specs.items() if isinstance(spec, LaunchSpec))
+
+    def resolve(self, server_id: str, server: Optional[Dict[str, Any]] = None) -> Union[Tuple[str, Dict[str, Any]], str]:
+        """``(server_name, mcp_config)`` for ``server_id``, or why it cannot be started."""
+        spec = self.get(server_id, server)
+        if isinstance(spec, str):
+            return spec
+        return spec.server_name, spec.mcp_config(self.extra_env if spec.runner else None)
+
+    def stats(self) -> Dict[str, Any]:
+        specs = [spec for _, spec in self.specs()]
+        return {
+            "compiled": len(self._specs),
+            "launchable": len(specs),
+            "remote": sum(bool(spec.url) for spec in specs),
+            "npx": sum(spec.runner == "npx" for spec in specs),
+            "uvx": sum(spec.runner == "uvx" for spec in specs),
+        }
@@ -0,0 +1,321 @@
+"""
+Retries, pacing and hedging for LLM calls.
+
+A call that fails with a rate limit or a server-side error is retried with
+exponential backoff and full jitter. A rate limit's suggested delay is
+honoured, and it pauses the shared ``TokenBucket`` so every session backs off,
+not just the one that was refused. Errors that will not go away on their own
+(a bad request or API key, a blocked prompt) are returned at once. With
+hedging on, a call still running after the recent p95 latency gets a second,
+identical request, and whichever finishes first is used.
+"""
+
+import asyncio
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+from .events import emit
+from .telemetry import REGISTRY
+
+T = TypeVar("T")
+
+RATE_LIMITED = "rate_limited"
+TRANSIENT = "transient"
+FATAL = "fatal"
+
+_TRANSIENT_CODES = {408, 499, 500, 502, 503, 504}
+# google.api_core exception names (gRPC and REST transports alike) for errors worth retrying
+_RATE_LIMIT_NAMES = ("ResourceExhausted", "TooManyRequests")
+_TRANSIENT_NAMES = ("ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout", "Aborted", "Timeout")
+# "retry_delay { seconds: 17 }" in a quota error's details, or "Please retry in 17.5s."
+_RETRY_DELAY = re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)|retry in ([\d.]+)\s*s", re.IGNORECASE)
+
+RETRIES = REGISTRY.counter("llm_retries_total", "LLM calls retried, by error class.", labels=("reason",))
+HEDGES = REGISTRY.counter("llm_hedged_requests_total", "Hedged LLM requests, by which request finished first.", labels=("winner",))
+
+
+def classify_error(error: BaseException) -> str:
+    """``RATE_LIMITED``, ``TRANSIENT`` (worth retrying) or ``FATAL``."""
+    code = getattr(error, "code", None)
+    code = code if isinstance(code, int) else None
+    name = type(error).__name__
+    if code == 429 or name in _RATE_LIMIT_NAMES:
+        return RATE_LIMITED
+    if code in _TRANSIENT_CODES or isinstance(error, (TimeoutError, ConnectionError)) or name in _TRANSIENT_NAMES:
+        return TRANSIENT
+    return FATAL
+
+
+def suggested_delay(error: BaseException) -> Optional[float]:
+    """The delay a rate-limited response asked for, if it gave one."""
+    delay = getattr(error, "retry_after", None)
+    if isinstance(delay, (int, float)):
+        return float(delay)
+    match = _RETRY_DELAY.search(str(error))
+    return float(match.group(1) or match.group(2)) if match else None
+
+
+class TokenBucket:
+    """Paces calls to ``rate`` per second on average, in bursts of up to ``burst``.
+
+    Shared by every session (and thread) so the process as a whole stays
+    under the provider's quota. ``rate`` 0 means no limit; ``pause`` still
+    holds every call back after a rate-limit response.
+    """
+
+    def __init__(self, rate: float = 0.0, burst: int = 10, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.delayed = 0
+        self.delayed_seconds = 0.0
+        self.pauses = 0
+
+    def reserve(self) -> float:
+        """Take a token; returns how many seconds to wait before using it."""
+        with self._lock:
+            now = self._clock()
+            wait = max(self._paused_until - now, 0.0)
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                # Tokens can go negative: later callers queue up behind the debt
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+            if wait > 0:
+                self.delayed += 1
+                self.delayed_seconds += wait
+            return wait
+
+    def try_acquire(self) -> bool:
+        """Take a token only if one is available right now."""
+        with self._lock:
+            now = self._clock()
+            if now < self._paused_until:
+                return False
+            if self.rate <= 0:
+                return True
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    async def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def acquire_sync(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    def pause(self, seconds: float) -> None:
+        """Hold every call back for ``seconds`` (e.g. after a 429)."""
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+            self.pauses += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "burst": self.burst,
+            "delayed": self.delayed,
+            "delayed_seconds": round(self.delayed_seconds, 3),
+            "pauses": self.pauses,
+        }
+
+
+class LLMCallPolicy:
+    """Runs LLM calls with classified retries, shared pacing and optional hedging.
+
+    Up to ``max_attempts`` tries per call; retry ``n`` waits a random delay
+    of up to ``base_delay * 2**(n-1)`` seconds (capped at ``max_delay``), or
+    longer if a rate limit asked for it. Hedging starts once ``min_samples``
+    latencies have been seen; the second request goes out after the
+    ``hedge_quantile`` latency (but no sooner than ``hedge_min_delay``).
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        bucket: Optional[TokenBucket] = None,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_delay: float = 0.1,
+        min_samples: int = 20,
+        rng: Callable[[], float] = random.random,
+    ):
+        self.max_attempts = max(max_attempts, 1)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.bucket = bucket if bucket is not None else TokenBucket()
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_delay = hedge_min_delay
+        self.min_samples = min_samples
+        self._rng = rng
+        self._latencies: Deque[float] = deque(maxlen=200)
+        self.calls = 0
+        self.errors: Counter = Counter()
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "LLMCallPolicy":
+        """Build from LLM_MAX_ATTEMPTS / LLM_RETRY_BASE_DELAY / LLM_RETRY_MAX_DELAY,
+        LLM_RATE_LIMIT / LLM_BURST (the token bucket) and LLM_HEDGE / LLM_HEDGE_QUANTILE."""
+        kwargs.setdefault("max_attempts", int(os.getenv("LLM_MAX_ATTEMPTS", "3")))
+        kwargs.setdefault("base_delay", float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5")))
+        kwargs.setdefault("max_delay", float(os.getenv("LLM_RETRY_MAX_DELAY", "20")))
+        if "bucket" not in kwargs:
+            kwargs["bucket"] = TokenBucket(
+                rate=float(os.getenv("LLM_RATE_LIMIT", "0")), burst=int(os.getenv("LLM_BURST", "10"))
+            )
+        kwargs.setdefault("hedge", os.getenv("LLM_HEDGE", "false").lower() in ("1", "true", "yes"))
+        kwargs.setdefault("hedge_quantile", float(os.getenv("LLM_HEDGE_QUANTILE", "0.95")))
+        return cls(**kwargs)
+
+    def backoff(self, attempt: int, error: BaseException) -> float:
+        """Seconds to wait before retrying after failed ``attempt`` (1-based)."""
+        delay = self._rng() * min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if classify_error(error) == RATE_LIMITED:
+            delay = max(delay, suggested_delay(error) or 0.0)
+        return delay
+
+    def hedge_delay(self) -> Optional[float]:
+        """When to send the hedge request, or ``None`` while there are too few samples."""
+        if not self.hedge or len(self._latencies) < self.min_samples:
+            return None
+        latencies = sorted(self._latencies)
+        index = min(int(len(latencies) * self.hedge_quantile), len(latencies) - 1)
+        return max(latencies[index], self.hedge_min_delay)
+
+    def _retry_delay(self, attempt: int, error: Exception) -> Optional[float]:
+        """Record a failed attempt; the delay before the next one, or ``None`` to give up."""
+        kind = classify_error(error)
+        self.errors[kind] += 1
+        if kind == FATAL or attempt >= self.max_attempts:
+            return None
+        delay = self.backoff(attempt, error)
+        if kind == RATE_LIMITED:
+            # The quota is the process's, not this session's
+            self.bucket.pause(delay)
+        self.retries += 1
+        RETRIES.inc(1, kind)
+        emit("llm_retry", attempt=attempt, reason=kind, delay=round(delay, 3), error=str(error))
+        return delay
+
+    async def call(self, fn: Callable[[], Awaitable[T]], discard: Optional[Callable[[T], Any]] = None) -> T:
+        """``await fn()`` under the policy; the last error is raised when retries run out.
+
+        ``discard`` receives the result of a hedged request that lost the
+        race but finished anyway (e.g. to close a stream).
+        """
+        self.calls += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            await self.bucket.acquire()
+            try:
+                return await self._hedged(fn, discard)
+            except Exception as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            await asyncio.sleep(delay)
+
+    def call_sync(self, fn: Callable[[], T]) -> T:
+        """``fn()`` under the policy, without hedging (for blocking callers)."""
+        self.calls += 1
+        attempt = 0
+        while True:
+            attempt += 1
+            self.bucket.acquire_sync()
+            start = time.perf_counter()
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._retry_delay(attempt, e)
+                if delay is None:
+                    raise
+            else:
+                self._latencies.append(time.perf_counter() - start)
+                return result
+            time.sleep(delay)
+
+    async def _timed(self, fn: Callable[[], Awaitable[T]]) -> T:
+        start = time.perf_counter()
+        result = await fn()
+        self._latencies.append(time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]], discard: Optional[Callable[[T], Any]]) -> T:
+        delay = self.hedge_delay()
+        if delay is None:
+            return await self._timed(fn)
+        start = time.perf_counter()
+        first = asyncio.ensure_future(self._timed(fn))
+        pending = {first}
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return first.result()
+            # Only hedge when the bucket has a token to spare right away
+            if not self.bucket.try_acquire():
+                return await first
+            self.hedged += 1
+            second = asyncio.ensure_future(self._timed(fn))
+            pending.add(second)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [task for task in done if task.exception() is None]
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                if winners:
+                    winner = winners[0]
+                    for task in winners[1:]:
+                        outcome = discard(task.result()) if discard is not None else None
+                        if asyncio.iscoroutine(outcome):
+                            await outcome
+                    HEDGES.inc(1, "hedge" if winner is second else "original")
+                    self.hedge_wins += winner is second
+                    return winner.result()
+            raise error
+        finally:
+            # The slower request is not needed any more
+            for task in pending:
+                task.cancel()
+            if first in pending:
+                # Its latency so far, so the tail it was part of stays in the estimate
+                self._latencies.append(time.perf_counter() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "errors": dict(self.errors),
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay": self.hedge_delay(),
+            "p95_latency": latencies[min(int(len(latencies) * 0.95), len(latencies) - 1)] if latencies else None,
+            "bucket": self.bucket.stats(),
+        }
@@ -0,0 +1,176 @@
+"""
+In-process BM25 search over the bundled server catalog CSV.
+
+Mirrors the function_score query that the Elasticsearch backend runs, so the
+agent gets the same ranking without a network round trip.
+"""
+
+import csv
+import heapq
+import math
+import os
+from array import array
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .text import tokenize
+
+DEFAULT_DATASET_PATH = Path(__file__).resolve().parent.parent / "server_dataset" / "public_servers_rows.csv"
+
+# Same fields and boosts as the multi_match in the Elasticsearch query
+FIELD_BOOSTS: Dict[str, float] = {"name": 5.0, "description": 3.0, "slug": 1.0, "namespace": 1.0}
+
+# Lucene BM25 defaults
+K1 = 1.2
+B = 0.75
+
+
+def _parse_row(row: Dict[str, str]) -> Dict[str, Any]:
+    """Coerce the CSV columns that the ranking and results depend on."""
+    source: Dict[str, Any] = dict(row)
+    try:
+        source["github_stars"] = int(row.get("github_stars") or 0)
+    except ValueError:
+        source["github_stars"] = 0
+    source["usable"] = str(row.get("usable", "")).lower() == "true"
+    return source
+
+
+class _FieldIndex:
+    """Postings for a single text field, stored as compact parallel arrays."""
+
+    def __init__(self, docs: List[List[str]]):
+        postings: Dict[str, Tuple[array, array]] = {}
+        self.lengths = array("I", (len(tokens) for tokens in docs))
+        for doc_id, tokens in enumerate(docs):
+            for term, tf in Counter(tokens).items():
+                if term not in postings:
+                    postings[term] = (array("I"), array("H"))
+                ids, tfs = postings[term]
+                ids.append(doc_id)
+                tfs.append(min(tf, 0xFFFF))
+        self.postings = postings
+        # Lucene only counts documents that actually have the field
+        with_field = sum(1 for n in self.lengths if n)
+        self.doc_count = with_field
+        self.avg_length = (sum(self.lengths) / with_field) if with_field else 0.0
+
+    def idf(self, term: str) -> float:
+        ids = self.postings.get(term)
+        if not ids:
+            return 0.0
+        n = len(ids[0])
+        return math.log(1 + (self.doc_count - n + 0.5) / (n + 0.5))
+
+    def score(self, terms: List[str], boost: float, out: Dict[int, float]) -> None:
+        """Add this field's BM25 score for ``terms`` into ``out`` (per doc)."""
+        avg = self.avg_length or 1.0
+        for term in terms:
+            entry = self.postings.get(term)
+            if not entry:
+                continue
+            weight = boost * self.idf(term)
+            ids, tfs = entry
+            for doc_id, tf in zip(ids, tfs):
+                norm = K1 * (1 - B + B * self.lengths[doc_id] / avg)
+                out[doc_id] = out.get(doc_id, 0.0) + weight * tf / (tf + norm)
+
+
+class LocalSearchIndex:
+    """Inverted index over the catalog CSV with Elasticsearch-compatible hits.
+
+    Reproduces ``multi_match`` (best_fields) over name^5, description^3, slug
+    and namespace, multiplied by the sum of a 2.0 ``usable`` boost and
+    ``log1p(github_stars)`` (base-10, as Elasticsearch computes it).
+    """
+
+    def __init__(self, rows: List[Dict[str, str]], path: Optional[Path] = None):
+        self.path = path
+        self.documents: List[Dict[str, Any]] = [_parse_row(row) for row in rows]
+        self._ids: Dict[str, int] = {doc.get("id", ""): i for i, doc in enumerate(self.documents)}
+        self._fields: Dict[str, _FieldIndex] = {
+            field: _FieldIndex([tokenize(doc.get(field, "")) for doc in self.documents])
+            for field in FIELD_BOOSTS
+        }
+        self._embeddings = None
+        self._function_scores = array(
+            "d",
+            (
+                (2.0 if doc["usable"] else 0.0) + math.log10(1 + max(doc["github_stars"], 0))
+                for doc in self.documents
+            ),
+        )
+
+    @classmethod
+    def from_csv(cls, path: Optional[os.PathLike] = None) -> "LocalSearchIndex":
+        csv_path = Path(path) if path else DEFAULT_DATASET_PATH
+        with open(csv_path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        return cls(rows, path=csv_path)
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def _hit(self, doc_id: int, score: Optional[float] = None) -> Dict[str, Any]:
+        doc = self.documents[doc_id]
+        return {"_index": "local", "_id": doc.get("id", str(doc_id)), "_score": score, "_source": doc}
+
+    def search(self, query: str, size: int = 5) -> List[Dict[str, Any]]:
+        """Return the top ``size`` hits for ``query``, best first."""
+        terms = tokenize(query)
+        if not terms:
+            return []
+
+        # best_fields: a document's query score is its best single-field score
+        best: Dict[int, float] = {}
+        for field, boost in FIELD_BOOSTS.items():
+            field_scores: Dict[int, float] = {}
+            self._fields[field].score(terms, boost, field_scores)
+            for doc_id, score in field_scores.items():
+                if score > best.get(doc_id, 0.0):
+                    best[doc_id] = score
+
+        scored = (
+            (score * self._function_scores[doc_id], doc_id)
+            for doc_id, score in best.items()
+        )
+        top = heapq.nlargest(size, scored, key=lambda item: (item[0], -item[1]))
+        return [self._hit(doc_id, score) for score, doc_id in top]
+
+    def popular(self, size: int = 5) -> List[Dict[str, Any]]:
+        """Usable servers, most-starred first."""
+        usable = (i for i, doc in enumerate(self.documents) if doc["usable"])
+        top = heapq.nlargest(size, usable, key=lambda i: self.documents[i]["github_stars"])
+        return [self._hit(doc_id) for doc_id in top]
+
+    @property
+    def embeddings_ready(self) -> bool:
+        return self._embeddings is not None
+
+    @property
+    def embeddings(self):
+        """Dense embeddings of every document, fitted on first use."""
+        if self._embeddings is None:
+            from .embeddings import ServerEmbeddings
+
+            self._embeddings = ServerEmbeddings(self.documents)
+        return self._embeddings
+
+    def vector_search(self, query: str, size: int = 5) -> List[Dict[str, Any]]:
+        """Return the ``size`` documents nearest to ``query`` in embedding space."""
+        return [self._hit(doc_id, score) for doc_id, score in self.embeddings.search(query, size)]
+
+    def get(self, server_id: str) -> Optional[Dict[str, Any]]:
+        """Look a server up by its catalog ``id``; returns a hit or None."""
+        doc_id = self._ids.get(server_id)
+        if doc_id is None:
+            return None
+        return self._hit(doc_id)
+
+
+@lru_cache(maxsize=None)
+def load_local_index(path: Optional[str] = None) -> LocalSearchIndex:
+    """Load (once per process) the index for the given CSV path."""
+    return LocalSearchIndex.from_csv(path)
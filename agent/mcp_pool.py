@@ -0,0 +1,503 @@
+"""
+A managed pool of MCP server processes around ``MCPClient``.
+
+Servers are spawned on first use (or pre-warmed at startup), capped at
+``max_live`` processes, reaped after ``idle_timeout`` seconds without use,
+and health-checked in the background. Tools are bound to a
+``PooledConnector`` instead of a raw connector, so they keep working when
+the process behind them is reaped or respawned.
+
+With a ``ToolSchemaCache`` the tool list of a known server is served from
+disk, and the process is only started when a tool is actually called.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import timedelta
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from mcp.types import CallToolResult, GetPromptResult, Prompt, ReadResourceResult, Resource, Tool
+from mcp_use.client import MCPClient
+from mcp_use.connectors.base import BaseConnector
+from mcp_use.session import MCPSession
+
+from .schema_cache import ToolSchemaCache
+from .telemetry import span
+
+logger = logging.getLogger(__name__)
+
+
+class PoolExhaustedError(RuntimeError):
+    """Every live server slot is busy."""
+
+
+@dataclass
+class _Server:
+    name: str
+    config: Dict[str, Any]
+    keep_warm: bool = False
+    session: Optional[MCPSession] = None
+    tools: Optional[List[Tool]] = None
+    # As last listed by a live session; unknown until the process has run once
+    resources: List[Resource] = field(default_factory=list)
+    prompts: List[Prompt] = field(default_factory=list)
+    last_used: float = 0.0
+    in_use: int = 0
+    # Agents that currently expose this server's tools
+    holders: int = 0
+    spawns: int = 0
+    # Holds a pool slot while the process is being started
+    starting: bool = False
+    # The running process was started from a config that has since been replaced
+    stale: bool = False
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+class PooledConnector(BaseConnector):
+    """Connector that routes every call through the pool.
+
+    The pool (re)spawns the server process on demand, so a tool holding this
+    connector survives idle reaping and crash respawns.
+    """
+
+    def __init__(self, pool: "MCPServerPool", server_name: str):
+        super().__init__()
+        self.pool = pool
+        self.server_name = server_name
+        # Exposed tool name -> the server's own name, for tools renamed to avoid collisions
+        self.aliases: Dict[str, str] = {}
+
+    @property
+    def public_identifier(self) -> str:
+        return f"pool:{self.server_name}"
+
+    @property
+    def tools(self) -> Optional[List[Tool]]:
+        return self.pool.cached_tools(self.server_name)
+
+    @property
+    def is_connected(self) -> bool:
+        return self.pool.is_live(self.server_name)
+
+    async def connect(self) -> None:
+        await self.pool.acquire(self.server_name)
+
+    async def disconnect(self) -> None:
+        # The pool owns the process; idle reaping will stop it
+        pass
+
+    async def initialize(self) -> Dict[str, Any]:
+        session = await self.pool.acquire(self.server_name)
+        return session.session_info or {}
+
+    async def list_tools(self) -> List[Tool]:
+        if self.pool.cached_tools(self.server_name) is None:
+            await self.pool.acquire(self.server_name)
+        return self.pool.cached_tools(self.server_name) or []
+
+    async def list_resources(self) -> List[Resource]:
+        # Servers only known from the schema cache are not started to list these
+        return self.pool.cached_resources(self.server_name)
+
+    async def list_prompts(self) -> List[Prompt]:
+        return self.pool.cached_prompts(self.server_name)
+
+    async def read_resource(self, uri: Any) -> ReadResourceResult:
+        session = await self.pool.acquire(self.server_name)
+        return await session.connector.read_resource(uri)
+
+    async def get_prompt(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> GetPromptResult:
+        session = await self.pool.acquire(self.server_name)
+        return await session.connector.get_prompt(name, arguments)
+
+    async def call_tool(
+        self, name: str, arguments: Dict[str, Any], read_timeout_seconds: Optional[timedelta] = None
+    ) -> CallToolResult:
+        name = self.aliases.get(name, name)
+        return await self.pool.call_tool(self.server_name, name, arguments, read_timeout_seconds)
+
+
+class MCPServerPool:
+    """Spawns, caps, reaps and health-checks MCP server processes.
+
+    Sessions live in ``client`` as usual (``client.get_session`` keeps
+    working); the pool decides when they are created and closed. Servers
+    registered with ``keep_warm`` (the pre-warmed ones) are exempt from idle
+    reaping and are respawned eagerly when a health check fails.
+    """
+
+    def __init__(
+        self,
+        client: MCPClient,
+        max_live: int = 8,
+        idle_timeout: float = 600.0,
+        health_interval: float = 30.0,
+        ping_timeout: float = 5.0,
+        schema_cache: Optional[ToolSchemaCache] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.client = client
+        self.schema_cache = schema_cache
+        self.max_live = max_live
+        self.idle_timeout = idle_timeout
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self._clock = clock
+        self._servers: Dict[str, _Server] = {}
+        self._connectors: Dict[str, PooledConnector] = {}
+        self._spawn_latencies: Deque[float] = deque(maxlen=100)
+        self._maintenance: Optional[asyncio.Task] = None
+        self._refreshes: set = set()
+        self.respawns = 0
+        self.reaped = 0
+        self.evictions = 0
+        self.released = 0
+        self.retired = 0
+
+    @classmethod
+    def from_env(cls, client: MCPClient, **kwargs: Any) -> "MCPServerPool":
+        """Build a pool from MCP_MAX_LIVE_SERVERS / MCP_IDLE_TIMEOUT / MCP_HEALTH_INTERVAL."""
+        kwargs.setdefault("max_live", int(os.getenv("MCP_MAX_LIVE_SERVERS", "8")))
+        kwargs.setdefault("idle_timeout", float(os.getenv("MCP_IDLE_TIMEOUT", "600")))
+        kwargs.setdefault("health_interval", float(os.getenv("MCP_HEALTH_INTERVAL", "30")))
+        if "schema_cache" not in kwargs:
+            kwargs["schema_cache"] = ToolSchemaCache.from_env()
+        return cls(client, **kwargs)
+
+    def register(
+        self,
+        name: str,
+        config: Dict[str, Any],
+        keep_warm: bool = False,
+        seed_tools: Optional[List[Tool]] = None,
+    ) -> None:
+        """Declare how to launch ``name``; nothing is spawned yet.
+
+        Its tools come from the schema cache, else from ``seed_tools`` (e.g.
+        the catalog's ``tools`` column); either is replaced by the live list
+        once the server runs. A stale cache entry is refreshed in the background.
+
+        Re-registering ``name`` with a different config replaces it: tools
+        known from the old config are dropped and its process is retired.
+        """
+        server = self._servers.get(name)
+        if server is None:
+            server = self._servers[name] = _Server(name=name, config=config, keep_warm=keep_warm)
+        else:
+            server.keep_warm = server.keep_warm or keep_warm
+            if server.config != config:
+                server.config = config
+                server.tools = None
+                server.resources, server.prompts = [], []
+                if server.session is not None:
+                    server.stale = True
+                    self._retire_in_background(server)
+                self.client.add_server(name, config)
+        if name not in self.client.get_server_names():
+            self.client.add_server(name, config)
+        if server.tools is None:
+            cached = self.schema_cache.get(config) if self.schema_cache else None
+            if cached is not None:
+                server.tools = cached
+                if self.schema_cache.is_stale(config):
+                    self._refresh_in_background(name)
+            elif seed_tools:
+                server.tools = list(seed_tools)
+
+    def _refresh_in_background(self, name: str) -> None:
+        async def refresh() -> None:
+            try:
+                await self.acquire(name)
+            except Exception as e:
+                logger.warning(f"Could not refresh tool schemas for '{name}': {e}")
+
+        try:
+            task = asyncio.get_running_loop().create_task(refresh())
+        except RuntimeError:
+            return
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    def _retire_in_background(self, server: _Server) -> None:
+        """Stop a process started from a replaced config once it is idle.
+
+        A busy one keeps serving its current call and is swapped out by the
+        next ``acquire``.
+        """
+        async def retire() -> None:
+            async with server.lock:
+                if server.stale and server.session is not None and not server.in_use:
+                    await self._retire(server)
+
+        try:
+            task = asyncio.get_running_loop().create_task(retire())
+        except RuntimeError:
+            return
+        self._refreshes.add(task)
+        task.add_done_callback(self._refreshes.discard)
+
+    async def _retire(self, server: _Server) -> None:
+        await self._stop(server)
+        server.stale = False
+        self.retired += 1
+        logger.info(f"Retired MCP server '{server.name}' started from a replaced config")
+
+    def connector(self, name: str) -> PooledConnector:
+        """The stable connector to build LangChain tools from."""
+        if name not in self._connectors:
+            self._connectors[name] = PooledConnector(self, name)
+        return self._connectors[name]
+
+    def cached_tools(self, name: str) -> Optional[List[Tool]]:
+        server = self._servers.get(name)
+        return server.tools if server else None
+
+    def cached_resources(self, name: str) -> List[Resource]:
+        server = self._servers.get(name)
+        return list(server.resources) if server else []
+
+    def cached_prompts(self, name: str) -> List[Prompt]:
+        server = self._servers.get(name)
+        return list(server.prompts) if server else []
+
+    def is_live(self, name: str) -> bool:
+        server = self._servers.get(name)
+        return bool(server and server.session and server.session.is_connected and not server.stale)
+
+    def _live(self) -> List[_Server]:
+        return [server for server in self._servers.values() if server.session is not None]
+
+    def _occupied(self) -> int:
+        """Slots taken: live processes plus those still starting."""
+        return sum(1 for server in self._servers.values() if server.session is not None or server.starting)
+
+    @property
+    def free_slots(self) -> int:
+        """Processes that can start without evicting a running one."""
+        return max(self.max_live - self._occupied(), 0)
+
+    async def acquire(self, name: str, evict: bool = True) -> MCPSession:
+        """Return a live session for ``name``, spawning the process if needed.
+
+        Without ``evict`` a spawn that needs an idle server stopped raises
+        ``PoolExhaustedError`` instead.
+        """
+        server = self._servers.get(name)
+        if server is None:
+            raise ValueError(f"MCP server '{name}' is not registered")
+        server.last_used = self._clock()
+        if self.is_live(name):
+            return server.session
+        async with server.lock:
+            if self.is_live(name):
+                return server.session
+            if server.stale:
+                await self._retire(server)
+            elif server.session is not None:
+                # The process died under us
+                await self._stop(server)
+                self.respawns += 1
+            await self._make_room(evict)
+            # Claimed with no await since _make_room's check, so concurrent spawns cannot overshoot max_live
+            server.starting = True
+            try:
+                await self._spawn(server)
+            finally:
+                server.starting = False
+            return server.session
+
+    async def _spawn(self, server: _Server) -> None:
+        start = time.perf_counter()
+        with span("mcp.spawn", server=server.name):
+            session = await self.client.create_session(server.name)
+        self._spawn_latencies.append(time.perf_counter() - start)
+        server.session = session
+        server.tools = list(session.connector.tools or [])
+        # Listed by the connector's initialize()
+        server.resources = list(getattr(session.connector, "_resources", None) or [])
+        server.prompts = list(getattr(session.connector, "_prompts", None) or [])
+        if self.schema_cache is not None:
+            await self.schema_cache.aput(server.config, server.tools, server=server.name)
+        server.spawns += 1
+        server.last_used = self._clock()
+        logger.info(f"Started MCP server '{server.name}' in {self._spawn_latencies[-1]:.2f}s")
+
+    async def _stop(self, server: _Server) -> None:
+        server.session = None
+        try:
+            await self.client.close_session(server.name)
+        except Exception as e:
+            logger.warning(f"Error stopping MCP server '{server.name}': {e}")
+
+    async def _make_room(self, evict: bool = True) -> None:
+        """Stop least recently used idle servers until a slot is free.
+
+        Slots of servers still starting count as taken; the caller must claim
+        the freed slot before its next ``await``.
+        """
+        occupied = self._occupied()
+        if occupied < self.max_live:
+            return
+        if evict:
+            idle = sorted(
+                (server for server in self._live() if not server.in_use and not server.keep_warm),
+                key=lambda server: server.last_used,
+            )
+            for server in idle[: occupied - self.max_live + 1]:
+                await self._stop(server)
+                self.evictions += 1
+        if self._occupied() >= self.max_live:
+            raise PoolExhaustedError(
+                f"All {self.max_live} MCP server slots are busy; try again shortly"
+            )
+
+    def retain(self, name: str) -> None:
+        """Record that an agent now exposes ``name``'s tools."""
+        self._servers[name].holders += 1
+
+    async def release(self, name: str, stop: bool = True) -> None:
+        """Undo one ``retain``.
+
+        With ``stop``, a server no agent holds any more is stopped right away
+        (unless busy or kept warm) instead of waiting for idle reaping.
+        """
+        server = self._servers.get(name)
+        if server is None:
+            return
+        server.holders = max(server.holders - 1, 0)
+        if stop and not server.holders and not server.in_use and not server.keep_warm and server.session is not None:
+            await self._stop(server)
+            self.released += 1
+
+    async def discard(self, name: str) -> bool:
+        """Stop ``name`` if no agent holds it and it is idle (e.g. an unused speculative start)."""
+        server = self._servers.get(name)
+        if server is None or server.holders or server.in_use or server.keep_warm or server.session is None:
+            return False
+        await self._stop(server)
+        self.released += 1
+        return True
+
+    async def call_tool(
+        self,
+        name: str,
+        tool: str,
+        arguments: Dict[str, Any],
+        read_timeout_seconds: Optional[timedelta] = None,
+    ) -> CallToolResult:
+        """Call ``tool`` on server ``name``, respawning it once if it has died."""
+        server = self._servers[name]
+        server.in_use += 1
+        try:
+            with span("mcp.call_tool", server=name, tool=tool):
+                session = await self.acquire(name)
+                try:
+                    return await session.connector.call_tool(tool, arguments, read_timeout_seconds)
+                except Exception:
+                    if session.is_connected:
+                        raise
+                    logger.warning(f"MCP server '{name}' died during '{tool}', respawning")
+                    session = await self.acquire(name)
+                    return await session.connector.call_tool(tool, arguments, read_timeout_seconds)
+        finally:
+            server.in_use -= 1
+            server.last_used = self._clock()
+
+    async def prewarm(self, servers: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, bool]:
+        """Register and start ``(name, config)`` pairs concurrently; returns name -> started."""
+        servers = list(servers)[: self.max_live]
+        for name, config in servers:
+            self.register(name, config, keep_warm=True)
+        results = await asyncio.gather(
+            *(self.acquire(name) for name, _ in servers), return_exceptions=True
+        )
+        started = {}
+        for (name, _), result in zip(servers, results):
+            started[name] = not isinstance(result, BaseException)
+            if not started[name]:
+                logger.warning(f"Could not pre-warm MCP server '{name}': {result}")
+        return started
+
+    async def reap(self) -> None:
+        """Stop servers that have been idle longer than ``idle_timeout``."""
+        now = self._clock()
+        for server in self._live():
+            if server.keep_warm or server.in_use:
+                continue
+            if now - server.last_used > self.idle_timeout:
+                await self._stop(server)
+                self.reaped += 1
+
+    async def _healthy(self, server: _Server) -> bool:
+        session = server.session
+        if session is None or not session.is_connected:
+            return False
+        try:
+            await asyncio.wait_for(session.connector.client_session.send_ping(), self.ping_timeout)
+            return True
+        except Exception:
+            return False
+
+    async def check_health(self) -> None:
+        """Ping every idle live server; drop dead ones and respawn the warm ones."""
+        for server in self._live():
+            if server.in_use or await self._healthy(server):
+                continue
+            logger.warning(f"MCP server '{server.name}' failed its health check")
+            await self._stop(server)
+            if server.keep_warm:
+                try:
+                    await self.acquire(server.name)
+                except Exception as e:
+                    logger.warning(f"Could not respawn MCP server '{server.name}': {e}")
+            # Others respawn lazily on their next call
+
+    def start(self) -> None:
+        """Run reaping and health checks every ``health_interval`` seconds."""
+        async def loop() -> None:
+            while True:
+                await asyncio.sleep(self.health_interval)
+                try:
+                    await self.reap()
+                    await self.check_health()
+                except Exception as e:
+                    logger.warning(f"MCP pool maintenance failed: {e}")
+
+        if self._maintenance is None:
+            self._maintenance = asyncio.create_task(loop())
+
+    async def close(self) -> None:
+        """Stop maintenance and every server process."""
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            self._maintenance = None
+        for server in self._live():
+            await self._stop(server)
+
+    def stats(self) -> Dict[str, Any]:
+        live = self._live()
+        latencies = sorted(self._spawn_latencies)
+        return {
+            "registered": len(self._servers),
+            "live": len(live),
+            "starting": sum(1 for server in self._servers.values() if server.starting),
+            "busy": sum(1 for server in live if server.in_use),
+            "idle": sum(1 for server in live if not server.in_use),
+            "max_live": self.max_live,
+            "spawns": sum(server.spawns for server in self._servers.values()),
+            "respawns": self.respawns,
+            "reaped": self.reaped,
+            "evictions": self.evictions,
+            "released": self.released,
+            "retired": self.retired,
+            "schema_cache": self.schema_cache.stats() if self.schema_cache else None,
+            "spawn_latency": {
+                "last": self._spawn_latencies[-1] if latencies else None,
+                "avg": sum(latencies) / len(latencies) if latencies else None,
+                "max": latencies[-1] if latencies else None,
+            },
+        }
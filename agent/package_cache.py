@@ -0,0 +1,149 @@
+"""
+A local npm/uv package cache for catalog servers launched with npx or uvx.
+
+A first ``npx -y some-mcp-server`` spends seconds resolving and downloading
+the package before the server even starts. ``preinstall.py`` fetches the
+packages of popular servers into this cache ahead of time, and launches made
+with ``env()`` read from it, so connecting costs little more than starting
+the process.
+"""
+
+import asyncio
+import os
+import re
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from .launch_specs import LaunchSpec
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "mcp-use-elastic" / "packages"
+
+# Where a PyPI requirement's name ends: extras, version specifiers, URLs, markers
+_PYPI_NAME_END = re.compile(r"[\[<>=!~@; ]")
+
+
+def package_name(spec: LaunchSpec) -> Optional[str]:
+    """``spec``'s package without its version (``@scope/pkg@1.2`` -> ``@scope/pkg``)."""
+    package = spec.package
+    if not package:
+        return None
+    if spec.runner == "npx":
+        return package[0] + package[1:].split("@", 1)[0]
+    # uv names tool directories after the normalized project name
+    return re.sub(r"[-_.]+", "-", _PYPI_NAME_END.split(package, 1)[0]).lower() or None
+
+
+class PackageCache:
+    """npm and uv caches under ``directory``, optionally fed from local registries.
+
+    ``npm_registry`` and ``pypi_index`` point package resolution at another
+    registry, e.g. a local mirror or ``bench/npm_registry.py`` in tests.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[os.PathLike] = None,
+        npm_registry: Optional[str] = None,
+        pypi_index: Optional[str] = None,
+        timeout: float = 300.0,
+    ):
+        self.directory = Path(directory) if directory else DEFAULT_CACHE_DIR
+        self.npm_registry = npm_registry
+        self.pypi_index = pypi_index
+        self.timeout = timeout
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> Optional["PackageCache"]:
+        """The cache configured by MCP_PACKAGE_CACHE (plus MCP_NPM_REGISTRY / MCP_PYPI_INDEX), if any."""
+        directory = kwargs.pop("directory", None) or os.getenv("MCP_PACKAGE_CACHE")
+        if not directory:
+            return None
+        kwargs.setdefault("npm_registry", os.getenv("MCP_NPM_REGISTRY") or None)
+        kwargs.setdefault("pypi_index", os.getenv("MCP_PYPI_INDEX") or None)
+        return cls(directory, **kwargs)
+
+    def env(self) -> Dict[str, str]:
+        """Environment for npx/uvx (launches and pre-installs alike) to use this cache."""
+        env = {
+            "npm_config_cache": str(self.directory / "npm"),
+            # Trust cached package metadata instead of re-resolving it on every launch
+            "npm_config_prefer_offline": "true",
+            "npm_config_update_notifier": "false",
+            "UV_CACHE_DIR": str(self.directory / "uv"),
+            # uvx runs an installed tool instead of resolving it again
+            "UV_TOOL_DIR": str(self.directory / "uv-tools"),
+            "UV_TOOL_BIN_DIR": str(self.directory / "uv-bin"),
+        }
+        if self.npm_registry:
+            env["npm_config_registry"] = self.npm_registry
+        if self.pypi_index:
+            env["UV_DEFAULT_INDEX"] = self.pypi_index
+            env["UV_INDEX_URL"] = self.pypi_index
+        return env
+
+    def is_installed(self, spec: LaunchSpec) -> bool:
+        """Whether ``spec``'s package is already in this cache (e.g. from ``preinstall.py``)."""
+        name = package_name(spec)
+        if name is None:
+            return False
+        if spec.runner == "npx":
+            # npm exec installs each package set under _npx/<hash>/node_modules
+            return any((self.directory / "npm" / "_npx").glob(f"*/node_modules/{name}/package.json"))
+        if spec.runner == "uvx":
+            return (self.directory / "uv-tools" / name).is_dir()
+        return False
+
+    @staticmethod
+    def install_command(spec: LaunchSpec) -> Optional[List[str]]:
+        """The command that fetches ``spec``'s package without starting the server."""
+        if spec.package is None:
+            return None
+        if spec.runner == "npx":
+            # Installs into npx's own cache, where `npx <package>` looks first
+            return ["npm", "exec", "--yes", f"--package={spec.package}", "--", "node", "--version"]
+        if spec.runner == "uvx":
+            return ["uv", "tool", "install", "--quiet", spec.package]
+        return None
+
+    async def install(self, spec: LaunchSpec) -> Dict[str, Any]:
+        """Fetch one server's package; returns what happened and how long it took."""
+        result: Dict[str, Any] = {"server": spec.server_name, "runner": spec.runner, "package": spec.package}
+        command = self.install_command(spec)
+        if command is None:
+            return {**result, "ok": False, "error": "no package to install"}
+        start = time.perf_counter()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                env={**os.environ, **self.env()},
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            return {**result, "ok": False, "error": f"{command[0]} is not installed"}
+        try:
+            _, stderr = await asyncio.wait_for(process.communicate(), self.timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            return {**result, "ok": False, "error": f"timed out after {self.timeout:g}s"}
+        result.update(ok=process.returncode == 0, seconds=round(time.perf_counter() - start, 2))
+        if process.returncode != 0:
+            lines = stderr.decode(errors="replace").strip().splitlines()
+            result["error"] = lines[-1] if lines else f"exit {process.returncode}"
+        return result
+
+    async def install_all(self, specs: Iterable[LaunchSpec], concurrency: int = 4) -> List[Dict[str, Any]]:
+        """Fetch every distinct package among ``specs``, ``concurrency`` at a time."""
+        unique: Dict[tuple, LaunchSpec] = {}
+        for spec in specs:
+            if spec.package is not None:
+                unique.setdefault((spec.runner, spec.package), spec)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def install(spec: LaunchSpec) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.install(spec)
+
+        return await asyncio.gather(*(install(spec) for spec in unique.values()))
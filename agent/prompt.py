@@ -0,0 +1,213 @@
+"""
+Token-budgeted prompt assembly for the text-prompted Gemini wrapper.
+
+The tool preamble is formatted once per tool set and reused between steps.
+The conversation keeps the most recent messages verbatim and squeezes older
+ones into one-line summaries; tool output is truncated. If the prompt is
+still over budget, the oldest summaries go first, then the oldest messages.
+"""
+
+import math
+import os
+import re
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+# Rough size of a token in characters; Gemini does not ship a local tokenizer
+CHARS_PER_TOKEN = 4
+
+SEPARATOR = "\n\n"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_middle(text: str, limit: int) -> str:
+    """Keep the head and tail of ``text`` within ``limit`` characters."""
+    if len(text) <= limit:
+        return text
+    marker = f"\n... [{len(text) - limit} characters omitted] ...\n"
+    head = max(limit - len(marker), 0) * 2 // 3
+    tail = max(limit - len(marker) - head, 0)
+    return text[:head] + marker + (text[-tail:] if tail else "")
+
+
+def _role(message: BaseMessage) -> str:
+    if isinstance(message, HumanMessage):
+        return "Human"
+    if isinstance(message, AIMessage):
+        return "Assistant"
+    if isinstance(message, SystemMessage):
+        return "System"
+    if isinstance(message, ToolMessage):
+        return "Tool Result"
+    return "User"
+
+
+@dataclass
+class PromptStats:
+    """Size of one assembled prompt."""
+
+    tokens: int = 0
+    chars: int = 0
+    prefix_tokens: int = 0
+    prefix_cached: bool = False
+    messages: int = 0
+    verbatim: int = 0
+    summarized: int = 0
+    dropped: int = 0
+    truncated: int = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class PromptBuilder:
+    """Builds the text prompt from messages and bound tools within ``max_tokens``.
+
+    - ``recent_messages``: how many of the latest non-system messages are kept verbatim
+    - ``tool_output_chars``: cap on a tool result (``ToolMessage``) in the prompt
+    - ``message_chars``: cap on any other kept message, except the newest one
+    - ``summary_chars``: length of the one-line summary of an older message
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 8000,
+        recent_messages: int = 8,
+        tool_output_chars: int = 2000,
+        message_chars: int = 6000,
+        summary_chars: int = 160,
+        prefix_cache_size: int = 32,
+    ):
+        self.max_tokens = max_tokens
+        self.recent_messages = recent_messages
+        self.tool_output_chars = tool_output_chars
+        self.message_chars = message_chars
+        self.summary_chars = summary_chars
+        self.prefix_cache_size = prefix_cache_size
+        self._prefixes: "OrderedDict[Tuple[Tuple[str, str], ...], str]" = OrderedDict()
+        self.builds = 0
+        self.total_tokens = 0
+        self.max_seen_tokens = 0
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "PromptBuilder":
+        """Build from PROMPT_MAX_TOKENS / PROMPT_RECENT_MESSAGES / PROMPT_TOOL_OUTPUT_CHARS."""
+        kwargs.setdefault("max_tokens", int(os.getenv("PROMPT_MAX_TOKENS", "8000")))
+        kwargs.setdefault("recent_messages", int(os.getenv("PROMPT_RECENT_MESSAGES", "8")))
+        kwargs.setdefault("tool_output_chars", int(os.getenv("PROMPT_TOOL_OUTPUT_CHARS", "2000")))
+        return cls(**kwargs)
+
+    def prefix(self, tools: Sequence[Any]) -> Tuple[str, bool]:
+        """The tool preamble for ``tools`` and whether it came from the cache."""
+        key = tuple((tool.name, tool.description) for tool in tools)
+        cached = self._prefixes.get(key)
+        if cached is not None:
+            self._prefixes.move_to_end(key)
+            return cached, True
+        if not tools:
+            text = ""
+        else:
+            lines = [
+                "You have access to these tools. To use a tool, write the tool name with parameters:",
+                "- search_servers(query=\"your search term\")",
+                "- search_servers(queries=\"term one | term two\") to try several phrasings at once",
+                "- connect_server(server_id=\"server_id_from_search\")",
+                "- connect_to_playwright_server() for web browsing",
+                "",
+                "Available tools:",
+            ]
+            lines.extend(f"- {name}: {description}" for name, description in key)
+            lines.append("")  # Empty line
+            text = "\n".join(lines)
+        self._prefixes[key] = text
+        if len(self._prefixes) > self.prefix_cache_size:
+            self._prefixes.popitem(last=False)
+        return text, False
+
+    def _format(self, message: BaseMessage, limit: Optional[int]) -> Tuple[str, bool]:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        if isinstance(message, ToolMessage):
+            limit = self.tool_output_chars if limit is None else min(limit, self.tool_output_chars)
+        truncated = limit is not None and len(content) > limit
+        if truncated:
+            content = truncate_middle(content, limit)
+        return f"{_role(message)}: {content}", truncated
+
+    def _summary(self, message: BaseMessage) -> str:
+        content = message.content if isinstance(message.content, str) else str(message.content)
+        line = _WHITESPACE.sub(" ", content).strip()
+        if len(line) > self.summary_chars:
+            line = line[: self.summary_chars - 3].rstrip() + "..."
+        return f"- {_role(message)}: {line}"
+
+    def build(self, messages: Sequence[BaseMessage], tools: Sequence[Any] = ()) -> Tuple[str, PromptStats]:
+        """Assemble the prompt; returns it with its size metrics."""
+        stats = PromptStats(messages=len(messages))
+        prefix, stats.prefix_cached = self.prefix(tools)
+        stats.prefix_tokens = estimate_tokens(prefix)
+
+        # Leading system messages (the agent's instructions) are always kept whole
+        lead = 0
+        while lead < len(messages) and isinstance(messages[lead], SystemMessage):
+            lead += 1
+        system = [self._format(message, None)[0] for message in messages[:lead]]
+        rest = list(messages[lead:])
+
+        split = max(len(rest) - self.recent_messages, 0)
+        older, recent_messages = rest[:split], rest[split:]
+        recent: List[str] = []
+        for i, message in enumerate(recent_messages):
+            newest = i == len(recent_messages) - 1
+            text, truncated = self._format(message, None if newest else self.message_chars)
+            stats.truncated += truncated
+            recent.append(text)
+        summaries = [self._summary(message) for message in older]
+
+        def assemble() -> str:
+            parts = [prefix] if prefix else []
+            parts.extend(system)
+            if summaries:
+                parts.append("Earlier conversation (summarized):\n" + "\n".join(summaries))
+            parts.extend(recent)
+            return SEPARATOR.join(parts)
+
+        prompt = assemble()
+        budget_chars = self.max_tokens * CHARS_PER_TOKEN
+        if len(prompt) > budget_chars:
+            # Trim by character counts, then assemble once
+            excess = len(prompt) - budget_chars
+            while summaries and excess > 0:
+                excess -= len(summaries.pop(0)) + 1
+                stats.dropped += 1
+            if not summaries and excess > 0:
+                # The summary header itself goes with the last summary line
+                while len(recent) > 1 and excess > 0:
+                    excess -= len(recent.pop(0)) + len(SEPARATOR)
+                    stats.dropped += 1
+            prompt = assemble()
+
+        stats.verbatim = len(recent)
+        stats.summarized = len(summaries)
+        stats.chars = len(prompt)
+        stats.tokens = estimate_tokens(prompt)
+        self.builds += 1
+        self.total_tokens += stats.tokens
+        self.max_seen_tokens = max(self.max_seen_tokens, stats.tokens)
+        return prompt, stats
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "builds": self.builds,
+            "avg_tokens": self.total_tokens / self.builds if self.builds else 0,
+            "max_tokens_seen": self.max_seen_tokens,
+            "budget": self.max_tokens,
+            "cached_prefixes": len(self._prefixes),
+        }
@@ -0,0 +1,217 @@
+"""
+The shared agent components, built on first use, and their warm-up.
+
+Importing this module is cheap: LangChain, google-generativeai,
+Elasticsearch and mcp_use are only imported when the runtime is built, so
+``web.py`` starts serving (and a missing ``GEMINI_API_KEY`` surfaces) only
+once warm-up runs, not at import time. Each build and warm-up phase is timed
+in ``profile``.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Runtime:
+    """Components shared by every agent in the process."""
+
+    client: Any
+    llm: Any
+    catalog: Any
+    server_pool: Any
+    search_agent: Any
+    intent_router: Any
+    single_flight: Any
+    launch_specs: Any
+    speculator: Any
+
+
+class StartupProfile:
+    """Wall-clock time of each startup phase, from process import to ready."""
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter):
+        self._clock = clock
+        self.created = clock()
+        self.phases: Dict[str, float] = {}
+        self.ready_at: Optional[float] = None
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.phases[name] = self._clock() - start
+
+    def mark_ready(self) -> None:
+        self.ready_at = self._clock()
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "phases_ms": {name: round(seconds * 1000, 1) for name, seconds in self.phases.items()},
+            "ready_after_ms": round((self.ready_at - self.created) * 1000, 1) if self.ready_at else None,
+        }
+
+    def format(self) -> str:
+        report = self.report()
+        phases = ", ".join(f"{name} {ms:.0f} ms" for name, ms in report["phases_ms"].items())
+        return f"Startup: ready after {report['ready_after_ms'] or 0:.0f} ms ({phases})"
+
+
+profile = StartupProfile()
+
+_runtime: Optional[Runtime] = None
+_lock = threading.Lock()
+
+
+def current() -> Optional[Runtime]:
+    """The runtime if it has been built, without building it."""
+    return _runtime
+
+
+def get_runtime() -> Runtime:
+    """The shared runtime, built on the first call (thread-safe)."""
+    global _runtime
+    if _runtime is None:
+        with _lock:
+            if _runtime is None:
+                _runtime = _build(profile)
+    return _runtime
+
+
+def _build(profile: StartupProfile) -> Runtime:
+    with profile.phase("import"):
+        from mcp_use import MCPClient
+
+        from .agent import SearchAgent
+        from .catalog import ServerCatalog
+        from .gemini_wrapper import GeminiChat
+        from .intent_router import IntentRouter
+        from .launch_specs import LaunchSpecTable
+        from .mcp_pool import MCPServerPool
+        from .server_manager import ElasticServerManager
+        from .singleflight import SingleFlight
+        from .speculation import Speculator
+
+    with profile.phase("llm"):
+        llm = GeminiChat(model_name="gemini-1.5-flash")
+    with profile.phase("catalog"):
+        catalog = ServerCatalog.from_env()
+    with profile.phase("agent"):
+        client = MCPClient(config={})
+        server_pool = MCPServerPool.from_env(client)
+        intent_router = IntentRouter.from_env()
+        single_flight = SingleFlight()
+        launch_specs = LaunchSpecTable.from_env()
+        speculator = Speculator.from_env()
+        search_agent = SearchAgent(
+            llm=llm,
+            use_server_manager=True,
+            client=client,
+            server_manager=ElasticServerManager(
+                mcp_client=client,
+                catalog=catalog,
+                server_pool=server_pool,
+                intent_router=intent_router,
+                single_flight=single_flight,
+                launch_specs=launch_specs,
+                speculator=speculator,
+            ),
+        )
+    return Runtime(
+        client=client,
+        llm=llm,
+        catalog=catalog,
+        server_pool=server_pool,
+        search_agent=search_agent,
+        intent_router=intent_router,
+        single_flight=single_flight,
+        launch_specs=launch_specs,
+        speculator=speculator,
+    )
+
+
+async def _load_search_index(runtime: Runtime) -> None:
+    if runtime.catalog.backend != "elastic":
+        await asyncio.to_thread(lambda: runtime.catalog.local_index)
+    await runtime.catalog.aload_embeddings()
+
+
+async def _compile_launch_specs(runtime: Runtime) -> None:
+    documents = await asyncio.to_thread(lambda: runtime.catalog.local_index.documents)
+    await asyncio.to_thread(runtime.launch_specs.compile, documents)
+
+
+async def _seed_intent_router(runtime: Runtime) -> None:
+    documents = runtime.catalog.local_index.documents
+    runtime.intent_router.seed(documents, runtime.launch_specs.launchable)
+
+
+class Warmup:
+    """Builds the runtime off the event loop, then runs async warm-up hooks.
+
+    The app is ready once every hook has finished; a failure (e.g. no
+    ``GEMINI_API_KEY``) is kept and reported instead of raised.
+    """
+
+    def __init__(self, profile: StartupProfile = profile):
+        self.profile = profile
+        self.hooks: List[Tuple[str, Callable[[Runtime], Awaitable[Any]]]] = [
+            ("search_index", _load_search_index),
+            ("launch_specs", _compile_launch_specs),
+            ("intent_router", _seed_intent_router),
+        ]
+        self.error: Optional[BaseException] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add_hook(self, name: str, hook: Callable[[Runtime], Awaitable[Any]]) -> None:
+        self.hooks.append((name, hook))
+
+    @property
+    def ready(self) -> bool:
+        return self._task is not None and self._task.done() and self.error is None
+
+    def start(self) -> asyncio.Task:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def _run(self) -> None:
+        try:
+            runtime = await asyncio.to_thread(get_runtime)
+            for name, hook in self.hooks:
+                with self.profile.phase(name):
+                    await hook(runtime)
+        except Exception as e:
+            self.error = e
+            logger.error(f"Warm-up failed: {e}")
+            return
+        self.profile.mark_ready()
+        logger.info(self.profile.format())
+
+    async def wait(self) -> None:
+        """Wait for a warm-up in progress; returns at once if none was started."""
+        if self._task is not None:
+            await asyncio.shield(self._task)
+
+    def status(self) -> Dict[str, Any]:
+        if self._task is None:
+            state = "cold"
+        elif not self._task.done():
+            state = "warming"
+        else:
+            state = "failed" if self.error else "ready"
+        return {
+            "ready": state == "ready",
+            "state": state,
+            "error": str(self.error) if self.error else None,
+            "startup": self.profile.report(),
+        }
@@ -0,0 +1,150 @@
+"""
+On-disk cache of MCP tool schemas, keyed by a hash of the server launch config.
+
+With the schemas at hand a server's tools can be exposed to the agent
+without starting the server; the process is only spawned when one of its
+tools is actually called, and the entry is refreshed from that live session.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mcp.types import Tool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = Path.home() / ".cache" / "mcp-use-elastic" / "tool_schemas.json"
+
+
+def config_key(config: Dict[str, Any]) -> str:
+    """Stable hash of a launch config; any change to it invalidates the entry."""
+    blob = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def tools_from_catalog(value: Any) -> List[Tool]:
+    """Parse the catalog's ``tools`` column (JSON text or a list) into MCP tools."""
+    if isinstance(value, str):
+        try:
+            value = json.loads(value)
+        except ValueError:
+            return []
+    tools = []
+    for item in value if isinstance(value, list) else []:
+        if not isinstance(item, dict) or not item.get("name"):
+            continue
+        schema = item.get("inputSchema") or item.get("input_schema") or item.get("parameters")
+        tools.append(
+            Tool(
+                name=item["name"],
+                description=item.get("description") or "",
+                inputSchema=schema if isinstance(schema, dict) else {"type": "object", "properties": {}},
+            )
+        )
+    return tools
+
+
+class ToolSchemaCache:
+    """JSON file mapping ``config_key(config)`` to the server's tool list.
+
+    Entries older than ``refresh_after`` seconds are still served but
+    reported as stale so the caller can refresh them in the background.
+    """
+
+    def __init__(
+        self,
+        path: Optional[os.PathLike] = None,
+        refresh_after: float = 86400.0,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.path = Path(path) if path else DEFAULT_CACHE_PATH
+        self.refresh_after = refresh_after
+        self._clock = clock
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._save_lock = asyncio.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "ToolSchemaCache":
+        """Build a cache from MCP_SCHEMA_CACHE / MCP_SCHEMA_REFRESH."""
+        kwargs.setdefault("path", os.getenv("MCP_SCHEMA_CACHE") or None)
+        kwargs.setdefault("refresh_after", float(os.getenv("MCP_SCHEMA_REFRESH", "86400")))
+        return cls(**kwargs)
+
+    @property
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                logger.warning(f"Ignoring unreadable tool schema cache {self.path}: {e}")
+                self._entries = {}
+        return self._entries
+
+    def get(self, config: Dict[str, Any]) -> Optional[List[Tool]]:
+        entry = self.entries.get(config_key(config))
+        if entry is None:
+            self.misses += 1
+            return None
+        try:
+            tools = [Tool.model_validate(tool) for tool in entry["tools"]]
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return tools
+
+    def is_stale(self, config: Dict[str, Any]) -> bool:
+        entry = self.entries.get(config_key(config))
+        return entry is None or self._clock() - entry.get("fetched_at", 0) > self.refresh_after
+
+    def _update(self, config: Dict[str, Any], tools: List[Tool], server: str) -> Tuple[bool, bool]:
+        """Store the live tool list in memory; returns (changed, needs saving)."""
+        key = config_key(config)
+        serialized = [tool.model_dump(mode="json", exclude_none=True) for tool in tools]
+        previous = self.entries.get(key, {}).get("tools")
+        # An unchanged entry is only rewritten once it has gone stale on disk
+        dirty = previous != serialized or self.is_stale(config)
+        self.entries[key] = {"server": server, "fetched_at": self._clock(), "tools": serialized}
+        return previous != serialized, dirty
+
+    def put(self, config: Dict[str, Any], tools: List[Tool], server: str = "") -> bool:
+        """Store the live tool list; returns True if it differs from the cached one."""
+        changed, dirty = self._update(config, tools, server)
+        if dirty:
+            self._write(json.dumps(self.entries))
+        return changed
+
+    async def aput(self, config: Dict[str, Any], tools: List[Tool], server: str = "") -> bool:
+        """``put`` for the event loop: the file is written in a thread."""
+        changed, dirty = self._update(config, tools, server)
+        if dirty:
+            async with self._save_lock:
+                # Serialized under the lock, so the last write holds every update
+                await asyncio.to_thread(self._write, json.dumps(self.entries))
+        return changed
+
+    def _write(self, text: str) -> None:
+        # Write to a temp file and rename so concurrent readers never see half a file
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".tool_schemas.")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logger.warning(f"Could not write tool schema cache {self.path}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": str(self.path), "entries": len(self.entries), "hits": self.hits, "misses": self.misses}
@@ -1,140 +1,200 @@
 import asyncio
+import json
+import logging
 import os
-from typing import Dict, Any, List
+from typing import Awaitable, Dict, Any, List, Optional, Sequence, Tuple, Union
 from langchain_core.tools import BaseTool
+from pydantic import Field
 from mcp_use.client import MCPClient
 from mcp_use.managers.base import BaseServerManager
 from mcp_use.adapters.langchain_adapter import LangChainAdapter
-from elasticsearch import Elasticsearch
-from dotenv import load_dotenv
+
+from .catalog import ServerCatalog, merge_hits
+from .events import emit
+from .intent_router import PLAYWRIGHT, IntentRouter
+from .launch_specs import LaunchSpecTable, compile_launch_spec
+from .mcp_pool import MCPServerPool
+from .schema_cache import tools_from_catalog
+from .singleflight import SingleFlight
+from .speculation import Speculation, Speculator
+from .telemetry import span
+from .text import coalesce_key
+from .tool_registry import ToolRegistry
+from .tool_router import ToolRouter
+
+logger = logging.getLogger(__name__)
+
+
+def emit_search_results(query: str, hits: List[Dict[str, Any]]) -> None:
+    emit(
+        "search_results",
+        query=query,
+        results=[
+            {"id": hit["_id"], "name": hit["_source"].get("name"), "score": hit.get("_score")}
+            for hit in hits
+        ],
+    )
+
+
+def format_search_results(query: str, hits: List[Dict[str, Any]], queries: Sequence[str] = ()) -> str:
+    """Format search hits as the markdown list shown to the LLM.
+
+    With several ``queries``, each hit also lists the ones that found it.
+    """
+    if not hits:
+        return f"No servers found matching '{query}'. Try different keywords."
+
+    results = []
+    for i, hit in enumerate(hits, 1):
+        server = hit["_source"]
+        entry = (
+            f"{i}. **{server.get('name', 'Unknown')}**\n"
+            f"   - Description: {server.get('description', 'No description')}\n"
+            f"   - Stars: {server.get('github_stars', 0)}\n"
+            f"   - Install: {server.get('install_command', 'No install command')}\n"
+            f"   - ID: {hit['_id']}"
+        )
+        if len(queries) > 1 and hit.get("matched_queries"):
+            entry += f"\n   - Matched: {'; '.join(hit['matched_queries'])}"
+        results.append(entry)
+
+    return f"Found {len(results)} servers for '{query}':\n\n" + "\n\n".join(results) + f"\n\nUse 'connect_server' with the server ID to connect."
+
+
+def _shorten(text: str, limit: int) -> str:
+    text = " ".join(str(text or "").split())
+    return text if len(text) <= limit else text[: max(limit - 1, 0)].rstrip() + "…"
+
+
+def format_compact_results(
+    query: str, hits: List[Dict[str, Any]], queries: Sequence[str] = (), offset: int = 0, description_chars: int = 120
+) -> str:
+    """One line per hit: name, ID, stars and a truncated description."""
+    if not hits:
+        return f"No servers found matching '{query}'. Try different keywords."
+    lines = [f"Servers for '{query}' ({offset + 1}-{offset + len(hits)}):"]
+    for i, hit in enumerate(hits, offset + 1):
+        server = hit["_source"]
+        line = f"{i}. {server.get('name', 'Unknown')} [id={hit['_id']}] ★{server.get('github_stars', 0)}"
+        if server.get("install_command"):
+            line += f" install: {server['install_command']}"
+        line += f" - {_shorten(server.get('description', ''), description_chars)}"
+        if len(queries) > 1 and hit.get("matched_queries"):
+            line += f" (matched: {'; '.join(hit['matched_queries'])})"
+        lines.append(line)
+    lines.append(f'Connect with connect_server(server_id="<id>"). More results: offset="{offset + len(hits)}".')
+    return "\n".join(lines)
+
+
+def search_results_json(query: str, hits: List[Dict[str, Any]], queries: Sequence[str] = (), offset: int = 0) -> str:
+    """The hits as a JSON document, for programmatic callers."""
+    return json.dumps({
+        "query": query,
+        "queries": list(queries),
+        "offset": offset,
+        "results": [
+            {
+                "id": hit["_id"],
+                "score": hit.get("_score"),
+                "matched_queries": hit.get("matched_queries", []),
+                **hit["_source"],
+            }
+            for hit in hits
+        ],
+    }, default=str)
+
+
+RESULT_FORMATS = ("compact", "markdown", "json")
+
+
+def split_queries(query: str = "", queries: Any = None) -> List[str]:
+    """Distinct search phrasings from ``query`` and ``queries`` (a list, or text separated by "|")."""
+    if isinstance(queries, str):
+        queries = queries.split("|")
+    phrasings = [part.strip() for part in (query or "").split("|")] + [str(q).strip() for q in queries or []]
+    return list(dict.fromkeys(phrasing for phrasing in phrasings if phrasing))
+
+
+PLAYWRIGHT_CONFIG = {"command": "npx", "args": ["@playwright/mcp@latest"]}
+
+
+def launch_config(server: Dict[str, Any], default_name: str = "") -> Union[Tuple[str, Dict[str, Any]], str]:
+    """Work out how to launch a catalog server.
+
+    Returns ``(server_name, mcp_config)``, or a message explaining why the
+    server cannot be started automatically. See ``launch_specs`` for the
+    config shapes understood.
+    """
+    spec = compile_launch_spec(server, default_name=default_name)
+    if isinstance(spec, str):
+        return spec
+    return spec.server_name, spec.mcp_config()
 
 
 class SearchServersTool(BaseTool):
     """Searches the Elasticsearch index for MCP servers based on a query."""
     name: str = "search_servers"
-    description: str = "Search for MCP servers in the database based on task description or capabilities (e.g., 'weather', 'web browsing', 'github')"
+    description: str = (
+        "Search for MCP servers in the database based on task description or capabilities "
+        "(e.g., 'weather', 'web browsing', 'github'). Try several phrasings at once with "
+        "queries=\"weather | forecast\"; results are merged. Page with size and offset."
+    )
     server_manager: "ElasticServerManager"
+    # Default for the format argument: "compact" (one line per server), "markdown" or "json"
+    result_format: str = Field(default_factory=lambda: os.getenv("SEARCH_RESULT_FORMAT", "compact"))
+    description_chars: int = Field(default_factory=lambda: int(os.getenv("SEARCH_DESCRIPTION_CHARS", "120")))
 
-    def _run(self, query: str) -> str:
+    def _run(
+        self, query: str = "", queries: Optional[List[str]] = None, size: int = 5, offset: int = 0, format: str = ""
+    ) -> str:
         # Check if we're already in an event loop
         try:
-            loop = asyncio.get_running_loop()
+            asyncio.get_running_loop()
             # We're in an async context, but _run should be sync
             # Let's create a simple sync version
-            return self._sync_search(query)
+            return self._sync_search(query, queries, size, offset, format)
         except RuntimeError:
             # No running loop, safe to use asyncio.run()
-            return asyncio.run(self._arun(query))
-    
-    def _sync_search(self, query: str) -> str:
+            return asyncio.run(self._arun(query, queries, size, offset, format))
+
+    def _render(self, phrasings: List[str], hits: List[Dict[str, Any]], offset: int, format: str) -> str:
+        label = " | ".join(phrasings)
+        emit_search_results(label, hits)
+        format = format or self.result_format
+        if format == "json":
+            return search_results_json(label, hits, phrasings, offset)
+        if format == "markdown":
+            return format_search_results(label, hits, phrasings)
+        return format_compact_results(label, hits, phrasings, offset, self.description_chars)
+
+    def _sync_search(
+        self, query: str = "", queries: Optional[List[str]] = None, size: int = 5, offset: int = 0, format: str = ""
+    ) -> str:
         """Synchronous version of the search."""
+        phrasings = split_queries(query, queries)
+        if not phrasings:
+            return "Error searching servers: no query given"
         try:
-            # Load environment variables
-            load_dotenv()
-            
-            # Initialize Elasticsearch client
-            client = Elasticsearch(
-                os.getenv("ELASTIC_INDEX_URL"),
-                api_key=os.getenv("ELASTIC_API_KEY")
-            )
-            
-            # Create search query with relevance scoring (simplified to avoid date issues)
-            search_query = {
-                "query": {
-                    "function_score": {
-                        "query": {
-                            "multi_match": {
-                                "query": query,
-                                "fields": ["description^3", "name^5", "slug", "namespace"]
-                            }
-                        },
-                        "functions": [
-                            {"filter": {"term": {"usable": True}}, "weight": 2.0},
-                            {"field_value_factor": {"field": "github_stars", "modifier": "log1p", "missing": 0}}
-                        ],
-                        "score_mode": "sum",
-                        "boost_mode": "multiply"
-                    }
-                },
-                "size": 5
-            }
-            
-            # Perform search
-            response = client.search(index="public_servers", body=search_query)
-            
-            if not response["hits"]["hits"]:
-                return f"No servers found matching '{query}'. Try different keywords."
-            
-            # Format results
-            results = []
-            for i, hit in enumerate(response["hits"]["hits"], 1):
-                server = hit["_source"]
-                results.append(
-                    f"{i}. **{server.get('name', 'Unknown')}**\n"
-                    f"   - Description: {server.get('description', 'No description')}\n"
-                    f"   - Stars: {server.get('github_stars', 0)}\n"
-                    f"   - Install: {server.get('install_command', 'No install command')}\n"
-                    f"   - ID: {hit['_id']}"
-                )
-            
-            return f"Found {len(results)} servers for '{query}':\n\n" + "\n\n".join(results) + f"\n\nUse 'connect_server' with the server ID to connect."
-            
+            size, offset = int(size), int(offset)
+            with span("search_servers", queries=len(phrasings)):
+                results = self.server_manager.catalog.msearch(phrasings, size + offset)
+                hits = merge_hits(phrasings, results)[offset:offset + size]
+            return self._render(phrasings, hits, offset, format)
         except Exception as e:
             return f"Error searching servers: {str(e)}"
 
-    async def _arun(self, query: str) -> str:
-        """Search for servers matching the query."""
+    async def _arun(
+        self, query: str = "", queries: Optional[List[str]] = None, size: int = 5, offset: int = 0, format: str = ""
+    ) -> str:
+        """Search for servers matching the query (or each of several queries)."""
+        phrasings = split_queries(query, queries)
+        if not phrasings:
+            return "Error searching servers: no query given"
         try:
-            # Load environment variables
-            load_dotenv()
-            
-            # Initialize Elasticsearch client
-            client = Elasticsearch(
-                os.getenv("ELASTIC_INDEX_URL"),
-                api_key=os.getenv("ELASTIC_API_KEY")
-            )
-            
-            # Create search query with relevance scoring (simplified to avoid date issues)
-            search_query = {
-                "query": {
-                    "function_score": {
-                        "query": {
-                            "multi_match": {
-                                "query": query,
-                                "fields": ["description^3", "name^5", "slug", "namespace"]
-                            }
-                        },
-                        "functions": [
-                            {"filter": {"term": {"usable": True}}, "weight": 2.0},
-                            {"field_value_factor": {"field": "github_stars", "modifier": "log1p", "missing": 0}}
-                        ],
-                        "score_mode": "sum",
-                        "boost_mode": "multiply"
-                    }
-                },
-                "size": 5
-            }
-            
-            # Perform search
-            response = client.search(index="public_servers", body=search_query)
-            
-            if not response["hits"]["hits"]:
-                return f"No servers found matching '{query}'. Try different keywords."
-            
-            # Format results
-            results = []
-            for i, hit in enumerate(response["hits"]["hits"], 1):
-                server = hit["_source"]
-                results.append(
-                    f"{i}. **{server.get('name', 'Unknown')}**\n"
-                    f"   - Description: {server.get('description', 'No description')}\n"
-                    f"   - Stars: {server.get('github_stars', 0)}\n"
-                    f"   - Install: {server.get('install_command', 'No install command')}\n"
-                    f"   - ID: {hit['_id']}"
-                )
-            
-            return f"Found {len(results)} servers for '{query}':\n\n" + "\n\n".join(results) + f"\n\nUse 'connect_server' with the server ID to connect."
-            
+            size, offset = int(size), int(offset)
+            with span("search_servers", queries=len(phrasings)):
+                hits = await self.server_manager.search(phrasings, size, offset)
+            return self._render(phrasings, hits, offset, format)
         except Exception as e:
             return f"Error searching servers: {str(e)}"
 
@@ -148,7 +208,7 @@ class ConnectServerTool(BaseTool):
     def _run(self, server_id: str) -> str:
         # Check if we're already in an event loop
         try:
-            loop = asyncio.get_running_loop()
+            asyncio.get_running_loop()
             # We're in an async context, create sync version
             return self._sync_connect(server_id)
         except RuntimeError:
@@ -162,66 +222,12 @@ class ConnectServerTool(BaseTool):
     async def _arun(self, server_id: str) -> str:
         """Connect to a server by its ID."""
         try:
-            # Load environment variables
-            load_dotenv()
-            
-            # Initialize Elasticsearch client
-            client = Elasticsearch(
-                os.getenv("ELASTIC_INDEX_URL"),
-                api_key=os.getenv("ELASTIC_API_KEY")
-            )
-            
-            # Get server details by ID
-            response = client.get(index="public_servers", id=server_id)
-            server = response["_source"]
-            
-            # Extract connection info
-            server_name = server.get("slug", server.get("name", server_id))
-            install_command = server.get("install_command")
-            
-            if not install_command:
-                return f"No install command found for server {server_name}"
-            
-            # Parse install command to get MCP server config
-            # Most commands are like "npx @modelcontextprotocol/server-name" or "pip install package-name"
-            if install_command.startswith("npx "):
-                command = "npx"
-                args = install_command[4:].split()
-            elif install_command.startswith("pip install "):
-                # For pip packages, we need a different approach
-                return f"Server {server_name} requires pip install. Manual setup needed: {install_command}"
-            else:
-                # Try to parse generic command
-                parts = install_command.split()
-                command = parts[0] if parts else "node"
-                args = parts[1:] if len(parts) > 1 else []
-            
-            # Connect to MCP client
-            mcp_client = self.server_manager.mcp_client
-            adapter = self.server_manager.adapter
-            
-            # Add server if not exists
-            if server_name not in mcp_client.get_server_names():
-                mcp_client.add_server(server_name, {"command": command, "args": args})
-            
-            # Create session
-            try:
-                mcp_client.get_session(server_name)
-            except ValueError:
-                await mcp_client.create_session(server_name)
-            
-            # Cache the server's tools
-            if server_name not in self.server_manager._server_tools:
-                connector = mcp_client.get_session(server_name).connector
-                new_tools = await adapter._create_tools_from_connectors([connector])
-                self.server_manager._server_tools.update({tool.name: tool for tool in new_tools})
-            
-            # Set as active server
-            self.server_manager.active_server = server_name
-            num_tools = len([t for t in self.server_manager._server_tools.values() if not t.name.startswith(('search_servers', 'connect_server', 'connect_to_playwright'))])
-            
-            return f"Successfully connected to {server.get('name', server_name)}! {num_tools} tools are now available."
-            
+            connected = await self.server_manager.connect_server(server_id)
+            if isinstance(connected, str):
+                return connected
+            display_name, num_tools = connected
+            return f"Successfully connected to {display_name}! {num_tools} tools are now available."
+
         except Exception as e:
             return f"Error connecting to server {server_id}: {str(e)}"
 
@@ -237,54 +243,293 @@ class ConnectPlaywrightTool(BaseTool):
 
     async def _arun(self) -> str:
         """Connects to the server, caches its tools, and sets it as active."""
-        client = self.server_manager.mcp_client
-        adapter = self.server_manager.adapter
-        server_name = "playwright"
-
-        # 1. Connect and create session if needed
-        if server_name not in client.get_server_names():
-            client.add_server(server_name, {"command": "npx", "args": ["@playwright/mcp@latest"]})
-        try:
-            client.get_session(server_name)
-        except ValueError:
-            await client.create_session(server_name)
-
-        # 2. Cache the server's tools
-        if server_name not in self.server_manager._server_tools:
-            playwright_connector = client.get_session(server_name).connector
-            new_tools = await adapter._create_tools_from_connectors([playwright_connector])
-            self.server_manager._server_tools.update({tool.name: tool for tool in new_tools})
-
-        # 3. Set the server as active
-        self.server_manager.active_server = server_name
-        num_tools = len(self.server_manager._server_tools)
+        num_tools = await self.server_manager.connect_playwright()
         return f"Successfully connected to Playwright. {num_tools} web browsing tools are now available."
 
 
 class ElasticServerManager(BaseServerManager):
     """A ServerManager that dynamically loads tools from a connected server."""
-    def __init__(self, mcp_client: MCPClient):
+    def __init__(
+        self,
+        mcp_client: MCPClient,
+        catalog: Optional[ServerCatalog] = None,
+        search_backend: Optional[str] = None,
+        server_pool: Optional[MCPServerPool] = None,
+        tool_router: Optional[ToolRouter] = None,
+        tool_registry: Optional[ToolRegistry] = None,
+        unload_on_switch: Optional[bool] = None,
+        intent_router: Optional[IntentRouter] = None,
+        single_flight: Optional[SingleFlight] = None,
+        launch_specs: Optional[LaunchSpecTable] = None,
+        speculator: Optional[Speculator] = None,
+    ):
         self.mcp_client = mcp_client
         self.adapter = LangChainAdapter()
-        self._server_tools: dict[str, BaseTool] = {}
+        # Server processes are shared with every manager using the same pool
+        self.server_pool = server_pool if server_pool is not None else MCPServerPool.from_env(mcp_client)
+        # One catalog (pooled Elasticsearch clients + local index) shared by every tool
+        if catalog is None:
+            catalog = ServerCatalog.from_env(**({"backend": search_backend} if search_backend else {}))
+        self.catalog = catalog
+        # Launch specs compiled from the catalog's config column; share it to compile each server once
+        self.launch_specs = launch_specs if launch_specs is not None else LaunchSpecTable.from_env()
+        # Identical concurrent server starts and searches run once; share it to coalesce across sessions
+        self.single_flight = single_flight if single_flight is not None else SingleFlight()
+        # Loaded server tools, by owning server; bounded by TOOL_REGISTRY_MAX_SERVERS
+        self.tool_registry = tool_registry if tool_registry is not None else ToolRegistry.from_env()
+        if unload_on_switch is None:
+            unload_on_switch = os.getenv("MCP_UNLOAD_ON_SWITCH", "false").lower() in ("1", "true", "yes")
+        self.unload_on_switch = unload_on_switch
+        self.active_server: Optional[str] = None
+        self._tools_view: Tuple[Any, List[BaseTool], frozenset] = (None, [], frozenset())
+        # Routes confident requests to a server before the first LLM call; None disables it
+        self.intent_router = intent_router
+        self._targets: Dict[str, str] = {}  # server name -> catalog ID (or "playwright")
+        self._connected_by: Dict[str, str] = {}  # server name -> the request that connected it
+        self._query = ""
+        self._learned: set = set()
+        # Searches and warms up servers for the raw message while the model thinks
+        self.speculator = speculator if speculator is not None else Speculator.from_env()
+        self._speculation: Optional[Speculation] = None
+        # Only the server tools most relevant to the current request are exposed
+        self.tool_router = tool_router if tool_router is not None else ToolRouter.from_env()
+        self._context = ""
         self._management_tools: list[BaseTool] = [
             SearchServersTool(server_manager=self),
             ConnectServerTool(server_manager=self),
             ConnectPlaywrightTool(server_manager=self)
         ]
+        self.tool_registry.reserve(tool.name for tool in self._management_tools)
         self._initialized = False
 
     async def initialize(self) -> None:
         self._initialized = True
 
-    def add_tool(self, tool: BaseTool):
-        self._server_tools[tool.name] = tool
+    async def close(self) -> None:
+        """Stop pooled server processes, release the catalog's connections and save learned intents."""
+        await self.server_pool.close()
+        await self.catalog.close()
+        if self.intent_router is not None:
+            await self.intent_router.close()
+
+    async def connect(self, server_name: str, config: Dict[str, Any], seed_tools: Any = None) -> List[BaseTool]:
+        """Load ``server_name``'s tools through the pool.
+
+        Known tool schemas (on-disk cache, or ``seed_tools`` from the catalog)
+        are exposed right away and the process starts on the first tool call;
+        otherwise the server is started now to list its tools. Concurrent
+        connects to the same server share one start.
+        """
+        self.server_pool.register(server_name, config, seed_tools=tools_from_catalog(seed_tools) if seed_tools else None)
+        if self.server_pool.cached_tools(server_name) is None:
+            await self.single_flight.do(("connect", server_name), lambda: self.server_pool.acquire(server_name))
+        # Tools are bound to the pool's connector, so they outlive process respawns
+        connector = self.server_pool.connector(server_name)
+        # Rebuild from the pool's current schemas in case a live session refreshed them
+        self.adapter._connector_tool_map.pop(connector, None)
+        new_tools = await self.adapter._create_tools_from_connectors([connector])
+
+        if self.unload_on_switch and self.active_server not in (None, server_name):
+            await self.unload(self.active_server)
+        if server_name not in self.tool_registry:
+            self.server_pool.retain(server_name)
+        evicted = self.tool_registry.load(server_name, new_tools)
+        connector.aliases.update(self.tool_registry.aliases(server_name))
+        for name in evicted:
+            await self.server_pool.release(name)
+        return self.tool_registry.tools_of(server_name)
+
+    async def unload(self, server_name: str, stop: bool = True) -> bool:
+        """Drop ``server_name``'s tools from this manager.
+
+        With ``stop``, its process is stopped too if no other agent uses it.
+        """
+        if not self.tool_registry.unload(server_name):
+            return False
+        if self.active_server == server_name:
+            self.active_server = None
+        await self.server_pool.release(server_name, stop=stop)
+        return True
+
+    async def unload_all(self, stop: bool = False) -> None:
+        """Drop every server's tools; processes are left to idle reaping unless ``stop``."""
+        for server_name in self.tool_registry.clear():
+            await self.server_pool.release(server_name, stop=stop)
+        self.active_server = None
+
+    async def connect_server(self, server_id: str) -> Union[Tuple[str, int], str]:
+        """Connect the catalog server ``server_id`` and make it active.
+
+        Returns ``(display_name, tool_count)``, or a message explaining why
+        the server cannot be started automatically.
+        """
+        with span("connect_server", server_id=server_id):
+            server = (await self.catalog.aget(server_id))["_source"]
+            launch = self.launch_specs.resolve(server_id, server)
+            if isinstance(launch, str):
+                return launch
+            server_name, config = launch
+            await self.connect(server_name, config, seed_tools=server.get("tools"))
+        return server.get("name", server_name), self._activate(server_name, server_id)
+
+    async def connect_playwright(self) -> int:
+        """Start (or reuse) the Playwright server and make it active; returns its tool count."""
+        with span("connect_playwright"):
+            await self.connect(PLAYWRIGHT, self.playwright_config)
+        return self._activate(PLAYWRIGHT, PLAYWRIGHT)
+
+    @property
+    def playwright_config(self) -> Dict[str, Any]:
+        """The built-in Playwright launch, using the package cache if one is configured."""
+        if not self.launch_specs.extra_env:
+            return PLAYWRIGHT_CONFIG
+        return {**PLAYWRIGHT_CONFIG, "env": dict(self.launch_specs.extra_env)}
+
+    def _activate(self, server_name: str, target: str) -> int:
+        self.active_server = server_name
+        self._targets[server_name] = target
+        self._connected_by.setdefault(server_name, self._query)
+        num_tools = len(self.tool_registry.tools_of(server_name))
+        emit("server_connected", server=server_name, tools=num_tools)
+        return num_tools
+
+    def begin_turn(self, query: str) -> None:
+        """Start a new request: successful server tool calls are credited to ``query``."""
+        self._query = query
+        self._learned.clear()
+
+    def observe(self, event: Dict[str, Any]) -> None:
+        """Teach the intent router from a successful server tool call (an ``events`` event)."""
+        if self.intent_router is None or event.get("event") != "tool_result":
+            return
+        server_name = self.tool_registry.owner(event.get("tool", ""))
+        target = self._targets.get(server_name)
+        if target is None or server_name in self._learned or str(event.get("result", "")).startswith("{'error'"):
+            return
+        self._learned.add(server_name)
+        for query in dict.fromkeys((self._query, self._connected_by.get(server_name, ""))):
+            if query:
+                self.intent_router.learn(query, target)
+
+    async def fast_path(self, query: str) -> Optional[str]:
+        """Connect the server the intent router picks for ``query``, if it is confident.
+
+        Returns the connected server's name. Failures are logged and left to
+        the normal search/connect flow.
+        """
+        match = self.intent_router.route(query) if self.intent_router is not None else None
+        if match is None:
+            return None
+        target, score = match
+        with span("fast_path", target=target, score=round(score, 3)):
+            loaded = [name for name, known in self._targets.items() if known == target and name in self.tool_registry]
+            try:
+                if loaded:
+                    server_name = loaded[0]
+                    self.active_server = server_name
+                elif target == PLAYWRIGHT:
+                    await self.connect_playwright()
+                    server_name = PLAYWRIGHT
+                else:
+                    connected = await self.connect_server(target)
+                    if isinstance(connected, str):
+                        return None
+                    server_name = self.active_server
+            except Exception as e:
+                logger.warning(f"Fast path to {target} failed: {e}")
+                return None
+        emit("fast_path", server=server_name, target=target, score=score)
+        return server_name
+
+    def speculate(self, query: str) -> Optional[Speculation]:
+        """Search for ``query`` and start its top-ranked usable server in the background."""
+        self._speculation = self.speculator.begin(self, query)
+        return self._speculation
+
+    async def end_turn(self, speculation: Speculation) -> None:
+        """Discard ``speculation``'s unused work, stopping a server nobody connected."""
+        if self._speculation is speculation:
+            self._speculation = None
+        await self.speculator.finish(self, speculation)
+
+    async def search(self, queries: Sequence[str], size: int = 5, offset: int = 0) -> List[Dict[str, Any]]:
+        """Search for every phrasing and merge the hits by server ID; returns
+        merged hits ``offset`` to ``offset + size``.
+
+        The searches go through the catalog's batcher, so they (and any other
+        search started at the same moment) are sent as one ``_msearch``. A
+        query already in flight (ignoring case and spacing) is awaited, not repeated,
+        and the turn's speculative search for the same text is reused.
+        """
+        depth = size + offset
+        results = await asyncio.gather(*(self._search_one(query, depth) for query in queries))
+        return merge_hits(queries, results)[offset:depth]
+
+    async def _search_one(self, query: str, depth: int) -> List[Dict[str, Any]]:
+        hits = await self.speculator.prefetched(self._speculation, query, depth)
+        if hits is not None:
+            return hits
+        return await self.coalesced_search(query, depth)
+
+    def coalesced_search(self, query: str, depth: int) -> Awaitable[List[Dict[str, Any]]]:
+        """The top ``depth`` hits for ``query``, sharing an identical search already in flight."""
+        key = ("search", coalesce_key(query), depth)
+        return self.single_flight.do(key, lambda: self.catalog.batcher.search(query, depth))
+
+    async def prewarm(self, server_ids: List[str] = (), top_starred: int = 0, playwright: bool = False) -> Dict[str, bool]:
+        """Start popular servers ahead of the first request.
+
+        ``server_ids`` are catalog IDs; ``top_starred`` adds that many of the
+        most-starred usable servers that can be launched automatically.
+        """
+        launches: Dict[str, Dict[str, Any]] = {}
+        if playwright:
+            launches["playwright"] = self.playwright_config
+        hits = [await self.catalog.aget(server_id) for server_id in server_ids]
+        if top_starred:
+            # Over-fetch: many popular servers are remote or need manual setup
+            hits += await self.catalog.apopular(top_starred * 4)
+        wanted = len(launches) + len(server_ids) + top_starred
+        for hit in hits:
+            launch = self.launch_specs.resolve(hit["_id"], hit["_source"])
+            if not isinstance(launch, str):
+                launches.setdefault(*launch)
+            if len(launches) >= wanted:
+                break
+        return await self.server_pool.prewarm(launches.items())
+
+    def add_tool(self, tool: BaseTool, server_name: str = "custom"):
+        self.tool_registry.add(server_name, tool)
+
+    def set_context(self, context: str) -> None:
+        """Set the text (user message and recent turns) that server tools are ranked against."""
+        self._context = context
+
+    @property
+    def generation(self) -> int:
+        """Changes whenever the set of loaded server tools changes."""
+        return self.tool_registry.generation
+
+    def _current_tools(self) -> Tuple[List[BaseTool], frozenset]:
+        key = (self.tool_registry.generation, self._context, self.active_server)
+        if self._tools_view[0] != key:
+            server_tools = self.tool_registry.tools
+            if self._context:
+                server_tools = self.tool_router.select(self._context, server_tools, active_server=self.active_server)
+            tools = self._management_tools + list(server_tools)
+            self._tools_view = (key, tools, frozenset(tool.name for tool in tools))
+        return self._tools_view[1], self._tools_view[2]
 
     @property
     def tools(self) -> list[BaseTool]:
-        """Dynamically assembles the list of available tools."""
-        return self._management_tools + list(self._server_tools.values())
+        """Dynamically assembles the list of available tools.
+
+        Management tools are always included; server tools are cut down to
+        the router's top-k for the current context. The list is rebuilt only
+        when the registry generation, context or active server changes.
+        """
+        return self._current_tools()[0]
 
     def has_tool_changes(self, current_tool_names: set[str]) -> bool:
         """Checks if the toolset has changed by comparing tool names."""
-        return {tool.name for tool in self.tools} != current_tool_names
+        return self._current_tools()[1] != current_tool_names
@@ -0,0 +1,144 @@
+"""
+Per-session agents for serving several users at once.
+
+Each session gets its own agent (conversation history, active server, tool
+set); the pool bounds how many exist with LRU and idle-time eviction.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    agent: Any
+    last_used: float
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    in_use: int = 0
+
+
+class AgentPool:
+    """LRU pool of agents keyed by session ID.
+
+    ``factory`` builds a new agent for an unseen session; it should share the
+    expensive pieces (LLM, MCP client, catalog) between the agents it makes.
+    Evicted agents are ``close()``d. Agents serving a request are never
+    evicted, so the pool may briefly exceed ``max_size`` under load.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        max_size: int = 100,
+        idle_timeout: float = 1800.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._reaper: Optional[asyncio.Task] = None
+        self.created = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._entries
+
+    @asynccontextmanager
+    async def session(self, session_id: str) -> AsyncIterator[Any]:
+        """Lease the agent for ``session_id``, creating it if needed.
+
+        Requests for the same session are serialized so they cannot
+        interleave on its conversation state.
+        """
+        entry = self._entries.get(session_id)
+        if entry is None:
+            entry = _Entry(agent=self.factory(), last_used=self._clock())
+            self._entries[session_id] = entry
+            self.created += 1
+        self._entries.move_to_end(session_id)
+        entry.in_use += 1
+        try:
+            await self._evict()
+            async with entry.lock:
+                yield entry.agent
+        finally:
+            entry.in_use -= 1
+            entry.last_used = self._clock()
+
+    async def discard(self, session_id: str) -> None:
+        """Drop a session's agent (e.g. when the user clears the chat)."""
+        entry = self._entries.pop(session_id, None)
+        if entry is not None:
+            await self._close(entry)
+
+    async def reap(self) -> None:
+        """Close agents that have been idle longer than ``idle_timeout``."""
+        await self._evict()
+
+    async def _evict(self) -> None:
+        now = self._clock()
+        victims: List[_Entry] = []
+        for session_id, entry in list(self._entries.items()):
+            if entry.in_use:
+                continue
+            if now - entry.last_used > self.idle_timeout:
+                victims.append(self._entries.pop(session_id))
+                self.expirations += 1
+        # Least recently used first
+        for session_id, entry in list(self._entries.items()):
+            if len(self._entries) <= self.max_size:
+                break
+            if not entry.in_use:
+                victims.append(self._entries.pop(session_id))
+                self.evictions += 1
+        for entry in victims:
+            await self._close(entry)
+
+    async def _close(self, entry: _Entry) -> None:
+        try:
+            await entry.agent.close()
+        except Exception as e:
+            logger.warning(f"Error closing evicted agent: {e}")
+
+    def start_reaper(self, interval: float = 60.0) -> None:
+        """Reap idle sessions every ``interval`` seconds in the background."""
+        async def loop() -> None:
+            while True:
+                await asyncio.sleep(interval)
+                await self.reap()
+
+        if self._reaper is None:
+            self._reaper = asyncio.create_task(loop())
+
+    async def close(self) -> None:
+        """Stop the reaper and close every agent."""
+        if self._reaper is not None:
+            self._reaper.cancel()
+            self._reaper = None
+        entries, self._entries = list(self._entries.values()), OrderedDict()
+        for entry in entries:
+            await self._close(entry)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "sessions": len(self._entries),
+            "active": sum(1 for entry in self._entries.values() if entry.in_use),
+            "max_size": self.max_size,
+            "idle_timeout": self.idle_timeout,
+            "created": self.created,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
@@ -0,0 +1,71 @@
+"""
+Coalescing of identical concurrent operations ("single flight").
+
+When several sessions connect the same server or run the same search at the
+same moment, the first caller starts the operation and the others await its
+result instead of repeating it.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _Flight:
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Runs at most one operation per key at a time; concurrent callers share it.
+
+    Keys are tuples whose first item names the kind of operation ("connect",
+    "search"), which is what ``stats`` groups by. The operation runs in its own
+    task, so a caller that is cancelled does not cancel it for the others; it is
+    cancelled only when every caller waiting on it has gone.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.executed: Dict[str, int] = defaultdict(int)
+        self.coalesced: Dict[str, int] = defaultdict(int)
+
+    async def do(self, key: Tuple[Hashable, ...], fn: Callable[[], Awaitable[Any]]) -> Any:
+        """The result of ``fn()``, or of the call already in flight for ``key``."""
+        kind = str(key[0])
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.get_running_loop().create_task(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._finish(key, flight))
+            self.executed[kind] += 1
+        else:
+            self.coalesced[kind] += 1
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _finish(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieve the outcome so an error nobody awaited is not reported as unhandled
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    @property
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        kinds = sorted(set(self.executed) | set(self.coalesced))
+        return {
+            "in_flight": self.in_flight,
+            **{kind: {"executed": self.executed[kind], "coalesced": self.coalesced[kind]} for kind in kinds},
+        }
@@ -0,0 +1,198 @@
+"""
+Speculative search and server warm-up while the first LLM call is in flight.
+
+An agent turn is serial: the model decides to search, the search runs, the
+model decides to connect, and only then does the server start. ``Speculator``
+runs the likely first steps as soon as a message arrives: it searches the
+catalog for the raw message and, if warm-up is on, starts the top-ranked
+trusted server in the background. A search for the same text then reuses the
+prefetched hits, and a connect to that server finds it running (or starting).
+Whatever the model did not use is discarded at the end of the turn, stopping
+the process if nothing else uses it.
+
+Warm-up launches a process nobody asked for yet, so it is off by default and
+only ever starts a server that is allowlisted, whose package is in the package
+cache, or whose tool schemas are cached because it has run here before.
+"""
+
+import asyncio
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from .schema_cache import config_key, tools_from_catalog
+from .telemetry import span
+from .text import coalesce_key
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Speculation:
+    """The speculative work of one turn."""
+
+    query: str
+    depth: int
+    search: Optional[asyncio.Task] = None
+    warm: Optional[asyncio.Task] = None
+    server_name: Optional[str] = None
+    # Whether the warm-up started the process (rather than finding it running)
+    spawned: bool = False
+
+
+class Speculator:
+    """Starts, reuses and discards per-turn speculative work.
+
+    ``search_size`` hits are prefetched for the raw message; a model search
+    for the same text up to that depth is served from them. ``warm_rank``
+    limits warm-up to servers that rank that high among them, and a server is
+    only started if the pool has a free slot, so speculation never evicts a
+    running server. ``warm_allow`` lists catalog IDs or server names that may
+    be warmed besides pre-installed and schema-cached ones.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        search_size: int = 10,
+        warm: bool = False,
+        warm_rank: int = 3,
+        warm_allow: Iterable[str] = (),
+    ):
+        self.enabled = enabled
+        self.search_size = search_size
+        self.warm = warm
+        self.warm_rank = warm_rank
+        self.warm_allow = frozenset(warm_allow)
+        self.started = 0
+        self.searches_reused = 0
+        self.warmed = 0
+        self.servers_reused = 0
+        self.discarded = 0
+        self.failed = 0
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "Speculator":
+        """Build from SPECULATIVE_PREFETCH / SPECULATIVE_SEARCH_SIZE and
+        SPECULATIVE_WARM / SPECULATIVE_WARM_RANK / SPECULATIVE_WARM_ALLOW (comma-separated)."""
+        kwargs.setdefault("enabled", os.getenv("SPECULATIVE_PREFETCH", "true").lower() in ("1", "true", "yes"))
+        kwargs.setdefault("search_size", int(os.getenv("SPECULATIVE_SEARCH_SIZE", "10")))
+        kwargs.setdefault("warm", os.getenv("SPECULATIVE_WARM", "false").lower() in ("1", "true", "yes"))
+        kwargs.setdefault("warm_rank", int(os.getenv("SPECULATIVE_WARM_RANK", "3")))
+        kwargs.setdefault(
+            "warm_allow", [name.strip() for name in os.getenv("SPECULATIVE_WARM_ALLOW", "").split(",") if name.strip()]
+        )
+        return cls(**kwargs)
+
+    def begin(self, manager: Any, query: str) -> Optional[Speculation]:
+        """Start searching for ``query`` (and warming its top server) in the background."""
+        if not self.enabled or not query.strip():
+            return None
+        speculation = Speculation(query=query, depth=self.search_size)
+        loop = asyncio.get_running_loop()
+        speculation.search = loop.create_task(manager.coalesced_search(query, speculation.depth))
+        if self.warm:
+            speculation.warm = loop.create_task(self._warm(manager, speculation))
+        else:
+            speculation.search.add_done_callback(_retrieve)
+        self.started += 1
+        return speculation
+
+    async def _warm(self, manager: Any, speculation: Speculation) -> None:
+        try:
+            hits = await speculation.search
+        except Exception:
+            return  # The model's own search will report the error
+        pool = manager.server_pool
+        for hit in hits[: self.warm_rank]:
+            if not hit["_source"].get("usable"):
+                continue
+            # Hits carry only the result-list fields; the launch needs the full document
+            try:
+                server = (await manager.catalog.aget(hit["_id"]))["_source"]
+            except Exception:
+                continue
+            launch = manager.launch_specs.resolve(hit["_id"], server)
+            if isinstance(launch, str):
+                continue
+            server_name, config = launch
+            if not self._trusted(manager, hit["_id"], server, server_name, config):
+                continue
+            if server_name in manager.tool_registry or pool.is_live(server_name) or not pool.free_slots:
+                return
+            with span("speculative_warm", server=server_name):
+                seed = server.get("tools")
+                pool.register(server_name, config, seed_tools=tools_from_catalog(seed) if seed else None)
+                speculation.server_name, speculation.spawned = server_name, True
+                try:
+                    # evict=False claims the free slot atomically; a connect for the same server waits on its lock
+                    await pool.acquire(server_name, evict=False)
+                except Exception as e:
+                    self.failed += 1
+                    logger.info(f"Speculative start of '{server_name}' failed: {e}")
+                    return
+            self.warmed += 1
+            return
+
+    def _trusted(self, manager: Any, server_id: str, server: Dict[str, Any], server_name: str, config: Dict[str, Any]) -> bool:
+        """Whether a server may be started before anyone asked for it."""
+        if server_id in self.warm_allow or server_name in self.warm_allow:
+            return True
+        if manager.launch_specs.preinstalled(server_id, server):
+            return True
+        cache = manager.server_pool.schema_cache
+        # Cached schemas mean this exact launch config has run here before
+        return cache is not None and config_key(config) in cache.entries
+
+    async def prefetched(self, speculation: Optional[Speculation], query: str, depth: int) -> Optional[List[Dict[str, Any]]]:
+        """The prefetched hits for a model search of ``query``, if the speculation covers it."""
+        if (
+            speculation is None
+            or depth > speculation.depth
+            or coalesce_key(query) != coalesce_key(speculation.query)
+        ):
+            return None
+        try:
+            hits = await asyncio.shield(speculation.search)
+        except asyncio.CancelledError:
+            if speculation.search.cancelled():
+                return None
+            raise
+        except Exception:
+            return None
+        self.searches_reused += 1
+        return hits[:depth]
+
+    async def finish(self, manager: Any, speculation: Speculation) -> None:
+        """End the turn: cancel unfinished work and stop a warmed server the model did not connect."""
+        for task in (speculation.warm, speculation.search):
+            if task is not None and not task.done():
+                task.cancel()
+        await asyncio.gather(
+            *(task for task in (speculation.warm, speculation.search) if task is not None), return_exceptions=True
+        )
+        if not speculation.spawned:
+            return
+        if speculation.server_name in manager.tool_registry:
+            self.servers_reused += 1
+        elif await manager.server_pool.discard(speculation.server_name):
+            self.discarded += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "warm": self.warm,
+            "started": self.started,
+            "searches_reused": self.searches_reused,
+            "warmed": self.warmed,
+            "servers_reused": self.servers_reused,
+            "discarded": self.discarded,
+            "failed": self.failed,
+        }
+
+
+def _retrieve(task: asyncio.Task) -> None:
+    # A search nobody awaited must not be reported as an unhandled error
+    if not task.cancelled():
+        task.exception()
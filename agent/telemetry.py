@@ -0,0 +1,273 @@
+"""
+Timed spans, request IDs and Prometheus metrics for the agent pipeline.
+
+``span`` times a block and records it in the ``agent_span_duration_seconds``
+histogram (labelled by span name and outcome). ``REGISTRY.render()`` produces
+the Prometheus text format served at ``/metrics``. If OpenTelemetry is
+installed and ``OTEL_EXPORTER_OTLP_ENDPOINT`` is set, spans are exported as
+OpenTelemetry spans too.
+"""
+
+import asyncio
+import bisect
+import logging
+import math
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+LabelValues = Tuple[str, ...]
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_request_id: ContextVar[Optional[str]] = ContextVar("agent_request_id", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None) -> Iterator[str]:
+    """Tag spans started in this context (and tasks it creates) with a request ID."""
+    request_id = request_id or uuid.uuid4().hex[:16]
+    token = _request_id.set(request_id)
+    try:
+        yield request_id
+    finally:
+        _request_id.reset(token)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, *labels: str) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in items
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[LabelValues, List[int]] = {}
+        self._sums: Dict[LabelValues, float] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        with self._lock:
+            counts = self._counts.setdefault(labels, [0] * (len(self.buckets) + 1))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._sums[labels] = self._sums.get(labels, 0.0) + value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((labels, list(counts), self._sums[labels]) for labels, counts in self._counts.items())
+        for labels, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric(_Metric):
+    """A gauge or counter read from live state (pool sizes, cache counters) at scrape time."""
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Iterable[Tuple[LabelValues, float]]],
+        labels: Sequence[str] = (),
+        kind: str = "gauge",
+    ):
+        super().__init__(name, documentation, labels)
+        self.kind = kind
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        try:
+            samples = list(self.callback())
+        except Exception as e:
+            logger.debug(f"Metric {self.name} unavailable: {e}")
+            return []
+        return self.header() + [
+            f"{self.name}{_format_labels(self.label_names, labels)} {_format_value(value)}"
+            for labels, value in samples
+        ]
+
+
+class Registry:
+    """The set of metrics rendered at ``/metrics``."""
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _add(self, metric: _Metric) -> Any:
+        # Re-registering (e.g. on module reload) keeps the existing metric
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def callback(self, name: str, documentation: str, callback: Callable[[], Iterable[Tuple[LabelValues, float]]], labels: Sequence[str] = (), kind: str = "gauge") -> CallbackMetric:
+        """Register a metric whose samples come from ``callback`` at scrape time.
+
+        Registering the same name again replaces the callback.
+        """
+        metric = CallbackMetric(name, documentation, callback, labels, kind)
+        self._metrics[name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+SPAN_SECONDS = REGISTRY.histogram(
+    "agent_span_duration_seconds", "Time spent in each pipeline stage.", labels=("span", "status")
+)
+SPAN_ERRORS = REGISTRY.counter("agent_span_errors_total", "Pipeline stages that raised.", labels=("span",))
+PROMPT_TOKENS = REGISTRY.histogram(
+    "agent_prompt_tokens",
+    "Estimated size of each prompt sent to the model.",
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000),
+)
+
+
+_tracer: Any = None
+_tracer_lock = threading.Lock()
+_tracer_configured = False
+
+
+def _otel_tracer() -> Any:
+    """An OpenTelemetry tracer exporting over OTLP, if configured and installed."""
+    global _tracer, _tracer_configured
+    if _tracer_configured:
+        return _tracer
+    with _tracer_lock:
+        if _tracer_configured:
+            return _tracer
+        _tracer_configured = True
+        if not os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT"):
+            return None
+        try:
+            from opentelemetry import trace
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+            from opentelemetry.sdk.resources import Resource
+            from opentelemetry.sdk.trace import TracerProvider
+            from opentelemetry.sdk.trace.export import BatchSpanProcessor
+        except ImportError:
+            logger.warning(
+                "OTEL_EXPORTER_OTLP_ENDPOINT is set but OpenTelemetry is not installed; "
+                "pip install opentelemetry-sdk opentelemetry-exporter-otlp-proto-http"
+            )
+            return None
+        service = os.getenv("OTEL_SERVICE_NAME", "mcp-agent")
+        provider = TracerProvider(resource=Resource.create({"service.name": service}))
+        # The exporter reads OTEL_EXPORTER_OTLP_ENDPOINT itself
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+        trace.set_tracer_provider(provider)
+        _tracer = trace.get_tracer("agent")
+        return _tracer
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Dict[str, Any]]:
+    """Time a pipeline stage; works in sync and async code alike.
+
+    Yields a dict of attributes that the block may add to. Exceptions are
+    counted and re-raised; cancellation is recorded but not counted as an error.
+    """
+    tracer = _otel_tracer()
+    otel_span = None
+    if tracer is not None:
+        otel_span = tracer.start_span(name)
+        request_id = current_request_id()
+        if request_id:
+            otel_span.set_attribute("request.id", request_id)
+    start = time.perf_counter()
+    status = "ok"
+    try:
+        yield attributes
+    except (asyncio.CancelledError, GeneratorExit):
+        status = "cancelled"
+        raise
+    except BaseException as e:
+        status = "error"
+        SPAN_ERRORS.inc(1, name)
+        if otel_span is not None:
+            otel_span.record_exception(e)
+        raise
+    finally:
+        elapsed = time.perf_counter() - start
+        SPAN_SECONDS.observe(elapsed, name, status)
+        logger.debug(f"[{current_request_id() or '-'}] {name} {status} {elapsed * 1000:.1f} ms {attributes or ''}")
+        if otel_span is not None:
+            for key, value in attributes.items():
+                otel_span.set_attribute(key, value if isinstance(value, (str, bool, int, float)) else str(value))
+            otel_span.end()
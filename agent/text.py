@@ -0,0 +1,69 @@
+"""
+Text analysis helpers shared by the in-process search components.
+"""
+
+import re
+from typing import List
+
+# Approximates Elasticsearch's standard tokenizer: runs of word characters,
+# keeping inner dots and apostrophes so "node.js" stays a single token.
+_TOKEN_RE = re.compile(r"\w+(?:[.'’]\w+)*")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase tokens the way the standard analyzer does."""
+    if not text:
+        return []
+    return _TOKEN_RE.findall(text.lower())
+
+
+# Common English function words that carry no signal in a capability search
+STOPWORDS = frozenset(
+    "a an and any are as at be by can could do find for from get give how i in is it "
+    "me my need of on or please server servers show some that the this to tool tools "
+    "use want what which with would you".split()
+)
+
+
+def stem(token: str) -> str:
+    """Light suffix stripping so "browsers"/"browser" or "forecasting"/"forecast" collide."""
+    if len(token) <= 3 or not token.isalpha():
+        return token
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("ing") and len(token) > 5:
+        return token[:-3]
+    if token.endswith("ed") and len(token) > 4:
+        return token[:-2]
+    if token.endswith("es") and token[-3] in "sxz":
+        return token[:-2]
+    if token.endswith("s") and not token.endswith(("ss", "us", "is")):
+        return token[:-1]
+    return token
+
+
+def analyze(text: str) -> List[str]:
+    """Stemmed tokens without stopwords, as used for matching and embedding."""
+    return [stem(token) for token in tokenize(text) if token not in STOPWORDS]
+
+
+def coalesce_key(query: str) -> str:
+    """Search text ignoring only case and spacing, for sharing identical searches.
+
+    Looser than ``normalize_query``: queries that differ in any word are
+    different searches here, even if they would share a cache entry.
+    """
+    return " ".join(query.lower().split())
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a search query, used as a cache key.
+
+    Lowercases, drops stopwords and punctuation, stems, and sorts the terms,
+    so "Weather servers" and "  the weather  server" map to the same key.
+    """
+    terms = analyze(query)
+    if not terms:
+        # A query made only of stopwords still deserves a stable key
+        terms = tokenize(query)
+    return " ".join(sorted(terms))
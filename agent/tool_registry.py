@@ -0,0 +1,152 @@
+"""
+Connected-server tools, grouped by the server that owns them.
+
+Every change bumps ``generation``, so "did the tool set change?" is one
+integer comparison. Only ``max_servers`` servers keep their tools loaded;
+loading another unloads the least recently loaded one.
+"""
+
+import copy
+import os
+import re
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+_NON_WORD = re.compile(r"\W+")
+
+
+def alias_for(server: str, tool_name: str) -> str:
+    """Name under which a tool is exposed when another server already uses its name."""
+    return f"{_NON_WORD.sub('_', server).strip('_')}_{tool_name}"
+
+
+class ToolRegistry:
+    """Tools per server in load order (least recent first), with a generation counter.
+
+    When a loaded tool's name is already taken by another server or reserved
+    (the management tools), a renamed copy is exposed as ``<server>_<name>``
+    (suffixed ``_2``, ``_3``... while that is taken too); ``aliases`` maps such
+    names back to the server's own tool name. The tool passed in is not modified.
+    """
+
+    def __init__(self, max_servers: int = 3, reserved: Iterable[str] = ()):
+        self.max_servers = max_servers
+        self._servers: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._owners: Dict[str, str] = {}
+        self._reserved: Set[str] = set(reserved)
+        self._aliases: Dict[str, Dict[str, str]] = {}
+        self.generation = 0
+        self._view: Tuple[int, List[Any], FrozenSet[str]] = (-1, [], frozenset())
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "ToolRegistry":
+        """Build a registry from TOOL_REGISTRY_MAX_SERVERS (0 means unbounded)."""
+        kwargs.setdefault("max_servers", int(os.getenv("TOOL_REGISTRY_MAX_SERVERS", "3")))
+        return cls(**kwargs)
+
+    def __contains__(self, server: str) -> bool:
+        return server in self._servers
+
+    @property
+    def servers(self) -> List[str]:
+        return list(self._servers)
+
+    def tools_of(self, server: str) -> List[Any]:
+        return list(self._servers.get(server, {}).values())
+
+    def owner(self, tool_name: str) -> Optional[str]:
+        return self._owners.get(tool_name)
+
+    def aliases(self, server: str) -> Dict[str, str]:
+        """Exposed name -> the server's own name, for ``server``'s renamed tools."""
+        return dict(self._aliases.get(server, {}))
+
+    def reserve(self, names: Iterable[str]) -> None:
+        """Keep ``names`` (e.g. the management tools) from being used by server tools."""
+        self._reserved.update(names)
+
+    def _drop(self, server: str) -> None:
+        for name in self._servers.pop(server, {}):
+            if self._owners.get(name) == server:
+                del self._owners[name]
+        self._aliases.pop(server, None)
+
+    def _add(self, server: str, tool: Any) -> None:
+        owner = self._owners.get(tool.name)
+        if tool.name in self._reserved or (owner is not None and owner != server):
+            original = tool.name
+            alias = base = alias_for(server, original)
+            suffix = 2
+            while alias in self._reserved or alias in self._owners:
+                alias = f"{base}_{suffix}"
+                suffix += 1
+            # The same tool object may be exposed unrenamed elsewhere (another manager's registry)
+            tool = copy.copy(tool)
+            tool.name = alias
+            self._aliases.setdefault(server, {})[alias] = original
+        self._servers.setdefault(server, {})[tool.name] = tool
+        self._owners[tool.name] = server
+
+    def load(self, server: str, tools: List[Any]) -> List[str]:
+        """Replace ``server``'s tools and mark it most recent.
+
+        Returns the servers unloaded to stay within ``max_servers``.
+        """
+        self._drop(server)
+        self._servers[server] = {}
+        for tool in tools:
+            self._add(server, tool)
+        evicted = []
+        while self.max_servers > 0 and len(self._servers) > self.max_servers:
+            oldest = next(iter(self._servers))
+            self._drop(oldest)
+            evicted.append(oldest)
+        self.generation += 1
+        return evicted
+
+    def add(self, server: str, tool: Any) -> None:
+        """Add one tool to ``server`` (loading the server if needed)."""
+        self._servers.setdefault(server, {})
+        self._add(server, tool)
+        self.generation += 1
+
+    def unload(self, server: str) -> bool:
+        """Drop ``server``'s tools; returns whether it was loaded."""
+        if server not in self._servers:
+            return False
+        self._drop(server)
+        self.generation += 1
+        return True
+
+    def clear(self) -> List[str]:
+        """Unload every server; returns their names."""
+        servers = list(self._servers)
+        for server in servers:
+            self._drop(server)
+        if servers:
+            self.generation += 1
+        return servers
+
+    def _current(self) -> Tuple[int, List[Any], FrozenSet[str]]:
+        if self._view[0] != self.generation:
+            tools = [tool for server_tools in self._servers.values() for tool in server_tools.values()]
+            self._view = (self.generation, tools, frozenset(tool.name for tool in tools))
+        return self._view
+
+    @property
+    def tools(self) -> List[Any]:
+        """Every loaded tool, rebuilt only when the generation changes."""
+        return self._current()[1]
+
+    @property
+    def names(self) -> FrozenSet[str]:
+        return self._current()[2]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "generation": self.generation,
+            "servers": len(self._servers),
+            "max_servers": self.max_servers,
+            "tools": len(self._owners),
+            "aliased": sum(len(aliases) for aliases in self._aliases.values()),
+        }
@@ -0,0 +1,125 @@
+"""
+Picks the tools worth showing the model for the current request.
+
+Every connected server's tools are indexed by name, description and input
+schema (property names and descriptions), and scored against the user's
+message plus recent context with BM25. Only the ``top_k`` best are exposed.
+"""
+
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .text import analyze
+
+K1 = 1.2
+B = 0.75
+
+# Name matches say more about a tool than a word in its schema
+NAME_WEIGHT = 3
+DESCRIPTION_WEIGHT = 2
+
+_CAMEL = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def _schema_text(schema: Any) -> List[str]:
+    """Property names and descriptions from a JSON schema (or pydantic model)."""
+    if hasattr(schema, "model_json_schema"):
+        try:
+            schema = schema.model_json_schema()
+        except Exception:
+            return []
+    if not isinstance(schema, dict):
+        return []
+    parts = []
+    for name, prop in (schema.get("properties") or {}).items():
+        parts.append(name.replace("_", " "))
+        if isinstance(prop, dict) and prop.get("description"):
+            parts.append(str(prop["description"]))
+    return parts
+
+
+def tool_terms(tool: Any) -> Counter:
+    """Weighted term counts describing ``tool``."""
+    name = _CAMEL.sub(" ", tool.name).replace("_", " ").replace("-", " ")
+    terms: Counter = Counter()
+    for term in analyze(name):
+        terms[term] += NAME_WEIGHT
+    for term in analyze(tool.description or ""):
+        terms[term] += DESCRIPTION_WEIGHT
+    for text in _schema_text(getattr(tool, "args_schema", None)):
+        for term in analyze(text):
+            terms[term] += 1
+    return terms
+
+
+def tool_server(tool: Any) -> Optional[str]:
+    """Name of the pooled server a tool belongs to, if known."""
+    return getattr(getattr(tool, "tool_connector", None), "server_name", None)
+
+
+class ToolRouter:
+    """Ranks tools against the conversation and keeps the ``top_k`` best.
+
+    Term statistics are rebuilt only when the set of tools changes. Tools of
+    the ``active_server`` win ties, so a just-connected server stays visible
+    even when the message does not mention its tools by name.
+    """
+
+    def __init__(self, top_k: int = 8):
+        self.top_k = top_k
+        self._key: Tuple[Tuple[str, str], ...] = ()
+        self._terms: List[Counter] = []
+        self._lengths: List[int] = []
+        self._idf: Dict[str, float] = {}
+        self._avg_length = 0.0
+
+    @classmethod
+    def from_env(cls, **kwargs: Any) -> "ToolRouter":
+        """Build a router from TOOL_ROUTER_TOP_K (0 disables routing)."""
+        kwargs.setdefault("top_k", int(os.getenv("TOOL_ROUTER_TOP_K", "8")))
+        return cls(**kwargs)
+
+    def _index(self, tools: Sequence[Any]) -> None:
+        key = tuple((tool.name, tool.description or "") for tool in tools)
+        if key == self._key:
+            return
+        self._key = key
+        self._terms = [tool_terms(tool) for tool in tools]
+        self._lengths = [sum(terms.values()) for terms in self._terms]
+        self._avg_length = sum(self._lengths) / len(self._lengths) if self._lengths else 0.0
+        df = Counter(term for terms in self._terms for term in terms)
+        n = len(tools)
+        self._idf = {term: math.log(1 + (n - count + 0.5) / (count + 0.5)) for term, count in df.items()}
+
+    def scores(self, context: str, tools: Sequence[Any]) -> List[float]:
+        """BM25 score of each tool for ``context``."""
+        self._index(tools)
+        query = set(analyze(context))
+        scores = []
+        for terms, length in zip(self._terms, self._lengths):
+            norm = K1 * (1 - B + B * length / (self._avg_length or 1))
+            scores.append(
+                sum(
+                    self._idf[term] * terms[term] * (K1 + 1) / (terms[term] + norm)
+                    for term in query
+                    if term in terms
+                )
+            )
+        return scores
+
+    def select(self, context: str, tools: Sequence[Any], active_server: Optional[str] = None) -> List[Any]:
+        """The ``top_k`` tools for ``context``, in their original order."""
+        tools = list(tools)
+        if self.top_k <= 0 or len(tools) <= self.top_k:
+            return tools
+        scores = self.scores(context, tools)
+        ranked = sorted(
+            range(len(tools)),
+            key=lambda i: (scores[i], tool_server(tools[i]) == active_server, -i),
+            reverse=True,
+        )
+        keep = set(ranked[: self.top_k])
+        return [tool for i, tool in enumerate(tools) if i in keep]
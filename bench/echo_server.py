@@ -0,0 +1,32 @@
+"""
+A tiny stdio MCP server used by the offline benchmark.
+"""
+
+import time
+
+from mcp.server.fastmcp import FastMCP
+
+server = FastMCP("bench-echo", log_level="WARNING")
+
+
+@server.tool()
+def echo(text: str) -> str:
+    """Echo the given text back."""
+    return text
+
+
+@server.tool()
+def add(a: int, b: int) -> int:
+    """Add two integers."""
+    return a + b
+
+
+@server.tool()
+def wait(milliseconds: int = 50) -> str:
+    """Sleep for a number of milliseconds, to simulate a slow tool."""
+    time.sleep(milliseconds / 1000)
+    return f"waited {milliseconds} ms"
+
+
+if __name__ == "__main__":
+    server.run()
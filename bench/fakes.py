@@ -0,0 +1,172 @@
+"""
+Deterministic stand-ins for Gemini used by the offline benchmark, with optional fault injection.
+"""
+
+import asyncio
+import os
+import random
+import re
+import time
+from typing import Any, AsyncIterator, Iterator, List, Optional, Sequence, Tuple
+
+from agent.gemini_wrapper import GeminiChat
+
+# (pattern matched against the latest user message, reply template).
+# Replies use the text tool-call syntax GeminiChat parses and executes.
+DEFAULT_RULES: List[Tuple[str, str]] = [
+    (r"\b(?:find|search)\b", 'Let me look that up. search_servers(query="echo benchmark")'),
+    (r"\bconnect\b", 'connect_server(server_id="bench-echo")'),
+    (r"\becho (?P<text>[^\"()]+)", 'echo(text="{text}")'),
+    (r"\badd (?P<a>\d+) and (?P<b>\d+)", 'add(a="{a}", b="{b}")'),
+    (r"\bwait (?P<ms>\d+)", 'wait(milliseconds="{ms}")'),
+]
+
+DEFAULT_REPLY = "I can help with that."
+
+_LAST_HUMAN = re.compile(r"^Human: (.*)$", re.MULTILINE)
+
+
+class FakeAPIError(Exception):
+    """An HTTP error from the model API, shaped like ``google.api_core`` exceptions (``code``)."""
+
+    def __init__(self, code: int, message: str = "", retry_after: Optional[float] = None):
+        super().__init__(f"{code} {message or 'Injected model error'}")
+        self.code = code
+        self.retry_after = retry_after
+
+
+class FakeResponse:
+    """Quacks like a google.generativeai response (or stream chunk)."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeGeminiModel:
+    """Replaces ``genai.GenerativeModel``: replies from ``rules`` after ``latency`` seconds.
+
+    Streaming splits the reply into ``chunk_size``-character chunks spread
+    over the same latency. ``recorder`` (optional) gets a "generate" sample
+    per call.
+
+    Faults can be injected: ``errors`` is a list of HTTP codes raised by the
+    next calls in turn, then each call fails with ``error_code`` with
+    probability ``error_rate`` (a 429 asks to retry after ``retry_after``
+    seconds). With probability ``slow_rate`` a call takes ``slow_latency``
+    instead, to produce a latency tail. ``seed`` makes the faults repeatable.
+    """
+
+    def __init__(
+        self,
+        rules: Sequence[Tuple[str, str]] = DEFAULT_RULES,
+        latency: float = 0.05,
+        chunk_size: int = 16,
+        recorder: Optional[Any] = None,
+        errors: Sequence[int] = (),
+        error_rate: float = 0.0,
+        error_code: int = 503,
+        retry_after: Optional[float] = None,
+        slow_rate: float = 0.0,
+        slow_latency: float = 1.0,
+        seed: Optional[int] = None,
+    ):
+        self.rules = [(re.compile(pattern, re.IGNORECASE), reply) for pattern, reply in rules]
+        self.latency = latency
+        self.chunk_size = chunk_size
+        self.recorder = recorder
+        self.errors = list(errors)
+        self.error_rate = error_rate
+        self.error_code = error_code
+        self.retry_after = retry_after
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.failures = 0
+
+    def reply(self, prompt: str) -> str:
+        messages = _LAST_HUMAN.findall(prompt)
+        last = messages[-1] if messages else ""
+        for pattern, reply in self.rules:
+            match = pattern.search(last)
+            if match:
+                return reply.format(**{k: v.strip() for k, v in match.groupdict().items()})
+        return DEFAULT_REPLY
+
+    def _fault(self) -> float:
+        """Raise an injected error, or return this call's latency."""
+        code = self.errors.pop(0) if self.errors else None
+        if code is None and self.error_rate and self._random.random() < self.error_rate:
+            code = self.error_code
+        if code is not None:
+            self.failures += 1
+            raise FakeAPIError(code, retry_after=self.retry_after if code == 429 else None)
+        if self.slow_rate and self._random.random() < self.slow_rate:
+            return self.slow_latency
+        return self.latency
+
+    def _chunks(self, text: str) -> List[str]:
+        return [text[i:i + self.chunk_size] for i in range(0, len(text), self.chunk_size)] or [""]
+
+    def _record(self, start: float) -> None:
+        self.calls += 1
+        if self.recorder is not None:
+            self.recorder.record("generate", time.perf_counter() - start)
+
+    def generate_content(self, prompt: str, generation_config: Any = None, stream: bool = False):
+        start = time.perf_counter()
+        latency = self._fault()
+        text = self.reply(prompt)
+        if not stream:
+            time.sleep(latency)
+            self._record(start)
+            return FakeResponse(text)
+
+        def chunks() -> Iterator[FakeResponse]:
+            parts = self._chunks(text)
+            for part in parts:
+                time.sleep(latency / len(parts))
+                yield FakeResponse(part)
+            self._record(start)
+
+        return chunks()
+
+    async def generate_content_async(self, prompt: str, generation_config: Any = None, stream: bool = False):
+        start = time.perf_counter()
+        latency = self._fault()
+        text = self.reply(prompt)
+        if not stream:
+            await asyncio.sleep(latency)
+            self._record(start)
+            return FakeResponse(text)
+
+        async def chunks() -> AsyncIterator[FakeResponse]:
+            parts = self._chunks(text)
+            for part in parts:
+                await asyncio.sleep(latency / len(parts))
+                yield FakeResponse(part)
+            self._record(start)
+
+        return chunks()
+
+
+class ScriptedGeminiChat(GeminiChat):
+    """``GeminiChat`` with its Gemini client swapped for a ``FakeGeminiModel``.
+
+    Prompt building and tool-call execution are the real ones, so they are
+    part of what the benchmark measures.
+    """
+
+    fake_model: Any = None
+
+    def __init__(self, fake_model: Optional[FakeGeminiModel] = None, **kwargs: Any):
+        # GeminiChat insists on a key; the fake model never uses it
+        os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+        super().__init__(**kwargs)
+        self.fake_model = fake_model or FakeGeminiModel()
+        self.gemini_model = self.fake_model
+
+    def bind_tools(self, tools: Sequence[Any], **kwargs: Any) -> "ScriptedGeminiChat":
+        bound = super().bind_tools(tools, **kwargs)
+        bound.fake_model = bound.gemini_model = self.fake_model
+        return bound
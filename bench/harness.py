@@ -0,0 +1,351 @@
+"""
+Offline end-to-end benchmark: scripted conversations through the agent stack.
+
+Everything external is replaced locally: the catalog is the bundled CSV plus
+one benchmark server, Gemini is a ``FakeGeminiModel``, and the MCP server is
+``bench/echo_server.py`` over stdio. Stage latencies are recorded by wrapping
+the relevant methods on the benchmark's own instances.
+"""
+
+import asyncio
+import csv
+import functools
+import json
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from agent.local_search import DEFAULT_DATASET_PATH
+
+ECHO_SERVER = Path(__file__).resolve().parent / "echo_server.py"
+
+STAGES = ("search", "connect", "tool_listing", "generate", "tool_call", "turn")
+
+# One scripted conversation; see fakes.DEFAULT_RULES for the model's replies
+DEFAULT_SCRIPT = [
+    "Find me an echo server for testing",
+    "Connect to the echo server",
+    "Please echo hello world",
+    "Now add 2 and 3",
+]
+
+BENCH_SERVER = {
+    "id": "bench-echo",
+    "name": "Bench Echo",
+    "slug": "bench-echo",
+    "namespace": "bench",
+    "description": "Echo test server for offline benchmarks: echoes text and adds numbers",
+    "github_stars": "0",
+    "usable": "true",
+    "categories": "[]",
+    "tools": "[]",
+    "config": json.dumps({"command": sys.executable, "args": [str(ECHO_SERVER)]}),
+}
+
+
+class Recorder:
+    """Collects latency samples (seconds) per stage."""
+
+    def __init__(self) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.samples[stage].append(seconds)
+
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        """Wrap an async callable so each call is recorded under ``stage``."""
+        @functools.wraps(fn)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.record(stage, time.perf_counter() - start)
+
+        return wrapper
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {stage: summarize(samples) for stage, samples in sorted(self.samples.items())}
+
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile of already sorted samples."""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * q / 100
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Count, mean and tail percentiles, in milliseconds."""
+    ordered = sorted(samples)
+    ms = lambda value: round(value * 1000, 3)  # noqa: E731
+    return {
+        "count": len(ordered),
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]) if ordered else 0.0,
+    }
+
+
+def write_dataset(directory: Path) -> Path:
+    """The bundled catalog plus the benchmark echo server, as a CSV."""
+    path = directory / "servers.csv"
+    csv.field_size_limit(sys.maxsize)
+    with open(DEFAULT_DATASET_PATH, newline="", encoding="utf-8") as source, \
+            open(path, "w", newline="", encoding="utf-8") as target:
+        reader = csv.DictReader(source)
+        writer = csv.DictWriter(target, fieldnames=reader.fieldnames)
+        writer.writeheader()
+        writer.writerows(reader)
+        writer.writerow({field: BENCH_SERVER.get(field, "") for field in reader.fieldnames})
+    return path
+
+
+class BenchEnvironment:
+    """Shared, instrumented components and a per-session agent factory."""
+
+    def __init__(
+        self,
+        recorder: Recorder,
+        llm_latency: float = 0.05,
+        max_live: int = 8,
+        llm_faults: Optional[Dict[str, Any]] = None,
+        hedge: bool = False,
+    ):
+        from mcp_use import MCPClient
+
+        from agent.catalog import ServerCatalog
+        from agent.intent_router import IntentRouter
+        from agent.mcp_pool import MCPServerPool
+        from agent.schema_cache import ToolSchemaCache
+        from agent.launch_specs import LaunchSpecTable
+        from agent.llm_policy import LLMCallPolicy
+        from agent.singleflight import SingleFlight
+        from agent.speculation import Speculator
+
+        from .fakes import FakeGeminiModel, ScriptedGeminiChat
+
+        self.recorder = recorder
+        self._tmp = tempfile.TemporaryDirectory(prefix="mcp-bench-")
+        directory = Path(self._tmp.name)
+        self.client = MCPClient(config={})
+        self.catalog = ServerCatalog(backend="local", dataset_path=str(write_dataset(directory)))
+        self.catalog.amsearch = recorder.timed("search", self.catalog.amsearch)
+        self.pool = MCPServerPool(
+            self.client, max_live=max_live, schema_cache=ToolSchemaCache(directory / "tool_schemas.json")
+        )
+        self.pool.call_tool = recorder.timed("tool_call", self.pool.call_tool)
+        self.intent_router = IntentRouter(directory / "intents.json")
+        self.launch_specs = LaunchSpecTable()
+        self.launch_specs.compile(self.catalog.local_index.documents)
+        self.intent_router.seed(self.catalog.local_index.documents, self.launch_specs.launchable)
+        self.single_flight = SingleFlight()
+        # Warm-up would launch the real catalog servers a search ranks first
+        self.speculator = Speculator(warm=False)
+        # Retries back off in milliseconds: the fake model has no quota to protect
+        self.llm = ScriptedGeminiChat(
+            fake_model=FakeGeminiModel(latency=llm_latency, recorder=recorder, seed=0, **(llm_faults or {})),
+            call_policy=LLMCallPolicy(base_delay=0.01, max_delay=0.1, hedge=hedge),
+        )
+
+    def create_agent(self) -> Any:
+        from agent.agent import SearchAgent
+        from agent.server_manager import ElasticServerManager
+
+        manager = ElasticServerManager(
+            self.client,
+            catalog=self.catalog,
+            server_pool=self.pool,
+            intent_router=self.intent_router,
+            single_flight=self.single_flight,
+            launch_specs=self.launch_specs,
+            speculator=self.speculator,
+        )
+        manager.connect = self.recorder.timed("connect", manager.connect)
+        manager.adapter._create_tools_from_connectors = self.recorder.timed(
+            "tool_listing", manager.adapter._create_tools_from_connectors
+        )
+        return SearchAgent(
+            llm=self.llm,
+            use_server_manager=True,
+            client=self.client,
+            server_manager=manager,
+            owns_resources=False,
+        )
+
+    async def close(self) -> None:
+        await self.pool.close()
+        await self.catalog.close()
+        self._tmp.cleanup()
+
+
+def _failed(response: Any) -> bool:
+    text = str(response)
+    return "Tool Error" in text or "Error generating response" in text or "not found" in text
+
+
+async def run_agent_mode(
+    env: BenchEnvironment, conversations: int, concurrency: int, script: Sequence[str], max_steps: int
+) -> Dict[str, int]:
+    """Each conversation gets its own agent; ``concurrency`` run at once."""
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"turns": 0, "errors": 0}
+
+    async def conversation() -> None:
+        async with semaphore:
+            agent = env.create_agent()
+            try:
+                for message in script:
+                    start = time.perf_counter()
+                    try:
+                        response = await agent.run(message, max_steps=max_steps)
+                        counts["errors"] += _failed(response)
+                    except Exception:
+                        counts["errors"] += 1
+                    env.recorder.record("turn", time.perf_counter() - start)
+                    counts["turns"] += 1
+            finally:
+                await agent.close()
+
+    await asyncio.gather(*(conversation() for _ in range(conversations)))
+    return counts
+
+
+async def run_web_mode(
+    env: BenchEnvironment, conversations: int, concurrency: int, script: Sequence[str], max_steps: int
+) -> Dict[str, int]:
+    """Drive ``web.py``'s /api/chat in-process, one session ID per conversation."""
+    import httpx
+
+    import web
+    from agent.sessions import AgentPool
+
+    web.agent_pool = AgentPool(env.create_agent, max_size=max(conversations, 1))
+    semaphore = asyncio.Semaphore(concurrency)
+    counts = {"turns": 0, "errors": 0}
+    transport = httpx.ASGITransport(app=web.app)
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as http:
+        async def conversation(session: int) -> None:
+            async with semaphore:
+                for message in script:
+                    start = time.perf_counter()
+                    try:
+                        response = await http.post(
+                            "/api/chat",
+                            json={"message": message, "max_steps": max_steps, "session_id": f"bench-{session}"},
+                        )
+                        body = response.json()
+                        counts["errors"] += response.status_code != 200 or _failed(body.get("response"))
+                    except Exception:
+                        counts["errors"] += 1
+                    env.recorder.record("turn", time.perf_counter() - start)
+                    counts["turns"] += 1
+
+        await asyncio.gather(*(conversation(i) for i in range(conversations)))
+    await web.agent_pool.close()
+    return counts
+
+
+async def run_benchmark(
+    mode: str = "agent",
+    conversations: int = 20,
+    concurrency: int = 4,
+    llm_latency: float = 0.05,
+    max_steps: int = 3,
+    script: Sequence[str] = DEFAULT_SCRIPT,
+    llm_faults: Optional[Dict[str, Any]] = None,
+    hedge: bool = False,
+) -> Dict[str, Any]:
+    """Run one benchmark and return its JSON-serializable report.
+
+    ``llm_faults`` are ``FakeGeminiModel`` fault-injection options
+    (``error_rate``, ``slow_rate``, ...); ``hedge`` turns on hedged model calls.
+    """
+    recorder = Recorder()
+    env = BenchEnvironment(
+        recorder, llm_latency=llm_latency, max_live=max(concurrency, 1), llm_faults=llm_faults, hedge=hedge
+    )
+    runner = run_web_mode if mode == "web" else run_agent_mode
+    start = time.perf_counter()
+    try:
+        counts = await runner(env, conversations, concurrency, script, max_steps)
+    finally:
+        wall = time.perf_counter() - start
+        pool_stats = env.pool.stats()
+        catalog_stats = env.catalog.stats()
+        intent_stats = env.intent_router.stats()
+        single_flight_stats = env.single_flight.stats()
+        speculation_stats = env.speculator.stats()
+        llm_stats = {**env.llm.call_policy.stats(), "injected_failures": env.llm.fake_model.failures}
+        await env.close()
+    return {
+        "benchmark": "mcp-agent-offline",
+        "mode": mode,
+        "config": {
+            "conversations": conversations,
+            "concurrency": concurrency,
+            "turns_per_conversation": len(script),
+            "llm_latency_ms": llm_latency * 1000,
+            "max_steps": max_steps,
+            "llm_faults": llm_faults or {},
+            "hedge": hedge,
+        },
+        "wall_seconds": round(wall, 3),
+        "throughput": {
+            "turns_per_second": round(counts["turns"] / wall, 3) if wall else 0.0,
+            "conversations_per_second": round(conversations / wall, 3) if wall else 0.0,
+        },
+        "turns": counts["turns"],
+        "errors": counts["errors"],
+        "stages": recorder.summary(),
+        "mcp_pool": pool_stats,
+        "search": catalog_stats,
+        "intents": intent_stats,
+        "single_flight": single_flight_stats,
+        "speculation": speculation_stats,
+        "llm": llm_stats,
+    }
+
+
+def compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> List[str]:
+    """Lines describing per-stage p50/p95 and throughput changes against ``baseline``."""
+    def change(new: float, old: float) -> str:
+        return f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+
+    lines = []
+    for stage, stats in report["stages"].items():
+        old = baseline.get("stages", {}).get(stage)
+        if not old:
+            continue
+        lines.append(
+            f"{stage:<13} p50 {old['p50_ms']:>9.2f} -> {stats['p50_ms']:>9.2f} ms ({change(stats['p50_ms'], old['p50_ms'])})"
+            f"   p95 {old['p95_ms']:>9.2f} -> {stats['p95_ms']:>9.2f} ms ({change(stats['p95_ms'], old['p95_ms'])})"
+        )
+    new_tps = report["throughput"]["turns_per_second"]
+    old_tps = baseline.get("throughput", {}).get("turns_per_second", 0.0)
+    lines.append(f"throughput    {old_tps:.2f} -> {new_tps:.2f} turns/s ({change(new_tps, old_tps)})")
+    return lines
+
+
+def format_report(report: Dict[str, Any]) -> List[str]:
+    lines = [
+        f"mode={report['mode']} conversations={report['config']['conversations']} "
+        f"concurrency={report['config']['concurrency']} wall={report['wall_seconds']}s "
+        f"turns/s={report['throughput']['turns_per_second']} errors={report['errors']}",
+        f"{'stage':<13} {'count':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'max ms':>10}",
+    ]
+    for stage, stats in report["stages"].items():
+        lines.append(
+            f"{stage:<13} {stats['count']:>6} {stats['p50_ms']:>10.2f} {stats['p95_ms']:>10.2f} "
+            f"{stats['p99_ms']:>10.2f} {stats['max_ms']:>10.2f}"
+        )
+    return lines
@@ -0,0 +1,143 @@
+"""
+A minimal local npm registry, standing in for registry.npmjs.org offline.
+
+It serves generated packages with just enough of the registry API (package
+documents and tarballs) for ``npm exec`` / ``npx`` to resolve and install
+them, and counts requests so a test can tell whether a launch went to the
+registry at all.
+
+    python -m bench.npm_registry --port 4873 --package bench-echo-mcp
+    python preinstall.py --package npx:bench-echo-mcp --registry http://127.0.0.1:4873
+"""
+
+import argparse
+import base64
+import hashlib
+import io
+import json
+import tarfile
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional
+from urllib.parse import unquote
+
+BIN_SCRIPT = "#!/usr/bin/env node\nconsole.log('{name} {version}');\n"
+
+
+def build_tarball(name: str, version: str) -> bytes:
+    """An npm package tarball with a package.json and one bin script."""
+    command = name.rsplit("/", 1)[-1]
+    files = {
+        "package/package.json": json.dumps({"name": name, "version": version, "bin": {command: "index.js"}}),
+        "package/index.js": BIN_SCRIPT.format(name=name, version=version),
+    }
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as tar:
+        for path, text in files.items():
+            data = text.encode()
+            info = tarfile.TarInfo(path)
+            info.size = len(data)
+            info.mode = 0o755
+            tar.addfile(info, io.BytesIO(data))
+    return buffer.getvalue()
+
+
+class LocalNpmRegistry:
+    """Serves ``packages`` (each at ``version``) on ``host:port`` (0 picks a free port)."""
+
+    def __init__(self, packages: Iterable[str] = ("bench-echo-mcp",), version: str = "1.0.0", host: str = "127.0.0.1", port: int = 0):
+        self.version = version
+        self.tarballs: Dict[str, bytes] = {name: build_tarball(name, version) for name in packages}
+        self.requests: Counter = Counter()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def packument(self, name: str) -> Dict:
+        tarball = self.tarballs[name]
+        command = name.rsplit("/", 1)[-1]
+        return {
+            "name": name,
+            "dist-tags": {"latest": self.version},
+            "versions": {
+                self.version: {
+                    "name": name,
+                    "version": self.version,
+                    "bin": {command: "index.js"},
+                    "dist": {
+                        "tarball": f"{self.url}/{name}/-/{command}-{self.version}.tgz",
+                        "shasum": hashlib.sha1(tarball).hexdigest(),
+                        "integrity": "sha512-" + base64.b64encode(hashlib.sha512(tarball).digest()).decode(),
+                    },
+                }
+            },
+        }
+
+    def _handler(self):
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                path = unquote(self.path.split("?", 1)[0]).lstrip("/")
+                name, _, rest = path.partition("/-/")
+                registry.requests["tarball" if rest else "packument"] += 1
+                if name not in registry.tarballs:
+                    self._send(404, b'{"error":"Not found"}', "application/json")
+                elif rest:
+                    self._send(200, registry.tarballs[name], "application/octet-stream")
+                else:
+                    self._send(200, json.dumps(registry.packument(name)).encode(), "application/json")
+
+            def _send(self, status: int, body: bytes, content_type: str) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        return Handler
+
+    def serve_forever(self) -> None:
+        self._server.serve_forever()
+
+    def start(self) -> "LocalNpmRegistry":
+        """Serve from a background thread."""
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "LocalNpmRegistry":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Serve generated npm packages locally.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4873)
+    parser.add_argument("--package", action="append", help="Package name to serve (repeatable)")
+    args = parser.parse_args()
+    registry = LocalNpmRegistry(args.package or ["bench-echo-mcp"], host=args.host, port=args.port)
+    print(f"Serving {', '.join(registry.tarballs)} at {registry.url}")
+    try:
+        registry.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Offline benchmark of the agent stack: no Gemini, Elastic Cloud or npx needed.
+
+    python benchmark.py --mode agent --conversations 20 --concurrency 4
+    python benchmark.py --mode web --output after.json --baseline before.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+# Keep the run offline and quiet
+os.environ.setdefault("MCP_USE_ANONYMIZED_TELEMETRY", "false")
+os.environ.setdefault("GEMINI_API_KEY", "offline-benchmark")
+os.environ["SEARCH_BACKEND"] = "local"
+
+from mcp_use import set_debug
+
+from bench.harness import compare, format_report, run_benchmark
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run scripted conversations against local fakes and report per-stage latency.")
+    parser.add_argument("--mode", choices=("agent", "web", "both"), default="agent", help="Drive MCPAgent directly, web.py's /api/chat, or both")
+    parser.add_argument("--conversations", type=int, default=20, help="Number of scripted conversations")
+    parser.add_argument("--concurrency", type=int, default=4, help="Conversations running at the same time")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="Simulated model latency in seconds")
+    parser.add_argument("--max-steps", type=int, default=3)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Fraction of model calls failing with --llm-error-code")
+    parser.add_argument("--llm-error-code", type=int, default=503, help="HTTP status of injected model errors (429 for rate limits)")
+    parser.add_argument("--llm-slow-rate", type=float, default=0.0, help="Fraction of model calls taking --llm-slow-latency")
+    parser.add_argument("--llm-slow-latency", type=float, default=1.0, help="Latency of slow model calls in seconds")
+    parser.add_argument("--hedge", action="store_true", help="Hedge model calls slower than the recent p95")
+    parser.add_argument("--output", help="Write the JSON report here")
+    parser.add_argument("--baseline", help="A previous JSON report to compare against")
+    args = parser.parse_args()
+
+    set_debug(0)
+    logging.basicConfig(level=logging.WARNING)
+    # Shutdown chatter from stdio sessions would drown the report
+    for name in ("mcp_use", "mcp", "httpx"):
+        logging.getLogger(name).setLevel(logging.ERROR)
+
+    modes = ("agent", "web") if args.mode == "both" else (args.mode,)
+    llm_faults = {
+        "error_rate": args.llm_error_rate,
+        "error_code": args.llm_error_code,
+        "slow_rate": args.llm_slow_rate,
+        "slow_latency": args.llm_slow_latency,
+    }
+    reports = {}
+    for mode in modes:
+        reports[mode] = asyncio.run(
+            run_benchmark(
+                mode=mode,
+                conversations=args.conversations,
+                concurrency=args.concurrency,
+                llm_latency=args.llm_latency,
+                max_steps=args.max_steps,
+                llm_faults=llm_faults,
+                hedge=args.hedge,
+            )
+        )
+        print("\n".join(format_report(reports[mode])))
+        print()
+
+    result = reports[modes[0]] if len(modes) == 1 else {"runs": reports}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for mode, report in reports.items():
+            previous = baseline.get("runs", {}).get(mode, baseline if baseline.get("mode") == mode else None)
+            if previous:
+                print(f"\nvs baseline ({mode}):")
+                print("\n".join(compare(report, previous)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Build (or rebuild) the public_servers index from the catalog CSV.
+
+    python ingest.py --recreate
+    python ingest.py --recreate --vectors    # also embed servers for SEARCH_RETRIEVAL=hybrid
+"""
+
+import argparse
+
+from agent.catalog import INDEX_NAME, ServerCatalog
+from agent.ingest import DEFAULT_FIT_SAMPLE, fit_embedder, ingest
+from agent.local_search import DEFAULT_DATASET_PATH
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--csv", default=str(DEFAULT_DATASET_PATH), help="catalog CSV to load")
+    parser.add_argument("--index", default=INDEX_NAME)
+    parser.add_argument("--workers", type=int, default=4, help="parallel _bulk workers")
+    parser.add_argument("--chunk-size", type=int, default=500, help="documents per _bulk request")
+    parser.add_argument("--recreate", action="store_true", help="drop and recreate the index first")
+    parser.add_argument("--vectors", action="store_true", help="add server embeddings for hybrid retrieval")
+    parser.add_argument(
+        "--vector-sample", type=int, default=DEFAULT_FIT_SAMPLE, help="documents the embedding model is fitted on"
+    )
+    parser.add_argument(
+        "--embedder", help="where to save the embedding model (default: SEARCH_EMBEDDER_PATH or ~/.cache/mcp-use-elastic)"
+    )
+    args = parser.parse_args()
+
+    catalog = ServerCatalog.from_env(backend="elastic", connections_per_node=max(10, args.workers))
+    embedder = None
+    if args.vectors:
+        # Fitted on the CSV being indexed; searches load this same model to embed queries
+        embedder = fit_embedder(args.csv, sample=args.vector_sample)
+        embedder_path = args.embedder or catalog.embedder_path
+        embedder.save(embedder_path)
+        print(f"Saved embedding model {embedder.fingerprint} to {embedder_path}")
+    try:
+        stats = ingest(
+            catalog.client,
+            path=args.csv,
+            index=args.index,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            recreate=args.recreate,
+            embedder=embedder,
+        )
+    except (ValueError, RuntimeError) as e:
+        catalog.client.close()
+        parser.exit(1, f"{e}\n")
+    print(
+        f"Indexed {stats.indexed} documents into '{args.index}' in {stats.elapsed:.2f}s "
+        f"({stats.docs_per_second:.0f} docs/s), {stats.failed} failed"
+    )
+    for error in stats.errors:
+        print(f"  {error}")
+    catalog.client.close()
+
+
+if __name__ == "__main__":
+    main()
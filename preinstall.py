@@ -0,0 +1,81 @@
+"""
+Pre-fetch the npm/uv packages of popular catalog servers into a local cache.
+
+    python preinstall.py --top 20
+    python preinstall.py --top 5 --cache-dir /tmp/mcp-packages --registry http://127.0.0.1:4873
+
+Start the app with MCP_PACKAGE_CACHE set to the same directory (and the same
+MCP_NPM_REGISTRY / MCP_PYPI_INDEX, if any) so npx/uvx launches use the cache.
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+
+from agent.launch_specs import LaunchSpec, LaunchSpecTable
+from agent.local_search import load_local_index
+from agent.package_cache import DEFAULT_CACHE_DIR, PackageCache
+
+
+def select_specs(table: LaunchSpecTable, top: int, server_ids=(), packages=()):
+    """The named servers and packages, plus the ``top`` most-starred usable servers with a package."""
+    index = load_local_index(os.getenv("SERVER_DATASET_PATH") or None)
+    table.compile(index.documents)
+    specs = []
+    for server_id in server_ids:
+        spec = table.get(server_id)
+        if isinstance(spec, str):
+            print(f"skip {server_id}: {spec}", file=sys.stderr)
+        else:
+            specs.append(spec)
+    for entry in packages:
+        runner, _, package = entry.partition(":")
+        specs.append(LaunchSpec(server_name=package, command=runner, args=(package,)))
+    if top:
+        popular = []
+        for hit in index.popular(len(index)):
+            spec = table.get(hit["_id"], hit["_source"])
+            if isinstance(spec, LaunchSpec) and spec.package is not None:
+                popular.append(spec)
+            if len(popular) >= top:
+                break
+        specs += popular
+    return specs
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-install npx/uvx packages of catalog servers into a local cache.")
+    parser.add_argument("--top", type=int, default=20, help="Most-starred usable servers to pre-install")
+    parser.add_argument("--server", action="append", default=[], help="Catalog server ID to pre-install (repeatable)")
+    parser.add_argument("--package", action="append", default=[], help="Extra package as npx:NAME or uvx:NAME (repeatable)")
+    parser.add_argument("--cache-dir", default=os.getenv("MCP_PACKAGE_CACHE") or str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--registry", default=os.getenv("MCP_NPM_REGISTRY"), help="npm registry URL (e.g. a local mirror)")
+    parser.add_argument("--index-url", default=os.getenv("MCP_PYPI_INDEX"), help="PyPI index URL for uv")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds allowed per package")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the install commands")
+    args = parser.parse_args()
+
+    cache = PackageCache(args.cache_dir, npm_registry=args.registry, pypi_index=args.index_url, timeout=args.timeout)
+    specs = select_specs(LaunchSpecTable(), args.top, args.server, args.package)
+    if args.dry_run:
+        for spec in specs:
+            print(" ".join(cache.install_command(spec) or ["#", spec.server_name, "(nothing to install)"]))
+        return
+
+    results = asyncio.run(cache.install_all(specs, concurrency=args.concurrency))
+    for result in results:
+        status = "ok  " if result["ok"] else "FAIL"
+        timing = f"{result['seconds']:>7.2f}s" if "seconds" in result else " " * 8
+        line = f"{status} {timing} {result['runner']:<4} {result['package']} ({result['server']})"
+        print(line + (f": {result['error']}" if not result["ok"] else ""))
+    failed = sum(not result["ok"] for result in results)
+    print(f"\n{len(results) - failed}/{len(results)} packages cached in {cache.directory}")
+    print(f"Launch with MCP_PACKAGE_CACHE={cache.directory}" + (f" MCP_NPM_REGISTRY={args.registry}" if args.registry else ""))
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+AdmissionController shedding (429 when the queue is full, 503 after the queue
+timeout) and the server-side max_steps cap.
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+import pytest
+from starlette.testclient import TestClient
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import web  # noqa: E402
+from agent.admission import AdmissionController, Overloaded  # noqa: E402
+
+
+async def _hold(controller, release):
+    async with controller.admit():
+        await release.wait()
+
+
+def test_full_queue_is_shed_with_429():
+    async def main():
+        controller = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(controller, release))
+        waiting = asyncio.create_task(_hold(controller, release))
+        await asyncio.sleep(0)
+        assert (controller.active, controller.queued) == (1, 1)
+
+        with pytest.raises(Overloaded) as shed:
+            async with controller.admit():
+                pass
+        assert shed.value.status_code == 429
+        assert shed.value.headers == {"Retry-After": "5"}
+
+        # The queued request gets the slot once it frees
+        release.set()
+        await asyncio.gather(running, waiting)
+        assert controller.admitted == 2
+        assert controller.stats()["rejected_429"] == 1
+        assert (controller.active, controller.queued) == (0, 0)
+
+    asyncio.run(main())
+
+
+def test_queue_timeout_is_shed_with_503_and_retry_after():
+    async def main():
+        controller = AdmissionController(max_concurrent=1, max_queue=4, queue_timeout=0.05)
+        release = asyncio.Event()
+        running = asyncio.create_task(_hold(controller, release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(Overloaded) as shed:
+            async with controller.admit():
+                pass
+        assert shed.value.status_code == 503
+        # Rounded up to whole seconds, at least 1
+        assert shed.value.headers == {"Retry-After": "1"}
+        assert controller.queued == 0
+        assert controller.rejected == {429: 0, 503: 1}
+
+        release.set()
+        await running
+
+    asyncio.run(main())
+
+
+def test_slot_is_released_when_the_request_fails():
+    async def main():
+        controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=0.05)
+        with pytest.raises(RuntimeError):
+            async with controller.admit():
+                raise RuntimeError("agent failed")
+        async with controller.admit():
+            assert controller.active == 1
+        assert controller.active == 0
+
+    asyncio.run(main())
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("CHAT_MAX_CONCURRENT", "3")
+    monkeypatch.setenv("CHAT_MAX_QUEUE", "7")
+    monkeypatch.setenv("CHAT_QUEUE_TIMEOUT", "2.5")
+    controller = AdmissionController.from_env()
+    assert (controller.max_concurrent, controller.max_queue, controller.queue_timeout) == (3, 7, 2.5)
+
+
+def test_max_steps_is_capped(monkeypatch):
+    monkeypatch.setattr(web, "MAX_STEPS_LIMIT", 20)
+    assert web._max_steps({}) == web.DEFAULT_MAX_STEPS
+    assert web._max_steps({"max_steps": "5"}) == 5
+    assert web._max_steps({"max_steps": 1000}) == 20
+    for bad in (0, -1, "many", None):
+        with pytest.raises(ValueError):
+            web._max_steps({"max_steps": bad})
+
+
+class RecordingAgent:
+    def __init__(self):
+        self.max_steps = None
+
+    async def run(self, message, max_steps=10):
+        self.max_steps = max_steps
+        return "ok"
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    agent = RecordingAgent()
+
+    @asynccontextmanager
+    async def session(session_id):
+        yield agent
+
+    async def ready():
+        return None
+
+    monkeypatch.setattr(web.agent_pool, "session", session)
+    monkeypatch.setattr(web.warmup, "wait", ready)
+    return agent
+
+
+def test_chat_runs_with_capped_max_steps(chat, monkeypatch):
+    monkeypatch.setattr(web, "MAX_STEPS_LIMIT", 4)
+    monkeypatch.setattr(web, "admission", AdmissionController())
+    client = TestClient(web.app)
+
+    response = client.post("/api/chat", json={"message": "hello", "max_steps": 50})
+    assert response.status_code == 200
+    assert chat.max_steps == 4
+
+    response = client.post("/api/chat", json={"message": "hello", "max_steps": 0})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize("path", ["/api/chat", "/api/chat/stream"])
+def test_chat_is_shed_when_no_slot_can_be_queued(chat, monkeypatch, path):
+    # No slots and no queue: every request is turned away at once
+    monkeypatch.setattr(web, "admission", AdmissionController(max_concurrent=0, max_queue=0, queue_timeout=3))
+    response = TestClient(web.app).post(path, json={"message": "hello"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert chat.max_steps is None
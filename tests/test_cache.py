@@ -0,0 +1,90 @@
+"""
+SearchCache expiry, eviction and invalidation, and how the catalog keys it.
+"""
+
+from agent.cache import SearchCache
+from agent.catalog import ServerCatalog
+from agent.text import normalize_query
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = SearchCache(ttl=10, clock=clock)
+    cache.put("q", [1])
+    clock.now = 9.9
+    assert cache.get("q") == [1]
+    clock.now = 10.0
+    assert cache.get("q") is None
+    assert cache.expirations == 1
+    assert len(cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SearchCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.evictions == 1
+
+
+def test_version_change_drops_entries():
+    cache = SearchCache()
+    cache.validate(("elastic", 1, 100))
+    cache.put("q", [1])
+    cache.validate(("elastic", 1, 100))
+    assert cache.get("q") == [1]
+    cache.validate(("elastic", 2, 100))
+    assert cache.get("q") is None
+    assert cache.invalidations == 1
+
+
+def test_normalize_query_keys_equivalent_phrasings_together():
+    assert normalize_query("Weather servers") == normalize_query("  the weather  server")
+    assert normalize_query("forecasting tools") == normalize_query("forecast")
+    assert normalize_query("weather") != normalize_query("github")
+    # Only stopwords: still a stable, non-empty key
+    assert normalize_query("the") == "the"
+
+
+class CountingCatalog(ServerCatalog):
+    def __init__(self, **kwargs):
+        super().__init__(backend="local", **kwargs)
+        self.searches = 0
+        self.version = 1
+
+    def _local_version(self):
+        return ("local", "test", self.version)
+
+    def _search_uncached(self, query, size):
+        self.searches += 1
+        return [{"_id": str(i), "_source": {}} for i in range(size)]
+
+
+def test_catalog_serves_rephrased_queries_from_cache():
+    catalog = CountingCatalog(version_check_interval=0)
+    catalog.search("Weather servers", 5)
+    catalog.search("the weather server", 5)
+    assert catalog.searches == 1
+    # Pages of the same depth share the entry; a deeper one does not
+    assert len(catalog.search("weather", 3, offset=2)) == 3
+    catalog.search("weather", 10)
+    assert catalog.searches == 2
+
+
+def test_catalog_refetches_after_index_version_changes():
+    catalog = CountingCatalog(version_check_interval=0)
+    catalog.search("weather", 5)
+    catalog.version = 2
+    catalog.search("weather", 5)
+    assert catalog.searches == 2
@@ -0,0 +1,125 @@
+"""
+Local BM25 ranking and the ``auto`` backend's fallback to it.
+"""
+
+import csv
+
+import pytest
+from elastic_transport import ConnectionTimeout
+
+from agent import catalog as catalog_module
+from agent.catalog import ServerCatalog
+from agent.local_search import LocalSearchIndex, load_local_index
+
+
+def _row(server_id, name, description, stars=0, usable=True):
+    return {
+        "id": server_id,
+        "name": name,
+        "slug": name.lower().replace(" ", "-"),
+        "namespace": "test",
+        "description": description,
+        "github_stars": str(stars),
+        "usable": "true" if usable else "false",
+    }
+
+
+ROWS = [
+    _row("weather", "Weather", "Current conditions and forecasts for any city", stars=5),
+    _row("github", "GitHub", "Issues, pull requests and repositories", stars=20000),
+    _row("notes", "Notes", "Keep notes about the weather and anything else", stars=1),
+    _row("broken-weather", "Weather Station", "Readings from a home weather station", usable=False),
+]
+
+
+def test_name_matches_outrank_description_matches():
+    hits = LocalSearchIndex(ROWS).search("weather", 4)
+    # name^5 beats description^3; an unusable, starless server's function score is 0
+    assert [hit["_id"] for hit in hits] == ["weather", "notes", "broken-weather"]
+    assert hits[0]["_score"] > hits[1]["_score"] > hits[2]["_score"] == 0.0
+
+
+def test_stars_break_ties_between_equal_text_matches():
+    rows = [_row("a", "Files", "Read files", stars=0), _row("b", "Files", "Read files", stars=5000)]
+    assert [hit["_id"] for hit in LocalSearchIndex(rows).search("files", 2)] == ["b", "a"]
+
+
+def test_no_terms_no_hits():
+    assert LocalSearchIndex(ROWS).search("   ", 5) == []
+    assert LocalSearchIndex(ROWS).search("kubernetes", 5) == []
+
+
+def test_bundled_catalog_ranking():
+    index = load_local_index()
+    assert len(index) > 1000
+    assert index.search("github issues", 1)[0]["_source"]["name"] == "GitHub"
+    assert index.search("weather forecast", 1)[0]["_source"]["name"] == "Weather"
+
+
+class FailingElasticsearch:
+    """Stands in for a client whose cluster is down or too slow."""
+
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+        self.indices = self
+
+    def options(self, **kwargs):
+        return self
+
+    def _fail(self, *args, **kwargs):
+        self.calls += 1
+        raise self.error
+
+    search = msearch = get = count = get_mapping = _fail
+
+
+@pytest.fixture
+def dataset(tmp_path):
+    path = tmp_path / "servers.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=list(ROWS[0]))
+        writer.writeheader()
+        writer.writerows(ROWS)
+    return str(path)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(catalog_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+@pytest.mark.parametrize("error", [ConnectionError("refused"), ConnectionTimeout("timed out")])
+def test_auto_falls_back_to_local_index(dataset, clock, error):
+    catalog = ServerCatalog(url="http://elastic", backend="auto", dataset_path=dataset, failure_cooldown=30)
+    catalog._client = FailingElasticsearch(error)
+
+    hits = catalog.search("weather", 2)
+    assert hits[0]["_id"] == "weather"
+    assert hits[0]["_index"] == "local"
+    assert catalog.get("github")["_source"]["name"] == "GitHub"
+
+
+def test_auto_skips_elastic_during_cooldown(dataset, clock):
+    catalog = ServerCatalog(url="http://elastic", backend="auto", dataset_path=dataset, failure_cooldown=30)
+    client = catalog._client = FailingElasticsearch(ConnectionError("refused"))
+
+    catalog.search("weather", 2)
+    failed_calls = client.calls
+    clock[0] += 10
+    catalog.search("github", 2)
+    assert client.calls == failed_calls
+
+    # After the cooldown Elasticsearch is tried again
+    clock[0] += 30
+    catalog.search("notes", 2)
+    assert client.calls > failed_calls
+
+
+def test_elastic_backend_does_not_fall_back(dataset, clock):
+    catalog = ServerCatalog(url="http://elastic", backend="elastic", dataset_path=dataset)
+    catalog._client = FailingElasticsearch(ConnectionError("refused"))
+    with pytest.raises(ConnectionError):
+        catalog.search("weather", 2)
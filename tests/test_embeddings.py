@@ -0,0 +1,65 @@
+"""
+The embedding model written by ingest and the catalog's choice of query model.
+"""
+
+import csv
+
+import numpy as np
+
+from agent.catalog import ServerCatalog
+from agent.embeddings import TfidfSvdEmbedder
+from agent.ingest import fit_embedder
+
+
+def _write_catalog(path, count):
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "name", "description"])
+        writer.writeheader()
+        topics = ["weather forecast", "github issues", "postgres database", "browser automation"]
+        for i in range(count):
+            writer.writerow({"id": str(i), "name": f"server {i}", "description": topics[i % len(topics)]})
+
+
+def test_saved_model_embeds_like_the_fitted_one(tmp_path):
+    _write_catalog(tmp_path / "servers.csv", 20)
+    embedder = fit_embedder(tmp_path / "servers.csv")
+    embedder.save(tmp_path / "model.npz")
+    loaded = TfidfSvdEmbedder.load(tmp_path / "model.npz")
+    assert loaded.fingerprint == embedder.fingerprint
+    assert np.allclose(loaded.embed("weather"), embedder.embed("weather"))
+
+
+def test_fit_sees_a_bounded_sample(tmp_path, monkeypatch):
+    _write_catalog(tmp_path / "servers.csv", 500)
+    fitted = []
+    monkeypatch.setattr(TfidfSvdEmbedder, "fit_transform", lambda self, texts: fitted.append(len(texts)))
+    fit_embedder(tmp_path / "servers.csv", sample=50)
+    assert fitted == [50]
+
+
+def _mapping(meta):
+    return {"public_servers_v1": {"mappings": {"_meta": meta}}}
+
+
+def test_knn_only_against_an_index_built_with_the_same_model(tmp_path):
+    _write_catalog(tmp_path / "servers.csv", 20)
+    embedder = fit_embedder(tmp_path / "servers.csv")
+    embedder.save(tmp_path / "model.npz")
+    catalog = ServerCatalog(url="http://elastic", retrieval="hybrid", embedder_path=str(tmp_path / "model.npz"))
+
+    # Nothing is known about the index yet
+    assert catalog.query_embedder is None
+    catalog._elastic_version(_mapping({"version": 1}), {"count": 20})
+    assert catalog.query_embedder is None  # built without --vectors
+    catalog._elastic_version(_mapping({"version": 2, "embedder": "0123456789abcdef"}), {"count": 20})
+    assert catalog.query_embedder is None  # another model
+    catalog._elastic_version(_mapping({"version": 3, "embedder": embedder.fingerprint}), {"count": 20})
+    assert catalog.query_embedder is not None
+    assert len(catalog._msearch_body(["weather", "github"], 5)) == 8
+
+
+def test_no_knn_without_the_model_file(tmp_path):
+    catalog = ServerCatalog(url="http://elastic", retrieval="hybrid", embedder_path=str(tmp_path / "missing.npz"))
+    catalog._elastic_version(_mapping({"version": 1, "embedder": "0123456789abcdef"}), {"count": 20})
+    assert not catalog._elastic_hybrid()
+    assert len(catalog._msearch_body(["weather", "github"], 5)) == 4
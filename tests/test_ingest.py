@@ -0,0 +1,98 @@
+"""
+Index mapping checks and bulk ingestion failure handling.
+"""
+
+import csv
+import threading
+
+import pytest
+from elasticsearch import Elasticsearch
+
+from agent.ingest import MAPPING, build_mapping, ensure_index, ingest, mapping_conflicts
+
+
+def test_own_mapping_has_no_conflicts():
+    assert mapping_conflicts(build_mapping(), build_mapping(128, "abc")) == []
+
+
+def test_uploaded_index_mapping_conflicts():
+    # Roughly what a file upload infers from the CSV
+    uploaded = {
+        "properties": {
+            "name": {"type": "text"},
+            "tools": {"type": "text"},
+            "config": {"type": "keyword"},
+            "github_readme_url": {"type": "keyword"},
+        }
+    }
+    conflicts = mapping_conflicts(uploaded, MAPPING)
+    assert sorted(conflict.split(" ")[0] for conflict in conflicts) == ["config", "github_readme_url", "tools"]
+
+
+def test_nested_fields_are_compared():
+    existing = {"properties": {"tools": {"type": "nested", "properties": {"name": {"type": "keyword"}}}}}
+    assert mapping_conflicts(existing, MAPPING) == ["tools.name (type: keyword -> text)"]
+
+
+class FakeIndices:
+    def __init__(self, existing=None):
+        self.existing = existing
+        self.updates = []
+
+    def exists(self, index):
+        return self.existing is not None
+
+    def get_mapping(self, index):
+        return {"public_servers_v1": {"mappings": self.existing}}
+
+    def put_mapping(self, index, body):
+        self.updates.append(body)
+
+
+class FakeClient:
+    def __init__(self, existing=None):
+        self.indices = FakeIndices(existing)
+
+
+def test_incompatible_index_asks_for_recreate():
+    client = FakeClient({"properties": {"tools": {"type": "text"}}})
+    with pytest.raises(ValueError, match="--recreate"):
+        ensure_index(client, "public_servers")
+    assert client.indices.updates == []
+
+
+def test_compatible_index_is_updated_in_place():
+    client = FakeClient({"properties": {"name": {"type": "text"}}})
+    ensure_index(client, "public_servers", vector_dims=8)
+    assert client.indices.updates[0]["properties"]["server_vector"]["dims"] == 8
+
+
+def test_crashed_worker_aborts_instead_of_hanging(tmp_path, monkeypatch):
+    path = tmp_path / "servers.csv"
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=["id", "name", "description"])
+        writer.writeheader()
+        writer.writerows({"id": str(i), "name": f"server {i}", "description": "x"} for i in range(200))
+
+    def bulk(self, *args, **kwargs):
+        # Not an ApiError, so streaming_bulk does not treat it as a per-document failure
+        raise TypeError("cannot serialize document")
+
+    client = Elasticsearch("http://127.0.0.1:9")
+    monkeypatch.setattr(Elasticsearch, "bulk", bulk)
+    monkeypatch.setattr(type(client.indices), "exists", lambda self, index: False)
+    monkeypatch.setattr(type(client.indices), "create", lambda self, index, mappings: None)
+
+    result = {}
+
+    def run():
+        try:
+            ingest(client, path=path, workers=2, chunk_size=5, queue_size=4)
+        except RuntimeError as e:
+            result["error"] = e
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive(), "ingest hung after its workers died"
+    assert "cannot serialize" in str(result["error"])
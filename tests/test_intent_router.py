@@ -0,0 +1,96 @@
+"""
+IntentRouter routing on seeded and learned entries, and how learned ones are saved.
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from agent.intent_router import PLAYWRIGHT, IntentRouter
+from agent.local_search import load_local_index
+
+NOT_BROWSING = [
+    "open a github issue",
+    "open the pdf file",
+    "click here",
+    "what is the url of the mcp spec",
+]
+
+
+@pytest.fixture(scope="module")
+def catalog_documents():
+    return load_local_index().documents
+
+
+@pytest.mark.parametrize("message", NOT_BROWSING)
+def test_one_browser_term_does_not_route_to_playwright(tmp_path, catalog_documents, message):
+    router = IntentRouter(path=tmp_path / "intents.json")
+    assert router.route(message) is None
+    router.seed(catalog_documents, lambda doc: True)
+    assert router.route(message) is None
+
+
+@pytest.mark.parametrize("message", ["navigate to the url", "browse to example.com and click the login button"])
+def test_browser_requests_route_to_playwright(tmp_path, catalog_documents, message):
+    router = IntentRouter(path=tmp_path / "intents.json")
+    router.seed(catalog_documents, lambda doc: True)
+    target, score = router.route(message)
+    assert target == PLAYWRIGHT and score >= router.min_score
+
+
+def test_learned_entries_route(tmp_path):
+    router = IntentRouter(path=tmp_path / "intents.json")
+    assert router.route("weather forecast for tomorrow") is None
+    router.learn("what is the weather forecast in paris", "weather-id")
+    assert router.route("weather forecast for tomorrow")[0] == "weather-id"
+    # One shared term is not confident yet; a second success makes it so
+    assert router.route("weather") is None
+    router.learn("weather in berlin", "weather-id")
+    assert router.route("weather")[0] == "weather-id"
+
+
+def test_learned_entries_outweigh_browser_seeds(tmp_path):
+    router = IntentRouter(path=tmp_path / "intents.json")
+    for _ in range(2):
+        router.learn("open a github issue", "github-id")
+    assert router.route("open a github issue")[0] == "github-id"
+
+
+def test_competing_learned_targets_need_a_margin(tmp_path):
+    router = IntentRouter(path=tmp_path / "intents.json")
+    router.learn("weather forecast", "weather-a")
+    router.learn("weather forecast", "weather-b")
+    assert router.route("weather forecast") is None
+
+
+def test_learn_writes_once_per_save_delay_off_the_event_loop(tmp_path, monkeypatch):
+    path = tmp_path / "intents.json"
+
+    async def main():
+        router = IntentRouter(path=path, save_delay=0.05)
+        writes = []
+        write = router._write
+        monkeypatch.setattr(router, "_write", lambda text: (writes.append(text), write(text)))
+        for city in ("paris", "berlin", "rome"):
+            router.learn(f"weather in {city}", "weather-id")
+        assert not path.exists()
+        await asyncio.sleep(0.2)
+        assert len(writes) == 1
+        assert set(json.loads(path.read_text())) >= {"weather", "paris", "berlin", "rome"}
+
+        # Pending entries are written on close
+        router.learn("weather in oslo", "weather-id")
+        await router.close()
+        assert len(writes) == 2
+        assert "oslo" in json.loads(path.read_text())
+
+    asyncio.run(main())
+    reloaded = IntentRouter(path=path)
+    assert reloaded.route("weather")[0] == "weather-id"
+
+
+def test_learn_without_an_event_loop_writes_right_away(tmp_path):
+    path = tmp_path / "intents.json"
+    IntentRouter(path=path).learn("weather in paris", "weather-id")
+    assert json.loads(path.read_text())["weather"] == {"weather-id": 1.0}
@@ -0,0 +1,76 @@
+"""
+Launch spec compilation, and which of the app's environment variables a
+catalog server's placeholder env values may take.
+"""
+
+import json
+
+import pytest
+
+from agent.launch_specs import LaunchSpec, LaunchSpecTable, compile_launch_spec
+
+ENVIRON = {
+    "GEMINI_API_KEY": "gemini-secret",
+    "ELASTIC_API_KEY": "elastic-secret",
+    "GITHUB_TOKEN": "ghp-token",
+    "MCP_SERVER_ENV_WEATHER_KEY": "weather-key",
+}
+
+
+def _server(env, server_id="test"):
+    config = {"command": "npx", "args": ["-y", "some-mcp-server"], "env": env}
+    return {"id": server_id, "slug": server_id, "config": json.dumps(config)}
+
+
+def test_config_shapes():
+    spec = compile_launch_spec({"slug": "files", "config": json.dumps(
+        {"mcpServers": {"files": {"command": "npx -y @scope/files-mcp", "args": ["/tmp"]}}}
+    )})
+    assert (spec.command, spec.args, spec.package) == ("npx", ("-y", "@scope/files-mcp", "/tmp"), "@scope/files-mcp")
+    remote = compile_launch_spec({"slug": "remote", "config": json.dumps({"url": "https://api.acme.dev/mcp"})})
+    assert remote.url == "https://api.acme.dev/mcp"
+    assert "manual setup" in compile_launch_spec({"slug": "x", "config": json.dumps(
+        {"command": "node", "args": ["/path/to/server.js"]}
+    )})
+
+
+@pytest.mark.parametrize("key", ["GEMINI_API_KEY", "ELASTIC_API_KEY"])
+def test_app_credentials_are_withheld(key):
+    server = _server({key: "YOUR_API_KEY"})
+    result = compile_launch_spec(server, environ=ENVIRON, env_allow=[])
+    assert result == f"Server test needs configuration: set MCP_SERVER_ENV_{key}"
+    # Even an allowlist naming them does not pass them on
+    result = compile_launch_spec(server, environ=ENVIRON, env_allow=[key])
+    assert isinstance(result, str) and "secret" not in result
+
+
+def test_unlisted_keys_are_not_passed_through():
+    result = compile_launch_spec(_server({"GITHUB_TOKEN": "<your token>"}), environ=ENVIRON, env_allow=[])
+    assert result == "Server test needs configuration: set MCP_SERVER_ENV_GITHUB_TOKEN"
+
+
+def test_allowlisted_and_prefixed_keys_fill_placeholders():
+    server = _server({"GITHUB_TOKEN": "<your token>", "WEATHER_KEY": "YOUR_KEY", "UNITS": "metric"})
+    spec = compile_launch_spec(server, environ=ENVIRON, env_allow=["GITHUB_TOKEN"])
+    assert isinstance(spec, LaunchSpec)
+    assert spec.env == {"GITHUB_TOKEN": "ghp-token", "WEATHER_KEY": "weather-key", "UNITS": "metric"}
+
+
+def test_prefixed_value_may_supply_a_protected_name():
+    environ = {**ENVIRON, "MCP_SERVER_ENV_GEMINI_API_KEY": "server-gemini-key"}
+    spec = compile_launch_spec(_server({"GEMINI_API_KEY": "YOUR_KEY"}), environ=environ, env_allow=[])
+    assert spec.env == {"GEMINI_API_KEY": "server-gemini-key"}
+
+
+def test_table_reads_the_allowlist_from_the_environment(monkeypatch):
+    monkeypatch.setenv("MCP_SERVER_ENV_ALLOW", " GITHUB_TOKEN , GEMINI_API_KEY")
+    monkeypatch.setenv("GITHUB_TOKEN", "ghp-token")
+    monkeypatch.setenv("GEMINI_API_KEY", "gemini-secret")
+    monkeypatch.delenv("MCP_SERVER_ENV_GEMINI_API_KEY", raising=False)
+    table = LaunchSpecTable()
+    assert table.env_allow == {"GITHUB_TOKEN", "GEMINI_API_KEY"}
+
+    github = _server({"GITHUB_TOKEN": "YOUR_TOKEN"}, server_id="github")
+    assert table.resolve("github", github)[1]["env"] == {"GITHUB_TOKEN": "ghp-token"}
+    gemini = _server({"GEMINI_API_KEY": "YOUR_KEY"}, server_id="gemini")
+    assert not table.launchable(gemini)
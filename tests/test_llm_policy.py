@@ -0,0 +1,147 @@
+"""
+LLMCallPolicy retries, rate-limit pauses and hedging, against the benchmark's
+fake Gemini model.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from agent.llm_policy import FATAL, RATE_LIMITED, TRANSIENT, LLMCallPolicy, TokenBucket, suggested_delay
+from bench.fakes import FakeAPIError, FakeGeminiModel
+
+PROMPT = "Human: hello"
+
+
+def _no_jitter():
+    return 0.0
+
+
+def _call(policy, model):
+    return asyncio.run(policy.call(lambda: model.generate_content_async(PROMPT)))
+
+
+def test_rate_limits_and_server_errors_are_retried():
+    model = FakeGeminiModel(latency=0, errors=[429, 503])
+    policy = LLMCallPolicy(max_attempts=3, rng=_no_jitter)
+    assert _call(policy, model).text
+    assert model.failures == 2 and model.calls == 1
+    assert policy.retries == 2
+    assert policy.errors == {RATE_LIMITED: 1, TRANSIENT: 1}
+
+
+def test_blocking_calls_are_retried_too():
+    model = FakeGeminiModel(latency=0, errors=[503])
+    policy = LLMCallPolicy(max_attempts=2, rng=_no_jitter)
+    assert policy.call_sync(lambda: model.generate_content(PROMPT)).text
+    assert policy.retries == 1
+
+
+def test_last_error_is_raised_when_attempts_run_out():
+    model = FakeGeminiModel(latency=0, errors=[503, 503, 503, 503])
+    policy = LLMCallPolicy(max_attempts=3, rng=_no_jitter)
+    with pytest.raises(FakeAPIError) as raised:
+        _call(policy, model)
+    assert raised.value.code == 503
+    assert model.failures == 3
+
+
+@pytest.mark.parametrize("code", [400, 401, 403])
+def test_client_errors_are_not_retried(code):
+    model = FakeGeminiModel(latency=0, errors=[code])
+    policy = LLMCallPolicy(max_attempts=3, rng=_no_jitter)
+    with pytest.raises(FakeAPIError):
+        _call(policy, model)
+    assert model.failures == 1
+    assert policy.retries == 0
+    assert policy.errors == {FATAL: 1}
+
+
+def test_suggested_retry_delay_is_honoured():
+    model = FakeGeminiModel(latency=0, errors=[429], retry_after=0.2)
+    policy = LLMCallPolicy(max_attempts=2, base_delay=0.01, rng=_no_jitter)
+    start = time.perf_counter()
+    _call(policy, model)
+    assert time.perf_counter() - start >= 0.2
+    # The quota is shared, so every call is held back
+    assert policy.bucket.pauses == 1
+
+
+def test_suggested_delay_is_read_from_the_message():
+    assert suggested_delay(FakeAPIError(429, "Please retry in 17.5s.")) == 17.5
+    assert suggested_delay(FakeAPIError(429, "quota exceeded retry_delay { seconds: 30 }")) == 30.0
+    assert suggested_delay(FakeAPIError(429, retry_after=3)) == 3.0
+    assert suggested_delay(FakeAPIError(503)) is None
+    policy = LLMCallPolicy(base_delay=0.5, rng=lambda: 1.0)
+    # Never shorter than asked, and jitter still applies to errors that did not ask
+    assert policy.backoff(1, FakeAPIError(429, "retry in 17.5s")) == 17.5
+    assert policy.backoff(2, FakeAPIError(503, "retry in 17.5s")) == 1.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_bucket_paces_to_its_rate_and_pauses_after_a_rate_limit():
+    clock = Clock()
+    bucket = TokenBucket(rate=10, burst=2, clock=clock)
+    assert [round(bucket.reserve(), 3) for _ in range(4)] == [0.0, 0.0, 0.1, 0.2]
+    clock.now += 1.0
+    assert bucket.reserve() == 0.0
+
+    bucket.pause(5)
+    assert bucket.reserve() == pytest.approx(5.0)
+    assert not bucket.try_acquire()
+    clock.now += 5.0
+    assert bucket.try_acquire()
+    assert bucket.stats()["pauses"] == 1
+
+
+def test_rate_limit_holds_back_other_sessions():
+    async def main():
+        limited = FakeGeminiModel(latency=0, errors=[429], retry_after=0.2)
+        healthy = FakeGeminiModel(latency=0)
+        policy = LLMCallPolicy(max_attempts=2, rng=_no_jitter)
+        first = asyncio.create_task(policy.call(lambda: limited.generate_content_async(PROMPT)))
+        await asyncio.sleep(0.05)
+        start = time.perf_counter()
+        await policy.call(lambda: healthy.generate_content_async(PROMPT))
+        # Waited out the rest of the other session's pause
+        assert time.perf_counter() - start >= 0.1
+        await first
+
+    asyncio.run(main())
+
+
+def test_hedged_request_wins_over_a_slow_one():
+    async def main():
+        model = FakeGeminiModel(latency=0.01)
+        policy = LLMCallPolicy(hedge=True, min_samples=5, hedge_min_delay=0.01)
+        for _ in range(5):
+            await policy.call(lambda: model.generate_content_async(PROMPT))
+        assert policy.hedge_delay() is not None
+
+        latencies = iter([2.0, 0.01])
+
+        async def generate():
+            model.latency = next(latencies)
+            return await model.generate_content_async(PROMPT)
+
+        start = time.perf_counter()
+        response = await policy.call(generate)
+        assert response.text
+        assert time.perf_counter() - start < 1.0
+        assert (policy.hedged, policy.hedge_wins) == (1, 1)
+
+    asyncio.run(main())
+
+
+def test_no_hedge_before_enough_samples():
+    policy = LLMCallPolicy(hedge=True, min_samples=5)
+    assert policy.hedge_delay() is None
+    assert LLMCallPolicy(hedge=False, min_samples=0).hedge_delay() is None
@@ -0,0 +1,124 @@
+"""
+MCPServerPool slot accounting and re-registration with a changed config.
+"""
+
+import asyncio
+
+import pytest
+
+from agent.mcp_pool import MCPServerPool, PoolExhaustedError
+
+
+class FakeConnector:
+    def __init__(self, config):
+        self.config = config
+        self.tools = []
+
+
+class FakeSession:
+    def __init__(self, config):
+        self.connector = FakeConnector(config)
+        self.is_connected = True
+
+
+class FakeClient:
+    """Keeps server configs and sessions by name, like ``MCPClient``."""
+
+    def __init__(self):
+        self.configs = {}
+        self.sessions = {}
+        self.peak = 0
+
+    def get_server_names(self):
+        return list(self.configs)
+
+    def add_server(self, name, config):
+        self.configs[name] = config
+
+    async def create_session(self, name):
+        await asyncio.sleep(0.01)
+        self.sessions[name] = FakeSession(self.configs[name])
+        self.peak = max(self.peak, len(self.sessions))
+        return self.sessions[name]
+
+    async def close_session(self, name):
+        session = self.sessions.pop(name)
+        session.is_connected = False
+
+
+def _config(version):
+    return {"command": "npx", "args": ["server", version]}
+
+
+def test_concurrent_spawns_never_exceed_max_live():
+    async def main():
+        client = FakeClient()
+        pool = MCPServerPool(client, max_live=2)
+        for i in range(6):
+            pool.register(f"s{i}", _config(str(i)))
+        await asyncio.gather(*(pool.acquire(f"s{i}") for i in range(6)), return_exceptions=True)
+        assert client.peak <= 2
+        stopped = next(f"s{i}" for i in range(6) if not pool.is_live(f"s{i}"))
+        with pytest.raises(PoolExhaustedError):
+            await pool.acquire(stopped, evict=False)
+
+    asyncio.run(main())
+
+
+def test_reregistering_a_changed_config_retires_the_old_process():
+    async def main():
+        client = FakeClient()
+        pool = MCPServerPool(client)
+        pool.register("files", _config("v1"), seed_tools=["old"])
+        old = await pool.acquire("files")
+        assert old.connector.config == _config("v1")
+
+        pool.register("files", _config("v2"))
+        assert client.configs["files"] == _config("v2")
+        # Tools known from the old config are dropped
+        assert pool.cached_tools("files") is None
+        assert not pool.is_live("files")
+
+        await asyncio.sleep(0)  # let the background retirement run
+        assert not old.is_connected
+        new = await pool.acquire("files")
+        assert new is not old and new.connector.config == _config("v2")
+        assert pool.stats()["retired"] == 1
+        assert pool.stats()["respawns"] == 0
+
+    asyncio.run(main())
+
+
+def test_reregistering_while_busy_swaps_on_next_acquire():
+    async def main():
+        client = FakeClient()
+        pool = MCPServerPool(client)
+        pool.register("files", _config("v1"))
+        old = await pool.acquire("files")
+        pool._servers["files"].in_use = 1
+
+        pool.register("files", _config("v2"))
+        await asyncio.sleep(0)
+        # The call in flight keeps its process
+        assert old.is_connected
+
+        new = await pool.acquire("files")
+        assert not old.is_connected
+        assert new.connector.config == _config("v2")
+        assert pool.retired == 1
+
+    asyncio.run(main())
+
+
+def test_reregistering_the_same_config_keeps_the_process():
+    async def main():
+        client = FakeClient()
+        pool = MCPServerPool(client)
+        pool.register("files", _config("v1"))
+        session = await pool.acquire("files")
+        pool.register("files", dict(_config("v1")), keep_warm=True)
+        await asyncio.sleep(0)
+        assert await pool.acquire("files") is session
+        assert pool.retired == 0
+
+    asyncio.run(main())
@@ -0,0 +1,177 @@
+"""
+SingleFlight coalescing of identical concurrent connects and searches.
+"""
+
+import asyncio
+
+import pytest
+from mcp_use.client import MCPClient
+
+from agent.mcp_pool import MCPServerPool
+from agent.server_manager import ElasticServerManager
+from agent.singleflight import SingleFlight
+
+
+class Operation:
+    """An awaitable operation that counts runs and finishes when released."""
+
+    def __init__(self, result="done"):
+        self.result = result
+        self.runs = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.runs += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+
+def test_identical_concurrent_calls_run_once():
+    async def main():
+        flight = SingleFlight()
+        op = Operation()
+        waiters = [asyncio.create_task(flight.do(("search", "weather", 5), op)) for _ in range(5)]
+        await asyncio.sleep(0)
+        assert flight.in_flight == 1
+        op.release.set()
+        assert await asyncio.gather(*waiters) == ["done"] * 5
+        assert op.runs == 1
+        assert flight.in_flight == 0
+        assert flight.stats()["search"] == {"executed": 1, "coalesced": 4}
+
+        # Once finished, the next call runs again
+        assert await flight.do(("search", "weather", 5), op) == "done"
+        assert op.runs == 2
+
+    asyncio.run(main())
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flight = SingleFlight()
+        op = Operation()
+        op.release.set()
+        await asyncio.gather(flight.do(("search", "weather", 5), op), flight.do(("search", "weather", 10), op))
+        assert op.runs == 2
+
+    asyncio.run(main())
+
+
+def test_cancelling_one_waiter_leaves_the_others_and_the_operation():
+    async def main():
+        flight = SingleFlight()
+        op = Operation()
+        first = asyncio.create_task(flight.do(("connect", "github"), op))
+        second = asyncio.create_task(flight.do(("connect", "github"), op))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert not op.cancelled
+
+        op.release.set()
+        assert await second == "done"
+        assert op.runs == 1
+
+    asyncio.run(main())
+
+
+def test_operation_is_cancelled_when_every_waiter_has_gone():
+    async def main():
+        flight = SingleFlight()
+        op = Operation()
+        waiters = [asyncio.create_task(flight.do(("connect", "github"), op)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.sleep(0)
+        assert op.cancelled
+        assert flight.in_flight == 0
+
+    asyncio.run(main())
+
+
+def test_errors_reach_every_waiter():
+    async def main():
+        flight = SingleFlight()
+        calls = []
+
+        async def fail():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            raise ConnectionError("refused")
+
+        results = await asyncio.gather(*(flight.do(("search", "q", 5), fail) for _ in range(3)), return_exceptions=True)
+        assert [type(result) for result in results] == [ConnectionError] * 3
+        assert len(calls) == 1
+        assert flight.in_flight == 0
+
+    asyncio.run(main())
+
+
+class FakeSession:
+    def __init__(self):
+        self.connector = type("Connector", (), {"tools": []})()
+        self.is_connected = True
+
+
+class CountingClient(MCPClient):
+    def __init__(self):
+        super().__init__()
+        self.starts = 0
+
+    async def create_session(self, name, auto_initialize=True):
+        self.starts += 1
+        await asyncio.sleep(0.01)
+        self.sessions[name] = FakeSession()
+        return self.sessions[name]
+
+
+class FakeBatcher:
+    def __init__(self):
+        self.queries = []
+
+    async def search(self, query, size):
+        self.queries.append(query)
+        await asyncio.sleep(0.01)
+        return [{"_id": query, "_source": {}}]
+
+
+class FakeCatalog:
+    def __init__(self):
+        self.batcher = FakeBatcher()
+
+    async def close(self):
+        pass
+
+
+def test_sessions_share_connects_and_searches():
+    async def main():
+        client = CountingClient()
+        pool = MCPServerPool(client)
+        catalog = FakeCatalog()
+        flight = SingleFlight()
+        managers = [
+            ElasticServerManager(client, catalog=catalog, server_pool=pool, single_flight=flight)
+            for _ in range(3)
+        ]
+
+        config = {"command": "npx", "args": ["weather-server"]}
+        await asyncio.gather(*(manager.connect("weather", config) for manager in managers))
+        assert client.starts == 1
+
+        hits = await asyncio.gather(
+            *(manager.coalesced_search(query, 5) for manager, query in zip(managers, ["Weather", "weather ", "WEATHER"]))
+        )
+        assert len(catalog.batcher.queries) == 1
+        assert hits[0] == hits[1] == hits[2]
+        assert flight.stats()["connect"] == {"executed": 1, "coalesced": 2}
+
+    asyncio.run(main())
@@ -0,0 +1,120 @@
+"""
+ToolRegistry generations, collision aliases and least-recently-loaded eviction.
+"""
+
+from langchain_core.tools import StructuredTool
+
+from agent.tool_registry import ToolRegistry, alias_for
+
+
+class Tool:
+    def __init__(self, name):
+        self.name = name
+
+
+def _tools(*names):
+    return [Tool(name) for name in names]
+
+
+def test_every_change_bumps_the_generation():
+    registry = ToolRegistry()
+    assert registry.generation == 0
+    registry.load("files", _tools("read", "write"))
+    assert registry.generation == 1
+    registry.add("files", Tool("delete"))
+    assert registry.generation == 2
+    assert registry.unload("files")
+    assert registry.generation == 3
+
+    # Nothing changed, nothing bumped
+    assert not registry.unload("files")
+    assert registry.clear() == []
+    assert registry.generation == 3
+
+
+def test_tool_view_is_rebuilt_only_for_a_new_generation():
+    registry = ToolRegistry()
+    registry.load("files", _tools("read"))
+    view = registry.tools
+    assert registry.tools is view
+    registry.load("weather", _tools("forecast"))
+    assert registry.tools is not view
+    assert registry.names == {"read", "forecast"}
+
+
+def test_colliding_names_get_an_alias_on_a_copy():
+    registry = ToolRegistry()
+    registry.load("files", _tools("search"))
+    tool = Tool("search")
+    registry.load("github-api", [tool])
+
+    assert registry.names == {"search", "github_api_search"}
+    assert registry.owner("github_api_search") == "github-api"
+    assert registry.aliases("github-api") == {"github_api_search": "search"}
+    # The caller's tool object keeps its name
+    assert tool.name == "search"
+    assert registry.tools_of("github-api")[0] is not tool
+
+
+def test_alias_is_made_unique_when_already_taken():
+    registry = ToolRegistry()
+    registry.load("a", _tools("b_c", "c"))
+    registry.load("b", _tools("c"))
+    # "b_c" is a real tool of "a", so "b"'s "c" needs another name
+    assert registry.aliases("b") == {"b_c_2": "c"}
+    registry.load("b2", [])
+    registry.add("b", Tool("c"))
+    assert registry.owner("b_c_3") == "b"
+    assert len(registry.names) == len(registry.tools)
+
+
+def test_management_tool_names_are_reserved():
+    registry = ToolRegistry(reserved=["search_servers"])
+    registry.reserve(["connect_server"])
+    registry.load("github", _tools("search_servers", "connect_server", "list_issues"))
+    assert registry.names == {"github_search_servers", "github_connect_server", "list_issues"}
+    assert registry.owner("search_servers") is None
+
+
+def test_langchain_tools_are_copied_not_renamed():
+    def search(query: str) -> str:
+        """Search."""
+        return query
+
+    tool = StructuredTool.from_function(search)
+    registry = ToolRegistry(reserved=["search"])
+    registry.load("docs", [tool])
+    exposed = registry.tools_of("docs")[0]
+    assert exposed.name == alias_for("docs", "search") == "docs_search"
+    assert tool.name == "search"
+    assert exposed.invoke({"query": "x"}) == "x"
+
+
+def test_least_recently_loaded_server_is_evicted():
+    registry = ToolRegistry(max_servers=2)
+    assert registry.load("a", _tools("a1")) == []
+    assert registry.load("b", _tools("b1")) == []
+    # Reloading "a" makes it the most recent
+    assert registry.load("a", _tools("a1")) == []
+    assert registry.load("c", _tools("c1")) == ["b"]
+    assert registry.servers == ["a", "c"]
+    assert registry.owner("b1") is None
+    assert registry.names == {"a1", "c1"}
+
+
+def test_evicting_a_server_frees_its_names():
+    registry = ToolRegistry(max_servers=1)
+    registry.load("a", _tools("search"))
+    # "b"'s tools are added before "a" is evicted, so its "search" is still taken
+    assert registry.load("b", _tools("search")) == ["a"]
+    assert registry.aliases("b") == {"b_search": "search"}
+    assert registry.load("c", _tools("search")) == ["b"]
+    assert registry.aliases("c") == {}
+    assert registry.names == {"search"}
+
+
+def test_zero_means_unbounded():
+    registry = ToolRegistry(max_servers=0)
+    for i in range(10):
+        assert registry.load(f"s{i}", _tools(f"t{i}")) == []
+    assert len(registry.servers) == 10
@@ -0,0 +1,86 @@
+"""
+/api/chat through the full ASGI stack (middleware included): a client that
+disconnects mid-run gets its agent run cancelled.
+"""
+
+import asyncio
+import json
+import os
+import time
+from contextlib import asynccontextmanager
+
+os.environ.setdefault("GEMINI_API_KEY", "test")
+
+import web  # noqa: E402
+
+
+class SlowAgent:
+    def __init__(self):
+        self.cancelled = False
+
+    async def run(self, message, max_steps=10):
+        try:
+            await asyncio.sleep(30)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return "too late"
+
+
+async def _post_chat(disconnect_after: float):
+    body = json.dumps({"message": "hello"}).encode()
+    sent = []
+    requests = [{"type": "http.request", "body": body, "more_body": False}]
+    disconnect_at = time.monotonic() + disconnect_after
+
+    async def receive():
+        # Like uvicorn: the body first, then block until the client goes away
+        if requests:
+            return requests.pop()
+        if time.monotonic() < disconnect_at:
+            await asyncio.sleep(disconnect_at - time.monotonic())
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": "/api/chat",
+        "raw_path": b"/api/chat",
+        "query_string": b"",
+        "headers": [(b"content-type", b"application/json"), (b"x-request-id", b"req-1")],
+        "client": ("127.0.0.1", 1234),
+        "server": ("127.0.0.1", 8000),
+    }
+    await web.app(scope, receive, send)
+    return sent
+
+
+def test_disconnect_cancels_chat(monkeypatch):
+    agent = SlowAgent()
+
+    @asynccontextmanager
+    async def session(session_id):
+        yield agent
+
+    async def ready():
+        return None
+
+    monkeypatch.setattr(web.agent_pool, "session", session)
+    monkeypatch.setattr(web.warmup, "wait", ready)
+
+    start = time.perf_counter()
+    sent = asyncio.run(_post_chat(disconnect_after=0.1))
+    elapsed = time.perf_counter() - start
+
+    response = next(message for message in sent if message["type"] == "http.response.start")
+    assert response["status"] == 499
+    assert (b"x-request-id", b"req-1") in response["headers"]
+    assert agent.cancelled
+    # Noticed at the first disconnect poll, not when the run would have ended
+    assert elapsed < web.DISCONNECT_POLL_INTERVAL * 3
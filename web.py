@@ -1,18 +1,28 @@
 import os
 import asyncio
-from typing import Any, Dict
+import json
+import uuid
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Awaitable, Dict
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from starlette.responses import JSONResponse
+from sse_starlette.sse import EventSourceResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 # Ensure environment variables are loaded
 load_dotenv()
 
-# Import the existing agent
-from agent.agent import search_agent
+# The agent itself is built by the background warm-up, not at import
+from agent import runtime
+from agent.admission import AdmissionController, Overloaded
+from agent.events import EventQueue, capture, emit
+from agent.sessions import AgentPool
+from agent.telemetry import REGISTRY, request_context
 
 app = FastAPI(title="MCP Agent Web")
 
@@ -26,39 +36,383 @@ app.add_middleware(
 )
 
 
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+class RequestIDMiddleware:
+    """Tag every span of a request (including its streaming task) with one request ID.
+
+    Plain ASGI rather than ``@app.middleware("http")``: that wraps ``receive``
+    so endpoints never see the client disconnect, which /api/chat relies on.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with request_context(Headers(scope=scope).get(REQUEST_ID_HEADER)) as request_id:
+
+            async def send_with_id(message: Message) -> None:
+                if message["type"] == "http.response.start":
+                    MutableHeaders(scope=message)[REQUEST_ID_HEADER] = request_id
+                await send(message)
+
+            await self.app(scope, receive, send_with_id)
+
+
+app.add_middleware(RequestIDMiddleware)
+
+
+def _create_session_agent():
+    from agent.agent import create_session_agent
+
+    return create_session_agent()
+
+
+# One agent per browser session; all of them share the LLM, MCP sessions and catalog
+SESSION_COOKIE = "session_id"
+agent_pool = AgentPool(
+    _create_session_agent,
+    max_size=int(os.getenv("AGENT_POOL_SIZE", "100")),
+    idle_timeout=float(os.getenv("AGENT_IDLE_TIMEOUT", "1800")),
+)
+
+
+def _session_id(request: Request, body: Dict[str, Any]) -> str:
+    return (body or {}).get("session_id") or request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
+
+
+def _with_session(response, session_id: str):
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return response
+
+
+# Chat requests beyond CHAT_MAX_CONCURRENT queue (up to CHAT_MAX_QUEUE), then are shed with 429/503
+admission = AdmissionController.from_env()
+DEFAULT_MAX_STEPS = 10
+# Server-side cap on the max_steps a client may ask for
+MAX_STEPS_LIMIT = int(os.getenv("CHAT_MAX_STEPS", "20"))
+# Seconds a chat request may take overall, queueing included
+CHAT_DEADLINE = float(os.getenv("CHAT_DEADLINE", "300"))
+# How often a running /api/chat request checks whether its client is still there
+DISCONNECT_POLL_INTERVAL = 0.5
+
+CANCELLED = REGISTRY.counter(
+    "chat_requests_cancelled_total", "Chat requests stopped before finishing.", labels=("reason",)
+)
+
+
+def _max_steps(body: Dict[str, Any]) -> int:
+    """The requested ``max_steps``, capped at CHAT_MAX_STEPS; ValueError if it is not a positive integer."""
+    value = (body or {}).get("max_steps", DEFAULT_MAX_STEPS)
+    try:
+        steps = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("max_steps must be an integer") from None
+    if steps < 1:
+        raise ValueError("max_steps must be at least 1")
+    return min(steps, MAX_STEPS_LIMIT)
+
+
+def _timeout_error(exc: TimeoutError, deadline: asyncio.Timeout) -> str:
+    """The message for a step timeout, or for the request's own deadline if that expired."""
+    if deadline.expired():
+        CANCELLED.inc(1, "deadline")
+        return f"Request exceeded the {CHAT_DEADLINE:g}s deadline"
+    return str(exc)
+
+
+class ClientDisconnected(Exception):
+    pass
+
+
+async def _unless_disconnected(request: Request, work: Awaitable[Any]) -> Any:
+    """Await ``work``, cancelling it if the HTTP client goes away first."""
+    task = asyncio.ensure_future(work)
+    try:
+        while not task.done():
+            await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if not task.done() and await request.is_disconnected():
+                CANCELLED.inc(1, "disconnect")
+                raise ClientDisconnected()
+        return task.result()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+_background_tasks = set()
+
+
+async def _prewarm_servers(shared: runtime.Runtime) -> None:
+    """Start the MCP servers named in MCP_PREWARM (catalog IDs or "playwright")
+    plus the MCP_PREWARM_TOP most-starred usable ones."""
+    names = [name.strip() for name in os.getenv("MCP_PREWARM", "").split(",") if name.strip()]
+    top_starred = int(os.getenv("MCP_PREWARM_TOP", "0"))
+    if not names and not top_starred:
+        return
+    try:
+        await shared.search_agent.server_manager.prewarm(
+            server_ids=[name for name in names if name != "playwright"],
+            top_starred=top_starred,
+            playwright="playwright" in names,
+        )
+    except Exception as exc:
+        print(f"MCP server pre-warm failed: {exc}")
+
+
+async def _start_server_pool(shared: runtime.Runtime) -> None:
+    shared.server_pool.start()
+    # MCP servers can take a while to start; readiness does not wait for them
+    task = asyncio.create_task(_prewarm_servers(shared))
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+warmup = runtime.Warmup()
+warmup.add_hook("mcp_pool", _start_server_pool)
+
+
+@app.on_event("startup")
+async def startup_event() -> None:
+    agent_pool.start_reaper()
+    # Build the agent in the background so the app starts serving right away
+    warmup.start()
+
+
 @app.on_event("shutdown")
 async def shutdown_event() -> None:
     try:
-        await search_agent.close()
+        await agent_pool.close()
+        shared = runtime.current()
+        if shared is not None:
+            await shared.search_agent.close()
     except Exception:
         pass
 
 
 @app.post("/api/chat")
-async def api_chat(body: Dict[str, Any]) -> JSONResponse:
-    """Send a message to the agent and return its response.
+async def api_chat(request: Request, body: Dict[str, Any]) -> JSONResponse:
+    """Send a message to the session's agent and return its response.
+
+    Body: { "message": str, "max_steps": int (optional), "clear": bool (optional),
+            "session_id": str (optional, defaults to the session cookie) }
 
-    Body: { "message": str, "max_steps": int (optional), "clear": bool (optional) }
+    Overload is answered with 429 (queue full) or 503 (no slot in time), an
+    expired CHAT_DEADLINE or step timeout with 504. The run is cancelled if
+    the client disconnects.
     """
     message = (body or {}).get("message", "").strip()
-    max_steps = (body or {}).get("max_steps", 10)
     should_clear = bool((body or {}).get("clear", False))
 
     if not message:
         return JSONResponse({"error": "message is required"}, status_code=400)
+    try:
+        max_steps = _max_steps(body)
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
 
-    if should_clear:
-        try:
-            search_agent.clear_conversation_history()
-        except Exception:
-            # Non-fatal; continue
-            pass
+    session_id = _session_id(request, body)
+
+    async def chat() -> str:
+        await warmup.wait()
+        async with agent_pool.session(session_id) as agent:
+            if should_clear:
+                try:
+                    agent.clear_conversation_history()
+                except Exception:
+                    # Non-fatal; continue
+                    pass
+            return await agent.run(message, max_steps=max_steps)
 
+    deadline = asyncio.timeout(CHAT_DEADLINE)
     try:
-        response_text = await search_agent.run(message, max_steps=max_steps)
-        return JSONResponse({"response": response_text})
+        async with deadline:
+            async with admission.admit():
+                response_text = await _unless_disconnected(request, chat())
+        return _with_session(JSONResponse({"response": response_text}), session_id)
+    except Overloaded as exc:
+        return _with_session(
+            JSONResponse({"error": str(exc)}, status_code=exc.status_code, headers=exc.headers), session_id
+        )
+    except ClientDisconnected:
+        # Nobody is left to read it
+        return _with_session(JSONResponse({"error": "client disconnected"}, status_code=499), session_id)
+    except TimeoutError as exc:
+        return _with_session(JSONResponse({"error": _timeout_error(exc, deadline)}, status_code=504), session_id)
     except Exception as exc:
-        return JSONResponse({"error": str(exc)}, status_code=500)
+        return _with_session(JSONResponse({"error": str(exc)}, status_code=500), session_id)
+
+
+async def _run_with_events(session_id: str, message: str, max_steps: int, events: EventQueue) -> None:
+    """Run the session's agent, reporting progress and the final answer to ``events``."""
+    with capture(events):
+        deadline = asyncio.timeout(CHAT_DEADLINE)
+        try:
+            async with deadline:
+                await warmup.wait()
+                async with agent_pool.session(session_id) as agent:
+                    async for item in agent.stream(message, max_steps=max_steps):
+                        if isinstance(item, tuple):
+                            action, observation = item
+                            emit("step", tool=action.tool, input=action.tool_input, observation=str(observation))
+                        else:
+                            emit("final", response=str(item))
+        except TimeoutError as exc:
+            emit("error", error=_timeout_error(exc, deadline))
+        except Exception as exc:
+            emit("error", error=str(exc))
+        finally:
+            events.close()
+
+
+@app.post("/api/chat/stream")
+async def api_chat_stream(request: Request, body: Dict[str, Any]):
+    """Like /api/chat, but streams progress as Server-Sent Events.
+
+    Events: tool_call, search_results, server_connected, tool_result,
+    tool_error, token, prompt_stats, step, final, error. Each data field is a JSON object.
+    Admission works as for /api/chat; the run is cancelled when the client disconnects.
+    """
+    message = (body or {}).get("message", "").strip()
+
+    if not message:
+        return JSONResponse({"error": "message is required"}, status_code=400)
+    try:
+        max_steps = _max_steps(body)
+    except ValueError as exc:
+        return JSONResponse({"error": str(exc)}, status_code=400)
+
+    session_id = _session_id(request, body)
+    # The slot is held until the stream ends
+    slot = AsyncExitStack()
+    try:
+        await slot.enter_async_context(admission.admit())
+    except Overloaded as exc:
+        return _with_session(
+            JSONResponse({"error": str(exc)}, status_code=exc.status_code, headers=exc.headers), session_id
+        )
+    events = EventQueue()
+
+    async def event_source() -> AsyncIterator[Dict[str, str]]:
+        task = asyncio.create_task(_run_with_events(session_id, message, max_steps, events))
+        finished = False
+        try:
+            async for event in events:
+                yield {"event": event["event"], "data": json.dumps(event, default=str)}
+            finished = True
+        finally:
+            # Stop working for a client that has gone away
+            if not finished:
+                CANCELLED.inc(1, "disconnect")
+            if not task.done():
+                task.cancel()
+            await slot.aclose()
+
+    return _with_session(EventSourceResponse(event_source()), session_id)
+
+
+@app.get("/api/ready")
+async def api_ready() -> JSONResponse:
+    """Readiness: 200 once warm-up has finished, 503 while it runs or if it failed.
+
+    The body reports the warm-up state and the startup profile.
+    """
+    status = warmup.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.get("/api/stats")
+async def api_stats() -> JSONResponse:
+    """Session pool, MCP server pool, search backend and prompt size counters."""
+    stats: Dict[str, Any] = {
+        "sessions": agent_pool.stats(),
+        "admission": admission.stats(),
+        "startup": runtime.profile.report(),
+    }
+    shared = runtime.current()
+    if shared is not None:
+        stats.update({
+            "mcp_servers": shared.server_pool.stats(),
+            "search": shared.catalog.stats(),
+            "prompt": shared.llm.prompt_builder.stats(),
+            "intents": shared.intent_router.stats(),
+            "single_flight": shared.single_flight.stats(),
+            "launch_specs": shared.launch_specs.stats(),
+            "speculation": shared.speculator.stats(),
+            "llm": shared.llm.call_policy.stats(),
+        })
+    return JSONResponse(stats)
+
+
+def _pool_stat(key: str):
+    # Nothing to report until warm-up has built the pool
+    shared = runtime.current()
+    return [((), shared.server_pool.stats()[key])] if shared is not None else []
+
+
+def _cache_lookups():
+    shared = runtime.current()
+    if shared is None:
+        return []
+    return [(("hit",), shared.catalog.cache.hits), (("miss",), shared.catalog.cache.misses)]
+
+
+def _single_flight_calls():
+    shared = runtime.current()
+    if shared is None:
+        return []
+    flights = shared.single_flight
+    kinds = sorted(set(flights.executed) | set(flights.coalesced))
+    return [((kind, "executed"), flights.executed[kind]) for kind in kinds] + [
+        ((kind, "coalesced"), flights.coalesced[kind]) for kind in kinds
+    ]
+
+
+REGISTRY.callback(
+    "mcp_live_servers", "MCP server processes currently running.", lambda: _pool_stat("live"),
+)
+REGISTRY.callback(
+    "mcp_busy_servers", "MCP server processes with a tool call in flight.", lambda: _pool_stat("busy"),
+)
+REGISTRY.callback(
+    "mcp_server_spawns_total", "MCP server processes started.", lambda: _pool_stat("spawns"), kind="counter",
+)
+REGISTRY.callback(
+    "agent_sessions", "Agents held in the session pool.",
+    lambda: [((), agent_pool.stats()["sessions"])],
+)
+REGISTRY.callback(
+    "search_cache_lookups_total", "Search cache lookups by outcome.", _cache_lookups,
+    labels=("result",), kind="counter",
+)
+REGISTRY.callback(
+    "singleflight_calls_total", "Server starts and searches, run or coalesced into one in flight.",
+    _single_flight_calls, labels=("kind", "outcome"), kind="counter",
+)
+REGISTRY.callback(
+    "chat_active_requests", "Chat requests being served.", lambda: [((), admission.active)],
+)
+REGISTRY.callback(
+    "chat_queued_requests", "Chat requests waiting for a slot.", lambda: [((), admission.queued)],
+)
+REGISTRY.callback(
+    "chat_requests_rejected_total", "Chat requests shed by admission control.",
+    lambda: [((str(status),), count) for status, count in admission.rejected.items()],
+    labels=("status",), kind="counter",
+)
+REGISTRY.callback(
+    "agent_ready", "1 once startup warm-up has finished.", lambda: [((), float(warmup.ready))],
+)
+
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Prometheus metrics: stage latencies and errors, prompt sizes, pool and cache counters."""
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
 
 
 # Serve the SPA from ./static (expects an index.html)
@@ -77,5 +431,3 @@ def run() -> None:
 
 if __name__ == "__main__":
     run()
-
-